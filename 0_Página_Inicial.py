@@ -1,12 +1,17 @@
 import streamlit as st
+from services import tracing
 from services.supabase_client import (
     require_authentication,
     get_user_email,
+    limpar_identidade,
     supabase
 )
 
 st.set_page_config(page_title="Página Inicial", layout="wide")
 
+# Arquiva as consultas da execução anterior (só com RASTREAR_CONSULTAS=1)
+tracing.iniciar_execucao("Página Inicial")
+
 require_authentication()
 
 st.sidebar.title("Menu de Navegação")
@@ -32,6 +37,9 @@ st.markdown("""
 
 st.info("Use o menu lateral para navegar entre as páginas.")
 
+# Consultas ao banco nesta execução (só com RASTREAR_CONSULTAS=1, para administradores)
+tracing.painel_lateral()
+
 # Botão de Logout na sidebar
 if st.sidebar.button("Logout"):
     try:
@@ -39,5 +47,6 @@ if st.sidebar.button("Logout"):
     except Exception:
         pass
     st.session_state.pop("user", None)
+    limpar_identidade()
     st.success("Logout realizado com sucesso!")
     st.experimental_rerun()
@@ -0,0 +1,182 @@
+"""Geração de dados sintéticos (mercados, compras, itens e notas fiscais) para os benchmarks."""
+import datetime
+import random
+
+from utils import money
+
+PRODUTOS = [
+    ("ARROZ BRANCO 5KG", "UN", 24.9), ("FEIJAO CARIOCA 1KG", "UN", 8.5), ("LEITE INTEGRAL 1L", "UN", 4.99),
+    ("CAFE TORRADO 500G", "UN", 17.9), ("ACUCAR REFINADO 1KG", "UN", 4.59), ("OLEO DE SOJA 900ML", "UN", 7.49),
+    ("BANANA PRATA", "KG", 6.99), ("TOMATE", "KG", 8.9), ("BATATA", "KG", 5.49), ("PAO FRANCES", "KG", 15.9),
+    ("PEITO DE FRANGO", "KG", 19.9), ("CARNE MOIDA", "KG", 39.9), ("QUEIJO MUSSARELA", "KG", 49.9),
+    ("IOGURTE NATURAL", "UN", 3.79), ("SABAO EM PO 1KG", "UN", 14.9), ("PAPEL HIGIENICO 12UN", "UN", 21.9),
+]
+
+
+def _item(rng, indice_produto, data, inicio_historico):
+    descricao, unidade, preco_base = PRODUTOS[indice_produto % len(PRODUTOS)]
+    # Inflação de ~0,5% ao mês com ruído de ±10%
+    meses = (data - inicio_historico).days / 30
+    preco = round(preco_base * (1.005 ** meses) * rng.uniform(0.9, 1.1), 2)
+    quantidade = round(rng.uniform(0.3, 2.5), 3) if unidade == "KG" else float(rng.randint(1, 4))
+    return {
+        "codigo": str(1000 + indice_produto),
+        "descricao": f"{descricao} {indice_produto // len(PRODUTOS)}".strip(),
+        "quantidade": quantidade,
+        "unidade": unidade,
+        "valor_unitario": preco,
+        "valor_total": round(preco * quantidade, 2),
+    }
+
+
+def gerar_base(cliente, n_itens, n_usuarios=1, n_mercados=10, itens_por_compra=30, dias=730,
+               n_produtos=400, semente=42):
+    """
+    Preenche o cliente falso com `n_itens` itens de compra distribuídos entre os usuários,
+    em compras de ~`itens_por_compra` itens ao longo dos últimos `dias` dias.
+    Retorna o período coberto (data_inicio, data_fim).
+    """
+    rng = random.Random(semente)
+    hoje = datetime.date.today()
+    inicio = hoje - datetime.timedelta(days=dias)
+    mercados = [
+        cliente.carregar("mercados", {"nome": f"Mercado {i}", "cidade": f"Cidade {i % 3}", "cnpj": f"{i:014d}",
+                                      "estado": "SP", "rua": "Rua A", "numero": str(i), "cep": "00000-000"})
+        for i in range(n_mercados)
+    ]
+    usuarios = [f"usuario-{u}" for u in range(n_usuarios)]
+    gerados = 0
+    while gerados < n_itens:
+        user_id = usuarios[rng.randrange(len(usuarios))]
+        data = inicio + datetime.timedelta(days=rng.randrange(dias + 1))
+        mercado = mercados[rng.randrange(len(mercados))]
+        quantidade_itens = min(max(1, int(rng.gauss(itens_por_compra, itens_por_compra / 4))), n_itens - gerados)
+        itens = [_item(rng, rng.randrange(n_produtos), data, inicio) for _ in range(quantidade_itens)]
+        total = round(sum(item["valor_total"] for item in itens), 2)
+        cabecalho = cliente.carregar("compras_cabecalho", {
+            "mercado_id": mercado["id"], "data_compra": data.isoformat(), "valor_total": total,
+            "descontos": 0.0, "valor_final_pago": total,
+        }, user_id=user_id)
+        for item in itens:
+            cliente.carregar("compras_itens", {**item, "compra_id": cabecalho["id"]}, user_id=user_id)
+        gerados += quantidade_itens
+    return inicio, hoje
+
+
+def _itens_em_reais(n_itens, semente):
+    rng = random.Random(semente)
+    hoje = datetime.date.today()
+    return [_item(rng, rng.randrange(400), hoje, hoje) for _ in range(n_itens)]
+
+
+def gerar_itens(n_itens, semente=7):
+    """Lista de itens no formato de `db_queries.insert_itens` (valores em centavos), para os benchmarks de registro"""
+    return [money.de_banco(item) for item in _itens_em_reais(n_itens, semente)]
+
+
+def gerar_texto_nota(n_itens, itens_por_pagina=40, semente=11):
+    """Texto por página de uma NFC-e sintética, no layout que `pdf_reader` reconhece"""
+    itens = _itens_em_reais(n_itens, semente)
+    paginas = []
+    for inicio in range(0, n_itens, itens_por_pagina):
+        linhas = ["SUPERMERCADO EXEMPLO LTDA", "CNPJ: 12.345.678/0001-90", "Emissão: 15/03/2025 10:11:12"]
+        for item in itens[inicio:inicio + itens_por_pagina]:
+            def fmt(valor, casas=2):
+                return f"{valor:.{casas}f}".replace(".", ",")
+            linhas.append(f"{item['descricao']} (Código: {item['codigo']} ) Vl. Total")
+            linhas.append(
+                f"Qtde.:{fmt(item['quantidade'], 3)} UN: {item['unidade']} Vl. Unit.: "
+                f"{fmt(item['valor_unitario'])} {fmt(item['valor_total'])}"
+            )
+        paginas.append("\n".join(linhas))
+    return paginas
+
+
+def _pdf(paginas):
+    """
+    PDF mínimo (Helvetica, WinAnsi) com uma página por lista de linhas. Cada linha é um
+    texto ou uma lista de (x, texto), para posicionar colunas.
+    """
+    objetos = []
+
+    def adicionar(conteudo):
+        objetos.append(conteudo)
+        return len(objetos)
+
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    id_paginas = len(objetos) + 1 + 2 * len(paginas)
+    filhos = []
+    for linhas in paginas:
+        operacoes = [b"BT /F1 8 Tf"]
+        y = 800
+        for linha in linhas:
+            for x, texto in ([(10, linha)] if isinstance(linha, str) else linha):
+                texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("cp1252")
+                operacoes.append(b"1 0 0 1 %d %d Tm (" % (x, y) + texto + b") Tj")
+            y -= 11
+        operacoes.append(b"ET")
+        fluxo = b"\n".join(operacoes)
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        filhos.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 420 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (id_paginas, conteudo, fonte)
+        ))
+    adicionar(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % f for f in filhos) + b"] /Count %d >>" % len(filhos))
+    catalogo = adicionar(b"<< /Type /Catalog /Pages %d 0 R >>" % id_paginas)
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, conteudo in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + conteudo + b"\nendobj\n"
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b"%010d 00000 n \n" % posicao
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, catalogo, xref)
+    return bytes(saida)
+
+
+def gerar_pdf_nota(n_itens, itens_por_pagina=30, semente=11):
+    """
+    PDF de uma NFC-e sintética no layout de duas linhas por item, para a leitura pelo
+    pdfplumber. Os itens são os de `gerar_itens(n_itens, semente)`.
+    """
+    paginas = [texto.split("\n") for texto in gerar_texto_nota(n_itens, itens_por_pagina, semente)]
+    return _pdf(paginas)
+
+
+# Posição (x) das colunas da tabela de itens do DANFE NFC-e
+COLUNAS_DANFE = [(10, "Item"), (30, "Código"), (100, "Descrição"), (250, "Qtde"), (280, "UN"), (300, "Vl.Unit."),
+                 (350, "Vl.Total")]
+
+
+def gerar_pdf_danfe(n_itens, itens_por_pagina=50, quebrar_a_cada=7, semente=11):
+    """
+    PDF de uma NFC-e sintética no layout em colunas do DANFE (cabeçalho da tabela na
+    primeira página, uma linha por item, numerada, e linha de totais no fim). A descrição
+    de um a cada `quebrar_a_cada` itens continua na linha de baixo. Os itens são os de
+    `gerar_itens(n_itens, semente)`.
+    """
+    def fmt(valor, casas=2):
+        return f"{valor:.{casas}f}".replace(".", ",")
+
+    itens = _itens_em_reais(n_itens, semente)
+    paginas = []
+    for inicio in range(0, n_itens, itens_por_pagina):
+        linhas = ["SUPERMERCADO EXEMPLO LTDA", "CNPJ: 12.345.678/0001-90", "Emissão: 15/03/2025 10:11:12"]
+        if inicio == 0:
+            linhas.append(COLUNAS_DANFE)
+        for numero, item in enumerate(itens[inicio:inicio + itens_por_pagina], inicio + 1):
+            descricao, continuacao = item["descricao"], None
+            if quebrar_a_cada and numero % quebrar_a_cada == 0 and " " in descricao:
+                descricao, continuacao = descricao.split(" ", 1)
+            valores = [str(numero), item["codigo"], descricao, fmt(item["quantidade"], 3), item["unidade"],
+                       fmt(item["valor_unitario"]), fmt(item["valor_total"])]
+            linhas.append([(x, valor) for (x, _), valor in zip(COLUNAS_DANFE, valores)])
+            if continuacao:
+                linhas.append([(COLUNAS_DANFE[2][0], continuacao)])
+        if inicio + itens_por_pagina >= n_itens:
+            total = round(sum(item["valor_total"] for item in itens), 2)
+            linhas += [f"Qtd. total de itens {n_itens}", f"Valor total R$ {fmt(total)}"]
+        paginas.append(linhas)
+    return _pdf(paginas)
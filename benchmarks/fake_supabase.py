@@ -0,0 +1,474 @@
+"""
+Supabase em memória para os benchmarks, instalado no nível do HTTP.
+
+`FakeSupabase` guarda as tabelas, aplica o isolamento por usuário das políticas de
+RLS (pelo `sub` do token de cada requisição), o trigger de `gastos_periodo` e as RPCs
+definidas em `sql/`. `TransporteFake` é um transporte do httpx que responde às rotas do
+PostgREST (/rest/v1) e do GoTrue (/auth/v1) com esses dados. `instalar` o coloca no
+lugar do pool de conexões de `services.supabase_client`: os benchmarks passam pelo
+cliente real (supabase-py e postgrest-py, cliente por sessão, identidade da sessão,
+pool compartilhado e camada assíncrona), só sem rede. Uma latência fixa por requisição
+pode ser simulada para tornar visíveis padrões N+1.
+"""
+import asyncio
+import base64
+import csv
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+import httpx
+
+# Tabelas isoladas por usuário (RLS)
+TABELAS_POR_USUARIO = {"compras_cabecalho", "compras_itens", "gastos_periodo"}
+URL_FALSA = "http://supabase.falso"
+# Segredo com que os tokens falsos são assinados (conferido por `validar_jwt`)
+SEGREDO_JWT = "segredo-dos-benchmarks"
+VALIDADE_TOKEN = 3600
+
+
+class ErroPostgrest(Exception):
+    def __init__(self, mensagem, code, status=400):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.code = code
+        self.status = status
+
+
+# ======================
+# TOKENS
+# ======================
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def gerar_token(claims):
+    """JWT HS256 assinado com `SEGREDO_JWT`"""
+    cabecalho = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    corpo = _b64(json.dumps(claims).encode())
+    assinatura = hmac.new(SEGREDO_JWT.encode(), f"{cabecalho}.{corpo}".encode(), hashlib.sha256).digest()
+    return f"{cabecalho}.{corpo}.{_b64(assinatura)}"
+
+
+def _claims(token):
+    try:
+        corpo = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(corpo + "=" * (-len(corpo) % 4)))
+    except Exception:
+        return {}
+
+
+CHAVE_ANONIMA = gerar_token({"role": "anon", "iss": "supabase", "exp": 4102444800})
+
+
+# ======================
+# FILTROS DO POSTGREST
+# ======================
+
+def _converter(texto, atual):
+    """Valor do filtro (texto da URL) no tipo da coluna da linha"""
+    if isinstance(atual, bool):
+        return texto.lower() == "true"
+    if isinstance(atual, (int, float)):
+        try:
+            return float(texto)
+        except ValueError:
+            return texto
+    return texto
+
+
+def _comparar(operador, atual, texto):
+    if operador == "is":
+        return atual is None if texto == "null" else str(atual).lower() == texto
+    if atual is None:
+        return False
+    if operador == "in":
+        valores = next(csv.reader([texto[1:-1]], skipinitialspace=True)) if len(texto) > 2 else []
+        return any(_converter(v, atual) == atual for v in valores)
+    valor = _converter(texto, atual)
+    if type(valor) is not type(atual) and not isinstance(atual, (int, float)):
+        atual = str(atual)
+    try:
+        return {
+            "eq": atual == valor, "neq": atual != valor, "gt": atual > valor,
+            "gte": atual >= valor, "lt": atual < valor, "lte": atual <= valor,
+        }[operador]
+    except TypeError:
+        return str(atual) == str(valor) if operador == "eq" else False
+
+
+def _filtros(parametros):
+    filtros = []
+    for coluna, valor in parametros:
+        if coluna in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+            continue
+        operador, _, texto = valor.partition(".")
+        if operador == "not":
+            operador, _, texto = texto.partition(".")
+            filtros.append(lambda r, c=coluna, o=operador, t=texto: not _comparar(o, r.get(c), t))
+        else:
+            filtros.append(lambda r, c=coluna, o=operador, t=texto: _comparar(o, r.get(c), t))
+    return filtros
+
+
+def _ordenar(linhas, ordem):
+    for parte in reversed([p for p in ordem.split(",") if p]):
+        coluna, *modificadores = parte.split(".")
+        desc = "desc" in modificadores
+        linhas.sort(key=lambda r: (r.get(coluna) is None, r.get(coluna) if r.get(coluna) is not None else 0),
+                    reverse=desc)
+    return linhas
+
+
+# ======================
+# BANCO EM MEMÓRIA
+# ======================
+
+class FakeSupabase:
+    """
+    Banco em memória. `user_id` é o usuário medido pelos benchmarks (dono dos dados
+    gerados sem usuário explícito); `latencia` é o tempo (s) simulado de cada requisição.
+    """
+
+    def __init__(self, user_id="usuario-0", latencia=0.0):
+        self.user_id = user_id
+        self.latencia = latencia
+        self.requisicoes = 0
+        self.tabelas = {"mercados": [], "compras_cabecalho": [], "compras_itens": [], "gastos_periodo": []}
+        self._proximo_id = {}
+        self._itens_por_compra = {}
+        self._gastos = {}
+        self._cabecalhos = {}
+        # {(user_id, "YYYY-MM-01"): {"qtd_compras", "versao"}}, como compras_versao_mes
+        self._versoes_mes = {}
+        self._sequencia_versao = 0
+        # Usuário da requisição em andamento (o `auth.uid()` das políticas de RLS)
+        self._usuario = None
+        self._lock = threading.RLock()
+
+    # ---------- armazenamento ----------
+
+    def _novo_id(self, tabela):
+        self._proximo_id[tabela] = self._proximo_id.get(tabela, 0) + 1
+        return self._proximo_id[tabela]
+
+    def _linhas_visiveis(self, tabela):
+        if tabela not in self.tabelas:
+            raise ErroPostgrest(f"Could not find the table 'public.{tabela}' in the schema cache", "PGRST205", 404)
+        linhas = self.tabelas[tabela]
+        if tabela in TABELAS_POR_USUARIO:
+            return [r for r in linhas if r.get("user_id") == self._usuario]
+        return linhas
+
+    def carregar(self, tabela, linha, user_id=None):
+        """Insere uma linha diretamente (sem requisição), usado na geração de dados sintéticos"""
+        linha = dict(linha)
+        linha.setdefault("id", self._novo_id(tabela))
+        if tabela in TABELAS_POR_USUARIO:
+            linha.setdefault("user_id", user_id or self._usuario or self.user_id)
+        if tabela == "compras_itens":
+            self._itens_por_compra.setdefault(linha["compra_id"], []).append(linha)
+        self.tabelas[tabela].append(linha)
+        if tabela == "compras_cabecalho":
+            self._cabecalhos[linha["id"]] = linha
+            self._acumular_gasto(linha, 1)
+        self._versionar(tabela, None, linha)
+        return linha
+
+    def _inserir(self, tabela, dados):
+        if tabela not in self.tabelas:
+            self._linhas_visiveis(tabela)
+        lote = dados if isinstance(dados, list) else [dados]
+        return [dict(self.carregar(tabela, linha)) for linha in lote]
+
+    def _remover(self, tabela, linhas):
+        ids = {r["id"] for r in linhas}
+        self.tabelas[tabela] = [r for r in self.tabelas[tabela] if r["id"] not in ids]
+        for linha in linhas:
+            self._versionar(tabela, linha, None)
+            if tabela == "compras_cabecalho":
+                del self._cabecalhos[linha["id"]]
+                self._acumular_gasto(linha, -1)
+                # on delete cascade dos itens
+                itens = self._itens_por_compra.pop(linha["id"], [])
+                if itens:
+                    ids_itens = {i["id"] for i in itens}
+                    self.tabelas["compras_itens"] = [i for i in self.tabelas["compras_itens"] if i["id"] not in ids_itens]
+            if tabela == "compras_itens":
+                self._itens_por_compra[linha["compra_id"]].remove(linha)
+        return [dict(r) for r in linhas]
+
+    def _acumular_gasto(self, cabecalho, sinal):
+        """Equivalente ao trigger atualizar_gastos_periodo"""
+        data = datetime.date.fromisoformat(str(cabecalho["data_compra"])[:10])
+        inicios = {
+            "mes": data.replace(day=1),
+            "semana": data - datetime.timedelta(days=data.weekday()),
+        }
+        for granularidade, periodo in inicios.items():
+            chave = (cabecalho["user_id"], granularidade, periodo.isoformat(), cabecalho["mercado_id"])
+            linha = self._gastos.get(chave)
+            if linha is None:
+                linha = self.carregar("gastos_periodo", {
+                    "user_id": cabecalho["user_id"], "mercado_id": cabecalho["mercado_id"],
+                    "granularidade": granularidade, "periodo": periodo.isoformat(),
+                    "valor_final_pago": 0.0, "qtd_compras": 0,
+                })
+                self._gastos[chave] = linha
+            linha["valor_final_pago"] += sinal * float(cabecalho.get("valor_final_pago") or 0)
+            linha["qtd_compras"] += sinal
+
+    def _marcar_mes(self, cabecalho, qtd):
+        """Equivalente a _marcar_mes_compras: nova versão para o mês da compra"""
+        self._sequencia_versao += 1
+        chave = (cabecalho["user_id"], str(cabecalho["data_compra"])[:7] + "-01")
+        versao = self._versoes_mes.setdefault(chave, {"qtd_compras": 0, "versao": 0})
+        versao["qtd_compras"] += qtd
+        versao["versao"] = self._sequencia_versao
+
+    def _versionar(self, tabela, antiga, nova):
+        """Equivalente aos triggers de sql/get_assinaturas_compras.sql"""
+        if tabela == "compras_cabecalho":
+            for linha, qtd in ((antiga, -1), (nova, 1)):
+                if linha is not None:
+                    self._marcar_mes(linha, qtd)
+        elif tabela == "compras_itens":
+            compras = {linha["compra_id"] for linha in (antiga, nova) if linha is not None}
+            for compra_id in compras:
+                if compra_id in self._cabecalhos:
+                    self._marcar_mes(self._cabecalhos[compra_id], 0)
+        elif tabela == "mercados" and antiga is not None and nova is not None:
+            for user_id, granularidade, periodo, mercado_id in list(self._gastos):
+                if (granularidade == "mes" and mercado_id == nova["id"]
+                        and self._gastos[(user_id, granularidade, periodo, mercado_id)]["qtd_compras"] > 0):
+                    self._sequencia_versao += 1
+                    self._versoes_mes[(user_id, periodo)]["versao"] = self._sequencia_versao
+
+    # ---------- PostgREST ----------
+
+    def _tabela(self, metodo, tabela, parametros, corpo, prefer):
+        """Rotas /rest/v1/<tabela>; retorna (linhas, total ou None)"""
+        if metodo == "POST":
+            return self._inserir(tabela, corpo), None
+        linhas = self._linhas_visiveis(tabela)
+        filtros = _filtros(parametros)
+        linhas = [r for r in linhas if all(f(r) for f in filtros)]
+        if metodo == "DELETE":
+            return self._remover(tabela, linhas), None
+        if metodo == "PATCH":
+            for linha in linhas:
+                antiga = dict(linha)
+                linha.update(corpo)
+                self._versionar(tabela, antiga, linha)
+            return [dict(r) for r in linhas], None
+        valores = dict(parametros)
+        total = len(linhas) if "count=" in prefer else None
+        linhas = _ordenar(list(linhas), valores.get("order", ""))
+        inicio = int(valores.get("offset", 0))
+        fim = inicio + int(valores["limit"]) if "limit" in valores else None
+        linhas = linhas[inicio:fim]
+        colunas = [c.strip() for c in valores.get("select", "*").split(",")]
+        if colunas != ["*"]:
+            return [{c: r.get(c) for c in colunas} for r in linhas], total
+        return [dict(r) for r in linhas], total
+
+    def _rpc(self, nome, parametros):
+        funcao = getattr(self, f"_rpc_{nome}", None)
+        if funcao is None:
+            raise ErroPostgrest(f"Could not find the function public.{nome} in the schema cache", "PGRST202", 404)
+        return funcao(**(parametros or {}))
+
+    # ---------- GoTrue ----------
+
+    @staticmethod
+    def _usuario_json(usuario):
+        return {
+            "id": usuario, "aud": "authenticated", "role": "authenticated", "email": f"{usuario}@exemplo.com",
+            "app_metadata": {"provider": "email"}, "user_metadata": {}, "created_at": "2025-01-01T00:00:00Z",
+        }
+
+    def _sessao_json(self, usuario):
+        expira = int(time.time()) + VALIDADE_TOKEN
+        token = gerar_token({"sub": usuario, "email": f"{usuario}@exemplo.com", "role": "authenticated",
+                             "aud": "authenticated", "exp": expira})
+        return {
+            "access_token": token, "token_type": "bearer", "expires_in": VALIDADE_TOKEN, "expires_at": expira,
+            "refresh_token": f"refresh-{usuario}", "user": self._usuario_json(usuario),
+        }
+
+    def _auth(self, metodo, rota, parametros, corpo):
+        if rota == "token":
+            tipo = dict(parametros).get("grant_type")
+            if tipo == "password":
+                return 200, self._sessao_json(corpo["email"].split("@")[0])
+            if tipo == "refresh_token" and str(corpo.get("refresh_token", "")).startswith("refresh-"):
+                return 200, self._sessao_json(corpo["refresh_token"][len("refresh-"):])
+            return 400, {"error": "invalid_grant", "error_description": "Invalid login credentials"}
+        if rota == "user" and self._usuario:
+            return 200, self._usuario_json(self._usuario)
+        if rota == "logout":
+            return 204, None
+        return 401, {"msg": "invalid JWT", "code": 401}
+
+    # ---------- HTTP ----------
+
+    def responder(self, request, corpo_bytes):
+        """Resposta do httpx para uma requisição ao Supabase falso"""
+        self.requisicoes += 1
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        partes = request.url.path.strip("/").split("/")
+        parametros = list(request.url.params.multi_items())
+        corpo = json.loads(corpo_bytes) if corpo_bytes else None
+        with self._lock:
+            self._usuario = _claims(token).get("sub")
+            try:
+                if partes[:2] == ["auth", "v1"]:
+                    status, dados = self._auth(request.method, partes[2], parametros, corpo or {})
+                    return httpx.Response(status, json=dados) if dados is not None else httpx.Response(status)
+                if partes[:3] == ["rest", "v1", "rpc"]:
+                    return httpx.Response(200, json=self._rpc(partes[3], corpo))
+                if partes[:2] == ["rest", "v1"]:
+                    linhas, total = self._tabela(request.method, partes[2], parametros, corpo,
+                                                 request.headers.get("prefer", ""))
+                    cabecalhos = {}
+                    if total is not None:
+                        cabecalhos["content-range"] = f"0-{max(len(linhas) - 1, 0)}/{total}" if linhas else f"*/{total}"
+                    return httpx.Response(201 if request.method == "POST" else 200, json=linhas, headers=cabecalhos)
+                return httpx.Response(404, json={"message": f"rota desconhecida: {request.url.path}"})
+            except ErroPostgrest as e:
+                return httpx.Response(e.status, json={"code": e.code, "message": e.mensagem, "details": None, "hint": None})
+            finally:
+                self._usuario = None
+
+    # ---------- RPCs (ver sql/) ----------
+
+    def _cabecalhos_periodo(self, data_inicio, data_fim, mercado_ids=None):
+        mercados = set(mercado_ids) if mercado_ids is not None else None
+        return [
+            c for c in self._linhas_visiveis("compras_cabecalho")
+            if data_inicio <= str(c["data_compra"]) <= data_fim and (mercados is None or c["mercado_id"] in mercados)
+        ]
+
+    @staticmethod
+    def _linha_detalhada(c, i, mercado):
+        return {
+            "item": i["id"], "compra_id": c["id"], "data_compra": c["data_compra"],
+            "codigo": i["codigo"], "descricao": i["descricao"], "quantidade": i["quantidade"],
+            "unidade": i["unidade"], "valor_unitario": i["valor_unitario"], "valor_total": i["valor_total"],
+            "desconto": c.get("descontos", 0), "mercado_id": c["mercado_id"],
+            "mercado": mercado.get("nome"), "cidade": mercado.get("cidade"),
+        }
+
+    def _linhas_detalhadas(self, cabecalhos):
+        mercados = {m["id"]: m for m in self.tabelas["mercados"]}
+        for c in cabecalhos:
+            mercado = mercados.get(c["mercado_id"], {})
+            for i in self._itens_por_compra.get(c["id"], []):
+                yield self._linha_detalhada(c, i, mercado)
+
+    def _rpc_get_compras_detalhadas_periodo(self, data_inicio, data_fim, mercado_ids=None):
+        cabecalhos = sorted(self._cabecalhos_periodo(data_inicio, data_fim, mercado_ids), key=lambda c: c["data_compra"])
+        return list(self._linhas_detalhadas(cabecalhos))
+
+    def _rpc_get_compras_detalhadas_pagina(self, data_inicio, data_fim, limite=100, ordenar_por="data_compra",
+                                           decrescente=False, p_apos_valor=None, p_apos_id=None, busca=None,
+                                           mercado_ids=None):
+        linhas = self._linhas_detalhadas(self._cabecalhos_periodo(data_inicio, data_fim, mercado_ids))
+        if busca:
+            linhas = (r for r in linhas if busca.lower() in r["descricao"].lower())
+        linhas = [{**r, "id": r.pop("item")} for r in linhas]
+        converter = float if ordenar_por == "valor_total" else str
+        linhas.sort(key=lambda r: (converter(r[ordenar_por]), r["id"]), reverse=decrescente)
+        if p_apos_id is not None:
+            cursor = (converter(p_apos_valor), p_apos_id)
+            depois = (lambda k: k < cursor) if decrescente else (lambda k: k > cursor)
+            linhas = [r for r in linhas if depois((converter(r[ordenar_por]), r["id"]))]
+        return linhas[:limite]
+
+    def _rpc_get_compras_detalhadas_desde(self, p_apos_id=0, limite=1000, p_data_inicio=None, p_data_fim=None):
+        cabecalhos = {
+            c["id"]: c for c in self._linhas_visiveis("compras_cabecalho")
+            if (p_data_inicio is None or str(c["data_compra"]) >= p_data_inicio)
+            and (p_data_fim is None or str(c["data_compra"]) <= p_data_fim)
+        }
+        itens = sorted(
+            (i for i in self._linhas_visiveis("compras_itens")
+             if i["id"] > (p_apos_id or 0) and i["compra_id"] in cabecalhos),
+            key=lambda i: i["id"]
+        )[:limite]
+        mercados = {m["id"]: m for m in self.tabelas["mercados"]}
+        return [
+            self._linha_detalhada(cabecalhos[i["compra_id"]], i, mercados.get(cabecalhos[i["compra_id"]]["mercado_id"], {}))
+            for i in itens
+        ]
+
+    def _rpc_get_assinaturas_compras(self):
+        return [
+            {"mes": mes, "qtd_compras": versao["qtd_compras"],
+             "assinatura": f"{versao['qtd_compras']}:{versao['versao']}"}
+            for (user_id, mes), versao in sorted(self._versoes_mes.items())
+            if user_id == self._usuario and versao["qtd_compras"] > 0
+        ]
+
+    def _rpc_registrar_compra_com_itens(self, p_cabecalho, p_itens):
+        cabecalho = self.carregar("compras_cabecalho", p_cabecalho)
+        for item in p_itens:
+            self.carregar("compras_itens", {**item, "compra_id": cabecalho["id"]})
+        return cabecalho["id"]
+
+
+# ======================
+# TRANSPORTES DO HTTPX
+# ======================
+
+class TransporteFake(httpx.BaseTransport):
+    """Responde às requisições com um `FakeSupabase`, no lugar do pool de conexões"""
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    def handle_request(self, request):
+        if self.banco.latencia:
+            time.sleep(self.banco.latencia)
+        return self.banco.responder(request, request.read())
+
+
+class TransporteFakeAsync(httpx.AsyncBaseTransport):
+    """Versão assíncrona de `TransporteFake`"""
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    async def handle_async_request(self, request):
+        if self.banco.latencia:
+            await asyncio.sleep(self.banco.latencia)
+        return self.banco.responder(request, await request.aread())
+
+
+def instalar(banco):
+    """
+    Aponta `services.supabase_client` para o banco falso: configura URL, chave e segredo
+    do JWT e troca os pools de conexões (síncrono e assíncrono) pelos transportes falsos.
+    Retorna o módulo; use `entrar` para autenticar a sessão.
+    """
+    os.environ.update(SUPABASE_URL=URL_FALSA, SUPABASE_KEY=CHAVE_ANONIMA, SUPABASE_JWT_SECRET=SEGREDO_JWT)
+    from services import supabase_client
+
+    transporte, transporte_async = TransporteFake(banco), TransporteFakeAsync(banco)
+    supabase_client._pool_conexoes = lambda: transporte
+    supabase_client._pool_conexoes_async = lambda: transporte_async
+    return supabase_client
+
+
+def entrar(user_id):
+    """Faz login na sessão atual como `user_id`, pelo mesmo caminho da página de Login"""
+    from services import supabase_client
+
+    supabase_client.supabase.auth.sign_in_with_password({"email": f"{user_id}@exemplo.com", "password": "senha"})
+    supabase_client.limpar_identidade()
+    return supabase_client.get_user_id()
@@ -0,0 +1,372 @@
+"""
+Benchmarks do fluxo de compras: leitura de notas (texto e PDF real pelo pdfplumber),
+registro, busca por período e cálculos da página "Analisar Compras", contra um Supabase
+em memória atrás do cliente real (ver benchmarks/fake_supabase.py).
+
+Uso:
+    python -m benchmarks.run --itens 100000 --saida resultados.json
+    python -m benchmarks.run --itens 1000 --latencia-ms 30   # simula a latência de rede
+
+O resultado é um JSON com os parâmetros da execução e, para cada benchmark,
+os tempos (mín./mediana/média/máx.), a vazão e o número de requisições ao banco,
+para comparar execuções com `diff` ou `jq`.
+"""
+import argparse
+import collections
+import datetime
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import dados, startup
+from benchmarks.fake_supabase import FakeSupabase, entrar, instalar
+
+
+def medir(cliente, nome, funcao, repeticoes=5, preparar=None, unidades=None, unidade="itens"):
+    """Executa `funcao` `repeticoes` vezes e retorna as estatísticas de tempo"""
+    tempos = []
+    requisicoes = 0
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        antes = cliente.requisicoes
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+        requisicoes = cliente.requisicoes - antes
+    mediana = statistics.median(tempos)
+    resultado = {
+        "nome": nome,
+        "repeticoes": repeticoes,
+        "min_s": min(tempos),
+        "mediana_s": mediana,
+        "media_s": statistics.fmean(tempos),
+        "max_s": max(tempos),
+        "requisicoes": requisicoes,
+    }
+    if unidades:
+        resultado["unidades"] = unidades
+        resultado[f"{unidade}_por_s"] = unidades / mediana if mediana else None
+    print(f"{nome:<45} mediana {mediana * 1000:10.2f} ms  ({requisicoes} requisições)", file=sys.stderr)
+    return resultado
+
+
+def revocacao(itens, esperados):
+    """Fração dos itens esperados (dicionários) presentes em `itens` (ItensNota) com todos os campos iguais"""
+    def chaves(registros):
+        return collections.Counter(tuple(sorted(registro.items())) for registro in registros)
+    encontrados = chaves(itens.registros()) & chaves(esperados)
+    return sum(encontrados.values()) / len(esperados) if esperados else 1.0
+
+
+# ======================
+# Cálculos da página 2_Analisar_Compras.py
+# ======================
+
+def analise_tendencia(df_gasto_mensal, metodo="linear"):
+    """Projeção de 6 meses da seção "Tendência de Gastos" (services/forecast.py)"""
+    from services import forecast
+    from utils import money
+    return forecast.projetar(money.reais(df_gasto_mensal["valor_final_pago"].to_numpy()), metodo=metodo).previstos
+
+
+def executar(args):
+    cliente = FakeSupabase(latencia=args.latencia_ms / 1000.0)
+    instalar(cliente)
+    entrar(cliente.user_id)
+
+    # Imports depois de instalar o banco falso
+    import pandas as pd
+    from services import db_queries, db_queries_async
+    from services import analytics, frames
+    from services import forecast
+    from services.cache import invalidar_tabelas
+    from services.price_history import HistoricoPrecos
+    from services.purchase_store import PurchaseStore
+    from services.snapshot import SnapshotCompras, disponivel as snapshot_disponivel
+    from utils import impressao_digital, nfce_parser, pdf_reader
+
+    inicio_geracao = time.perf_counter()
+    data_inicio, data_fim = dados.gerar_base(
+        cliente, args.itens, n_usuarios=args.usuarios, n_mercados=args.mercados,
+        itens_por_compra=args.itens_por_compra, dias=args.dias
+    )
+    tempo_geracao = time.perf_counter() - inicio_geracao
+    itens_usuario = sum(1 for r in cliente.tabelas["compras_itens"] if r["user_id"] == cliente.user_id)
+    print(f"Base gerada em {tempo_geracao:.1f} s ({itens_usuario} itens do usuário medido)", file=sys.stderr)
+
+    def limpar_cache():
+        invalidar_tabelas(*db_queries.TABELAS_COMPRAS_DETALHADAS)
+
+    resultados = []
+    rep = args.repeticoes
+
+    # ---------- Leitura de notas fiscais ----------
+    paginas = dados.gerar_texto_nota(args.itens_nota)
+    resultados.append(medir(
+        cliente, "pdf.iter_itens_textos", lambda: [i for p in pdf_reader.iter_itens_textos(paginas) for i in p],
+        rep, unidades=args.itens_nota
+    ))
+    resultados.append(medir(
+        cliente, "pdf.iter_tabelas_textos", lambda: nfce_parser.ItensNota.concatenar(pdf_reader.iter_tabelas_textos(paginas)),
+        rep, unidades=args.itens_nota
+    ))
+    # PDFs reais pelo pdfplumber, nos dois layouts e nos dois modos de leitura, com a revocação
+    # (fração dos itens da nota lidos com todos os campos corretos)
+    esperados = dados.gerar_itens(args.itens_pdf, semente=11)
+    pdfs = {"duas_linhas": dados.gerar_pdf_nota(args.itens_pdf), "danfe": dados.gerar_pdf_danfe(args.itens_pdf)}
+    for layout, pdf in pdfs.items():
+        for modo in pdf_reader.MODOS:
+            def ler(pdf=pdf, modo=modo):
+                return pdf_reader.ler_nota_colunar(io.BytesIO(pdf), modo)["itens"]
+            resultado = medir(cliente, f"pdf.{layout}.{modo}", ler, rep, unidades=args.itens_pdf)
+            resultado["revocacao"] = revocacao(ler(), esperados)
+            resultados.append(resultado)
+            print(f"{'':<45} revocação {resultado['revocacao']:.1%}", file=sys.stderr)
+    itens_lidos = nfce_parser.ItensNota.concatenar(pdf_reader.iter_tabelas_textos(paginas))
+    resultados.append(medir(
+        cliente, "nfce.tabela_e_registros", lambda: (itens_lidos.tabela(), itens_lidos.registros()),
+        rep, unidades=args.itens_nota
+    ))
+
+    # ---------- Registro ----------
+    itens_nota = dados.gerar_itens(args.itens_nota)
+    cabecalho = {"mercado_id": 1, "data_compra": data_fim.isoformat(), "valor_total": 0,
+                 "descontos": 0, "valor_final_pago": 0}
+    # Uma chave de acesso diferente a cada registro, para não cair na verificação de duplicidade
+    chaves_registro = itertools.count(1)
+    resultados.append(medir(
+        cliente, "registro.rpc_transacional",
+        lambda: db_queries.registrar_compra_completa(
+            {**cabecalho, "chave_acesso": f"{next(chaves_registro):044d}"}, itens_nota, cliente.user_id
+        ),
+        rep, unidades=len(itens_nota)
+    ))
+    resultados.append(medir(
+        cliente, "registro.impressao_digital",
+        lambda: impressao_digital.calcular(cabecalho, itens_nota), rep, unidades=len(itens_nota)
+    ))
+    compra_id = db_queries.insert_compra(cabecalho)["id"]
+    resultados.append(medir(
+        cliente, "registro.insert_itens_em_lotes",
+        lambda: db_queries.insert_itens(compra_id, cliente.user_id, itens_nota),
+        rep, unidades=len(itens_nota)
+    ))
+    resultados.append(medir(
+        cliente, "registro.insert_item_por_item",
+        lambda: [db_queries.insert_item({"compra_id": compra_id, "user_id": cliente.user_id, **item}) for item in itens_nota],
+        rep, unidades=len(itens_nota)
+    ))
+
+    # ---------- Busca por período ----------
+    meio = data_inicio + (data_fim - data_inicio) / 2
+    resultados.append(medir(
+        cliente, "periodo.cabecalho_e_detalhadas",
+        lambda: (db_queries.get_compras_cabecalho_periodo(data_inicio, data_fim),
+                 db_queries.get_compras_detalhadas_rpc(data_inicio, data_fim)),
+        rep, preparar=limpar_cache, unidades=itens_usuario
+    ))
+    resultados.append(medir(
+        cliente, "periodo.cabecalho_e_detalhadas_em_paralelo",
+        lambda: db_queries_async.reunir(db_queries_async.get_compras_cabecalho_periodo(data_inicio, data_fim),
+                                        db_queries_async.get_compras_detalhadas_rpc(data_inicio, data_fim)),
+        rep, unidades=itens_usuario
+    ))
+    resultados.append(medir(
+        cliente, "periodo.cabecalho_e_detalhadas_em_cache",
+        lambda: (db_queries.get_compras_cabecalho_periodo(data_inicio, data_fim),
+                 db_queries.get_compras_detalhadas_rpc(data_inicio, data_fim)),
+        rep, unidades=itens_usuario
+    ))
+
+    def store_com_metade():
+        limpar_cache()
+        store = PurchaseStore(cliente.user_id)
+        store.buscar(meio, data_fim)
+        return store
+
+    estado = {}
+    resultados.append(medir(
+        cliente, "periodo.store_delta_metade_inicial",
+        lambda: estado["store"].buscar(data_inicio, data_fim),
+        rep, preparar=lambda: estado.update(store=store_com_metade()), unidades=itens_usuario
+    ))
+    resultados.append(medir(
+        cliente, "periodo.itens_pagina",
+        lambda: db_queries.get_itens_pagina(data_inicio, data_fim, limite=100),
+        rep, preparar=limpar_cache
+    ))
+
+    # ---------- Snapshot local ----------
+    if snapshot_disponivel():
+        with tempfile.TemporaryDirectory() as diretorio:
+            resultados.append(medir(
+                cliente, "snapshot.sincronizacao_completa",
+                lambda: SnapshotCompras(cliente.user_id, diretorio).sincronizar(),
+                rep, preparar=lambda: shutil.rmtree(diretorio, ignore_errors=True) or os.makedirs(diretorio),
+                unidades=itens_usuario
+            ))
+            snapshot = SnapshotCompras(cliente.user_id, diretorio).sincronizar()
+            resultados.append(medir(
+                cliente, "snapshot.sincronizacao_sem_novidades", snapshot.sincronizar, rep
+            ))
+            resultados.append(medir(
+                cliente, "snapshot.periodo",
+                lambda: SnapshotCompras(cliente.user_id, diretorio).periodo(data_inicio, data_fim),
+                rep, unidades=itens_usuario
+            ))
+
+    # ---------- Cálculos da análise ----------
+    limpar_cache()
+    registros_detalhadas = db_queries.get_compras_detalhadas_rpc(data_inicio, data_fim)
+    df_cabecalho = frames.de_registros(
+        db_queries.get_compras_cabecalho_periodo(data_inicio, data_fim), frames.ESQUEMA_CABECALHO
+    )
+    df_detalhadas = frames.de_registros(registros_detalhadas, frames.ESQUEMA_DETALHADAS)
+    mercado_ids = sorted(df_cabecalho["mercado_id"].unique().tolist())
+    n_detalhadas = len(df_detalhadas)
+
+    # Frame de objetos (pd.DataFrame dos registros) contra o de tipos compactos (services/frames.py)
+    df_objetos = pd.DataFrame(registros_detalhadas)
+    resultado = medir(
+        cliente, "analise.dataframe_de_registros", lambda: pd.DataFrame(registros_detalhadas),
+        rep, unidades=n_detalhadas
+    )
+    resultado["memoria_mb"] = df_objetos.memory_usage(deep=True).sum() / 1e6
+    resultados.append(resultado)
+    resultado = medir(
+        cliente, "analise.frame_compacto",
+        lambda: frames.de_registros(registros_detalhadas, frames.ESQUEMA_DETALHADAS),
+        rep, unidades=n_detalhadas
+    )
+    resultado["memoria_mb"] = df_detalhadas.memory_usage(deep=True).sum() / 1e6
+    resultados.append(resultado)
+    print(f"{'':<45} memória {resultados[-2]['memoria_mb']:.1f} MB -> {resultado['memoria_mb']:.1f} MB",
+          file=sys.stderr)
+    resultados.append(medir(
+        cliente, "analise.agrupamento_objetos",
+        lambda: df_objetos.groupby(["mercado", "descricao"])["valor_total"].sum(), rep, unidades=n_detalhadas
+    ))
+    resultados.append(medir(
+        cliente, "analise.agrupamento_compacto",
+        lambda: df_detalhadas.groupby(["mercado", "descricao"], observed=True)["valor_total"].sum(),
+        rep, unidades=n_detalhadas
+    ))
+    # Estatísticas por item (variação de preços e preço médio) numa única passada (services/analytics.py)
+    resultados.append(medir(
+        cliente, "analise.estatisticas_itens", lambda: analytics.estatisticas_itens(df_detalhadas), rep,
+        unidades=n_detalhadas
+    ))
+    resultados.append(medir(
+        cliente, "analise.gasto_mensal",
+        lambda: analytics.gasto_mensal(data_inicio, data_fim, mercado_ids, df_cabecalho),
+        rep, preparar=limpar_cache
+    ))
+
+    def analisar():
+        return analytics.analisar(df_cabecalho, df_detalhadas, data_inicio, data_fim, mercado_ids, cliente.user_id)
+
+    resultados.append(medir(
+        cliente, "analise.completa", analisar, rep, unidades=n_detalhadas,
+        preparar=lambda: (limpar_cache(), analytics.limpar_cache())
+    ))
+    resultados.append(medir(cliente, "analise.memorizada", analisar, rep))
+    df_gasto_mensal = analisar().gasto_mensal
+    resultados.append(medir(
+        cliente, "analise.tendencia", lambda: analise_tendencia(df_gasto_mensal), rep,
+        preparar=forecast.limpar_cache
+    ))
+    resultados.append(medir(
+        cliente, "analise.tendencia_holt_winters", lambda: analise_tendencia(df_gasto_mensal, "holt_winters"), rep,
+        preparar=forecast.limpar_cache
+    ))
+    resultados.append(medir(
+        cliente, "analise.tendencia_memorizada", lambda: analise_tendencia(df_gasto_mensal), rep
+    ))
+    resultados.append(medir(
+        cliente, "analise.historico_precos", lambda: HistoricoPrecos.de_itens(df_detalhadas), rep, unidades=n_detalhadas
+    ))
+
+    return {
+        "execucao": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+        },
+        "parametros": {
+            "itens": args.itens, "usuarios": args.usuarios, "mercados": args.mercados,
+            "itens_por_compra": args.itens_por_compra, "dias": args.dias, "itens_nota": args.itens_nota,
+            "itens_pdf": args.itens_pdf, "latencia_ms": args.latencia_ms, "repeticoes": rep,
+            "itens_usuario_medido": itens_usuario, "tempo_geracao_s": tempo_geracao,
+        },
+        "resultados": resultados,
+        "inicializacao": _inicializacao(args),
+    }
+
+
+def _inicializacao(args):
+    """Tempo de importação de cada página (ver benchmarks/startup.py), com a revisão de comparação se pedida"""
+    if args.sem_inicializacao:
+        return None
+    if args.comparar_inicializacao:
+        paginas = startup.comparar(args.comparar_inicializacao, args.repeticoes_inicializacao)
+    else:
+        paginas = startup.medir_paginas(repeticoes=args.repeticoes_inicializacao)
+    for pagina in paginas:
+        antes = f"antes {pagina['antes_ms']:.1f} ms, " if pagina.get("antes_ms") is not None else ""
+        agora = f"{pagina['importacao_ms']:.1f} ms" if pagina.get("importacao_ms") is not None else pagina.get("erro")
+        print(f"inicializacao.{pagina['pagina']:<32} {antes}{agora}", file=sys.stderr)
+    return {"revisao_comparada": args.comparar_inicializacao, "paginas": paginas}
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do fluxo de compras contra um Supabase em memória.")
+    parser.add_argument("--itens", type=int, default=10_000, help="Total de itens de compra gerados (1k a 1M)")
+    parser.add_argument("--usuarios", type=int, default=1, help="Usuários entre os quais os itens são distribuídos")
+    parser.add_argument("--mercados", type=int, default=10)
+    parser.add_argument("--itens-por-compra", type=int, default=30)
+    parser.add_argument("--dias", type=int, default=730, help="Extensão do histórico gerado, em dias")
+    parser.add_argument("--itens-nota", type=int, default=500, help="Itens da nota usada nos benchmarks de leitura e registro")
+    parser.add_argument("--itens-pdf", type=int, default=200,
+                        help="Itens dos PDFs gerados para a leitura pelo pdfplumber (duas linhas e DANFE)")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latência simulada por requisição ao banco")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: saída padrão)")
+    parser.add_argument("--comparar-inicializacao", default=None, metavar="REVISAO",
+                        help="Revisão do git cujo tempo de importação das páginas é medido junto (antes/depois)")
+    parser.add_argument("--repeticoes-inicializacao", type=int, default=3)
+    parser.add_argument("--sem-inicializacao", action="store_true", help="Não mede a importação das páginas")
+    args = parser.parse_args(argv)
+
+    # Fora do `streamlit run`, cada uso de st.session_state gera um aviso do streamlit (que
+    # redefine o nível dos próprios loggers ao carregar a configuração)
+    logging.disable(logging.WARNING)
+    relatorio = executar(args)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False, default=str)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Auditoria do tempo de importação de cada página do Streamlit (carga a frio).
+
+Para cada página, os imports do nível de módulo (os que rodam em toda execução da
+página; imports dentro de `if`/funções ou depois de um `if ...: st.stop()` são tratados
+como adiados) são executados em um processo novo com `python -X importtime`. O custo
+da página é a soma do tempo próprio de todos os módulos carregados depois do
+`streamlit`, que o servidor já tem importado. A mediana de algumas execuções é reportada, com os módulos mais caros.
+
+Uso:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --comparar HEAD~1 --saida startup.json
+
+Com --comparar, a mesma medição é feita numa cópia da revisão indicada (git archive),
+e o relatório mostra antes/depois por página.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PADRAO_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\| ( *)(\S+)")
+MODULO_BASE = "streamlit"
+# Credenciais fictícias: revisões antigas criam o cliente do Supabase já no import de
+# services.supabase_client (nenhuma requisição é feita ao importar)
+AMBIENTE_MEDICAO = {
+    "PYTHONDONTWRITEBYTECODE": "1",
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "chave-ficticia",
+    "SUPABASE_JWT_SECRET": "segredo-ficticio",
+}
+
+
+def listar_paginas(raiz=RAIZ):
+    """Script principal (arquivo .py na raiz que contém st.set_page_config) e páginas em pages/"""
+    paginas = []
+    for nome in sorted(os.listdir(raiz)):
+        caminho = os.path.join(raiz, nome)
+        if nome.endswith(".py") and os.path.isfile(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                if "set_page_config" in f.read():
+                    paginas.append(nome)
+    pasta = os.path.join(raiz, "pages")
+    if os.path.isdir(pasta):
+        paginas.extend(os.path.join("pages", nome) for nome in sorted(os.listdir(pasta)) if nome.endswith(".py"))
+    return paginas
+
+
+def _imports(nos):
+    for no in nos:
+        if isinstance(no, (ast.Import, ast.ImportFrom)):
+            yield no
+        elif isinstance(no, ast.Try):
+            yield from _imports(no.body)
+
+
+def _interrompe(no):
+    """Bloco `if` do nível de módulo que pode encerrar a execução da página (st.stop())"""
+    return isinstance(no, ast.If) and any(
+        isinstance(chamada, ast.Call) and isinstance(chamada.func, ast.Attribute) and chamada.func.attr == "stop"
+        for chamada in ast.walk(no)
+    )
+
+
+def imports_da_pagina(caminho):
+    """
+    Separa os imports da página em (imediatos, adiados): imediatos são os do nível de
+    módulo antes de qualquer `if ...: st.stop()`; adiados, os que só rodam dentro de um
+    bloco (modo escolhido, botão etc.) ou depois de uma dessas interrupções
+    """
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read(), caminho)
+    corpo = []
+    for no in arvore.body:
+        if _interrompe(no):
+            break
+        corpo.append(no)
+    imediatos = list(_imports(corpo))
+    ids_imediatos = {id(no) for no in imediatos}
+    adiados = [
+        no for no in ast.walk(arvore)
+        if isinstance(no, (ast.Import, ast.ImportFrom)) and id(no) not in ids_imediatos
+    ]
+    return [ast.unparse(no) for no in imediatos], sorted({ast.unparse(no) for no in adiados})
+
+
+def _medir_uma_vez(codigo, raiz):
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULO_BASE}\n{codigo}"],
+        cwd=raiz, capture_output=True, text=True,
+        env={**os.environ, **AMBIENTE_MEDICAO},
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falhou")
+    # As linhas até o `streamlit` de nível zero pertencem ao import base
+    modulos = {}
+    depois_da_base = False
+    for linha in processo.stderr.splitlines():
+        match = PADRAO_IMPORTTIME.match(linha)
+        if not match:
+            continue
+        proprio, _, recuo, nome = match.groups()
+        if not depois_da_base:
+            depois_da_base = nome == MODULO_BASE and not recuo
+            continue
+        modulos[nome] = modulos.get(nome, 0) + int(proprio)
+    return modulos
+
+
+def medir_pagina(caminho, raiz=RAIZ, repeticoes=3, top=8):
+    """Tempo de importação (ms) dos imports imediatos da página, além do streamlit"""
+    imediatos, adiados = imports_da_pagina(os.path.join(raiz, caminho))
+    execucoes = [_medir_uma_vez("\n".join(imediatos), raiz) for _ in range(repeticoes)]
+    totais = [sum(modulos.values()) / 1000 for modulos in execucoes]
+    mediana = statistics.median(totais)
+    modulos = execucoes[totais.index(mediana)] if mediana in totais else execucoes[0]
+    # Maiores custos agrupados pelo pacote de primeiro nível
+    por_pacote = {}
+    for nome, proprio in modulos.items():
+        pacote = nome.split(".")[0]
+        por_pacote[pacote] = por_pacote.get(pacote, 0) + proprio
+    maiores = sorted(por_pacote.items(), key=lambda par: -par[1])[:top]
+    return {
+        "pagina": caminho,
+        "importacao_ms": mediana,
+        "modulos": len(modulos),
+        "maiores_pacotes_ms": {pacote: proprio / 1000 for pacote, proprio in maiores},
+        "imports_adiados": adiados,
+    }
+
+
+def medir_paginas(raiz=RAIZ, repeticoes=3):
+    resultados = []
+    for pagina in listar_paginas(raiz):
+        try:
+            resultados.append(medir_pagina(pagina, raiz, repeticoes))
+        except RuntimeError as e:
+            resultados.append({"pagina": pagina, "importacao_ms": None, "erro": str(e)})
+    return resultados
+
+
+def _extrair_revisao(revisao, destino):
+    arquivo = os.path.join(destino, "revisao.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", arquivo, revisao], cwd=RAIZ, check=True)
+    with tarfile.open(arquivo) as tar:
+        tar.extractall(destino)
+    os.remove(arquivo)
+
+
+def comparar(revisao, repeticoes=3):
+    """
+    Mede a revisão indicada e a árvore atual; retorna uma lista de {pagina, antes_ms,
+    depois_ms}, com `antes_erro`/`erro` quando a página não pôde ser importada
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        _extrair_revisao(revisao, pasta)
+        antes = {r["pagina"]: r for r in medir_paginas(pasta, repeticoes)}
+    depois = medir_paginas(RAIZ, repeticoes)
+    resultados = []
+    for r in depois:
+        anterior = antes.get(r["pagina"], {})
+        resultado = {**r, "antes_ms": anterior.get("importacao_ms"), "depois_ms": r["importacao_ms"]}
+        if "erro" in anterior:
+            resultado["antes_erro"] = anterior["erro"]
+        resultados.append(resultado)
+    return resultados
+
+
+def _formatar(ms):
+    return f"{ms:8.1f} ms" if ms is not None else "       —   "
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de importação (carga a frio) de cada página.")
+    parser.add_argument("--comparar", default=None, help="Revisão do git para comparar (ex.: HEAD~1)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        resultados = comparar(args.comparar, args.repeticoes)
+        for r in resultados:
+            print(f"{r['pagina']:<35} antes {_formatar(r['antes_ms'])}  depois {_formatar(r['depois_ms'])}",
+                  file=sys.stderr)
+            for momento, chave in (("antes", "antes_erro"), ("depois", "erro")):
+                if r.get(chave):
+                    print(f"{'':<35} erro {momento}: {r[chave]}", file=sys.stderr)
+    else:
+        resultados = medir_paginas(RAIZ, args.repeticoes)
+        for r in resultados:
+            maiores = ", ".join(f"{p} {ms:.0f}" for p, ms in list(r.get("maiores_pacotes_ms", {}).items())[:4])
+            print(f"{r['pagina']:<35} {_formatar(r['importacao_ms'])}  ({r.get('erro') or maiores})", file=sys.stderr)
+
+    saida = json.dumps({"revisao_comparada": args.comparar, "paginas": resultados}, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(saida)
+    else:
+        print(saida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,20 @@
 import streamlit as st
 from services import db_queries
+from services import tracing
 from services.supabase_client import (
     require_authentication, 
     get_user_email, 
     get_user_id
 )
-import pandas as pd
-import pdfplumber
-import re
+from utils import impressao_digital, money
 import datetime
+import io
 
 st.set_page_config(page_title="Registrar Compras", layout="wide")
 
+# Arquiva as consultas da execução anterior (só com RASTREAR_CONSULTAS=1)
+tracing.iniciar_execucao("Registrar Compras")
+
 # Força autenticação
 require_authentication()
 
@@ -27,10 +30,14 @@ st.write("Aqui você pode registrar suas compras via upload de nota fiscal (PDF)
 # Informação sobre privacidade
 st.info("🔒 **Privacidade:** Suas compras são privadas e visíveis apenas para você.")
 
-modo = st.radio("Escolha o modo de registro:", ["📄 Upload PDF", "✍️ Manual"])
+modo = st.radio("Escolha o modo de registro:", ["📄 Upload PDF", "✍️ Manual", "📚 Importação em Lote"])
 
 
-def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, descontos_cabecalho, valor_final_pago_cabecalho, itens_para_db):
+def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, descontos_cabecalho, valor_final_pago_cabecalho, itens_para_db, chave_acesso=None, hash_arquivo=None, confirmar_repetida=False):
+    """
+    Valores do cabeçalho e dos itens em centavos (utils/money.py).
+    Com `confirmar_repetida`, uma compra igual a outra já registrada é gravada mesmo assim.
+    """
     try:
         user_id = get_user_id()
         if not user_id:
@@ -40,7 +47,7 @@ def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, des
         # Converte data_compra para string no formato 'YYYY-MM-DD'
         data_compra_str = data_compra.strftime('%Y-%m-%d')
 
-        # 1. Inserir cabeçalho da compra
+        # Dados do cabeçalho da compra
         compra_cabecalho_data = {
             "mercado_id": mercado_id,
             "data_compra": data_compra_str,
@@ -48,42 +55,34 @@ def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, des
             "descontos": descontos_cabecalho,
             "valor_final_pago": valor_final_pago_cabecalho
         }
-        compra_registrada = db_queries.insert_compra(compra_cabecalho_data)
-
-        if not compra_registrada:
-            st.error("Erro ao registrar cabeçalho da compra.")
-            return False
-
-        compra_id = compra_registrada["id"] if isinstance(compra_registrada, dict) and "id" in compra_registrada else None
-        if not compra_id:
-            st.error("❌ Erro ao obter ID da compra registrada.")
-            return False
+        if chave_acesso:
+            compra_cabecalho_data["chave_acesso"] = chave_acesso
+        if hash_arquivo:
+            compra_cabecalho_data["hash_arquivo"] = hash_arquivo
 
-        # 2. Inserir itens da compra
-        total_itens = len(itens_para_db)
-        itens_registrados = 0
         progress_bar = st.progress(0)
         status_text = st.empty()
 
-        for i, item in enumerate(itens_para_db):
-            status_text.text(f"Registrando item {i+1} de {total_itens}: {item['descricao']}")
-            try:
-                item_data = {
-                    "compra_id": compra_id,
-                    "user_id": user_id,
-                    **item
-                }
-                db_queries.insert_item(item_data)
-                itens_registrados += 1
-            except Exception as e:
-                st.warning(f"⚠️ Erro ao registrar item: {item['descricao']} - {e}")
-
-            progress = (i + 1) / total_itens
-            progress_bar.progress(progress)
+        def atualizar_progresso(processados, total):
+            status_text.text(f"Registrando itens: {processados} de {total}")
+            progress_bar.progress(processados / total)
+
+        # Usa a RPC transacional quando disponível; senão grava cabeçalho e itens em lotes
+        total_itens = len(itens_para_db)
+        compra_id, itens_registrados, falhas = db_queries.registrar_compra_completa(
+            compra_cabecalho_data, itens_para_db, user_id, ao_concluir_lote=atualizar_progresso,
+            confirmar_repetida=confirmar_repetida
+        )
+        for falha in falhas:
+            st.warning(f"⚠️ Erro ao registrar os itens {falha['inicio'] + 1} a {falha['fim']}: {falha['erro']}")
 
         progress_bar.empty()
         status_text.empty()
 
+        if not compra_id:
+            st.error("❌ Nenhum item foi registrado. A compra foi descartada.")
+            return False
+
         if itens_registrados == total_itens:
             st.success(f"✅ Compra registrada com sucesso! {itens_registrados} itens salvos.")
             st.balloons()
@@ -92,6 +91,15 @@ def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, des
             st.warning(f"⚠️ {itens_registrados} de {total_itens} itens foram registrados.")
             return False
 
+    except db_queries.CompraDuplicada as e:
+        if chave_acesso:
+            st.warning("🔁 Esta compra já foi registrada. Nada foi gravado.")
+        else:
+            # Sem nota fiscal, pode ser outra compra igual: o usuário confirma abaixo
+            st.session_state["impressao_repetida"] = e.impressao
+            st.warning("🔁 Uma compra igual (mesmo mercado, data, valor e itens) já foi registrada. Nada foi gravado. "
+                       "Se for outra compra, use \"Registrar mesmo assim\".")
+        return False
     except Exception as e:
         st.error(f"❌ Erro geral ao registrar compra: {e}")
         return False
@@ -99,52 +107,42 @@ def registrar_compra_e_itens(mercado_id, data_compra, valor_total_cabecalho, des
 
 if modo == "📄 Upload PDF":
     st.subheader("📄 Upload de Nota Fiscal")
-    colunas_itens = ["Item", "Código", "Descrição", "Quantidade", "Unidade", "Valor Unitário", "Valor Total"]
 
     uploaded_file = st.file_uploader("Faça upload da sua nota fiscal (PDF)", type=["pdf"])
     if uploaded_file is not None:
+        # A leitura de PDF (pdfplumber, NumPy, pandas) só é carregada quando há um arquivo
+        from services import parse_cache
+        from utils import pdf_reader, nfce_parser
         st.success(f"✅ Arquivo '{uploaded_file.name}' enviado com sucesso!")
         try:
-            with pdfplumber.open(uploaded_file) as pdf:
-                texto = ""
-                for page in pdf.pages:
-                    texto += page.extract_text() + "\n"
-
-            # Regex para extrair os itens do PDF
-            padrao_item = re.compile(
-                r"(.+?) \(Código:\s*(\d+)\s*\) Vl\.\s*Total\s*\nQtde\.:([\d,.]+) UN:\s*(\w+)\s*Vl\.\s*Unit\.:\s*([\d,.]+) ([\d,.]+)"
-            )
-
-            itens_tabela = []
-            itens_supabase = []
-            for i, match in enumerate(padrao_item.finditer(texto), 1):
-                descricao = match.group(1).strip()
-                codigo = match.group(2).strip()
-                quantidade = match.group(3).replace(",", ".")
-                unidade = match.group(4).strip()
-                valor_unit = match.group(5).replace(",", ".")
-                valor_total = match.group(6).replace(",", ".")
-
-                itens_tabela.append([
-                    i, codigo, descricao, float(quantidade), unidade,
-                    float(valor_unit), float(valor_total)
-                ])
-
-                itens_supabase.append({
-                    "codigo": codigo,
-                    "descricao": descricao,
-                    "quantidade": float(quantidade),
-                    "unidade": unidade,
-                    "valor_unitario": float(valor_unit),
-                    "valor_total": float(valor_total)
-                })
-
-            if itens_tabela:
-                df_itens = pd.DataFrame(itens_tabela, columns=colunas_itens)
-                st.subheader("📦 Itens da Compra (extraído do PDF)")
-                st.dataframe(df_itens, use_container_width=True)
-
-                valor_total_lido = df_itens["Valor Total"].sum()
+            st.subheader("📦 Itens da Compra (extraído do PDF)")
+            tabela_itens = st.empty()
+            conteudo_pdf = uploaded_file.getvalue()
+            hash_pdf = parse_cache.hash_arquivo(conteudo_pdf)
+            # Nas reexecuções da página (mercado, desconto, data) a leitura vem do cache
+            nota = parse_cache.obter(hash_pdf)
+            if nota is None:
+                # Lê o PDF página por página, exibindo os itens à medida que são encontrados
+                status_leitura = st.empty()
+                paginas_itens = []
+                metadados_nota = {}
+                for num_pagina, itens_pagina in enumerate(
+                        pdf_reader.iter_tabelas_por_pagina(io.BytesIO(conteudo_pdf), metadados_nota), 1):
+                    paginas_itens.append(itens_pagina)
+                    itens_nota = nfce_parser.ItensNota.concatenar(paginas_itens)
+                    status_leitura.text(f"Lendo página {num_pagina}... {len(itens_nota)} itens encontrados")
+                    if len(itens_pagina):
+                        tabela_itens.dataframe(itens_nota.tabela(), use_container_width=True)
+                status_leitura.empty()
+                nota = parse_cache.guardar(
+                    hash_pdf, {**metadados_nota, "itens": nfce_parser.ItensNota.concatenar(paginas_itens)}
+                )
+            itens_nota = nota["itens"]
+            metadados_nota = nota
+
+            if len(itens_nota):
+                tabela_itens.dataframe(itens_nota.tabela(), use_container_width=True)
+                valor_total_lido = itens_nota.valor_total()
 
                 # Seleção do mercado
                 mercados = db_queries.buscar_mercados()
@@ -162,28 +160,44 @@ if modo == "📄 Upload PDF":
                     # Informações adicionais
                     col1, col2 = st.columns(2)
                     with col1:
-                        desconto = st.number_input("💰 Descontos aplicados (R$)", min_value=0.0,
-                                                   max_value=float(valor_total_lido), value=0.0, step=0.01,
-                                                   key="desconto_compra_pdf")
+                        desconto = money.centavos(st.number_input("💰 Descontos aplicados (R$)", min_value=0.0,
+                                                                  max_value=money.reais(valor_total_lido), value=0.0, step=0.01,
+                                                                  key="desconto_compra_pdf"))
                     with col2:
-                        data_compra = st.date_input("📅 Data da compra", value=datetime.date.today(), key="data_compra_pdf")
+                        data_emissao = metadados_nota.get("data_emissao")
+                        data_compra = st.date_input(
+                            "📅 Data da compra",
+                            value=datetime.date.fromisoformat(data_emissao) if data_emissao else datetime.date.today(),
+                            key="data_compra_pdf"
+                        )
 
                     valor_final_pago = valor_total_lido - desconto
                     
                     st.markdown("---")
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("💰 Valor Total", f"R$ {valor_total_lido:.2f}")
+                        st.metric("💰 Valor Total", money.formatar(valor_total_lido))
                     with col2:
-                        st.metric("🏷️ Desconto", f"R$ {desconto:.2f}")
+                        st.metric("🏷️ Desconto", money.formatar(desconto))
                     with col3:
-                        st.metric("💳 Valor Final", f"R$ {valor_final_pago:.2f}")
-
-                    if st.button("💾 Registrar Compra no Banco de Dados", type="primary"):
+                        st.metric("💳 Valor Final", money.formatar(valor_final_pago))
+
+                    # O mesmo arquivo (ou a mesma nota) já registrado não é gravado de novo
+                    chave_nota = metadados_nota.get("chave_acesso")
+                    compra_existente = db_queries.buscar_compra_por_hash(hash_pdf)
+                    if compra_existente is None and chave_nota and db_queries.buscar_chaves_registradas([chave_nota]):
+                        compra_existente = {"data_compra": None}
+                    if compra_existente is not None:
+                        data_existente = compra_existente.get("data_compra")
+                        st.warning("🔁 Esta nota fiscal já foi registrada"
+                                   + (f" (compra de {data_existente})." if data_existente else "."))
+                    elif st.button("💾 Registrar Compra no Banco de Dados", type="primary"):
                         with st.spinner("Registrando compra..."):
-                            registrar_compra_e_itens(mercado_selecionado["id"], data_compra, valor_total_lido, desconto, valor_final_pago, itens_supabase)
+                            registrar_compra_e_itens(mercado_selecionado["id"], data_compra, valor_total_lido, desconto, valor_final_pago, itens_nota.registros(),
+                                                     chave_acesso=chave_nota, hash_arquivo=hash_pdf)
 
             else:
+                tabela_itens.empty()
                 st.warning("⚠️ Não foi possível identificar os itens da compra automaticamente. Verifique se o PDF segue o padrão esperado ou use o modo manual.")
 
         except Exception as e:
@@ -210,7 +224,7 @@ elif modo == "✍️ Manual":
         with col1:
             data_compra_manual = st.date_input("📅 Data da Compra", value=datetime.date.today(), key="data_compra_manual")
         with col2:
-            descontos_manual = st.number_input("💰 Descontos Aplicados (R$)", min_value=0.0, value=0.0, step=0.01, key="descontos_manual")
+            descontos_manual = money.centavos(st.number_input("💰 Descontos Aplicados (R$)", min_value=0.0, value=0.0, step=0.01, key="descontos_manual"))
 
         st.markdown("---")
         st.subheader("📦 Adicionar Itens da Compra")
@@ -229,11 +243,11 @@ elif modo == "✍️ Manual":
             with col_un:
                 unidade_item = st.selectbox("📏 Unidade", options=["UN", "KG", "LT", "G", "ML"], key="un_item")
             with col_vu:
-                valor_unitario_item = st.number_input("💰 Valor Unitário (R$)", min_value=0.01, value=0.01, step=0.01, key="vu_item")
+                valor_unitario_item = money.centavos(st.number_input("💰 Valor Unitário (R$)", min_value=0.01, value=0.01, step=0.01, key="vu_item"))
             
-            # Calcula o valor total do item
-            valor_total_item = quantidade_item * valor_unitario_item
-            st.info(f"💳 Valor Total do Item: R$ {valor_total_item:.2f}")
+            # Calcula o valor total do item, em centavos
+            valor_total_item = money.multiplicar(quantidade_item, valor_unitario_item)
+            st.info(f"💳 Valor Total do Item: {money.formatar(valor_total_item)}")
 
             add_item_button = st.form_submit_button("➕ Adicionar Item", type="primary")
 
@@ -254,6 +268,7 @@ elif modo == "✍️ Manual":
 
         # Exibe os itens adicionados em uma tabela
         if st.session_state.itens_manuais:
+            import pandas as pd
             st.subheader("📋 Itens Adicionados")
             df_itens_manuais = pd.DataFrame(st.session_state.itens_manuais)
             df_itens_manuais_display = df_itens_manuais.rename(columns={
@@ -265,9 +280,9 @@ elif modo == "✍️ Manual":
                 "valor_total": "Valor Total (R$)"
             })
             
-            # Formatar valores monetários
-            df_itens_manuais_display["Valor Unitário (R$)"] = df_itens_manuais_display["Valor Unitário (R$)"].apply(lambda x: f"R$ {x:.2f}")
-            df_itens_manuais_display["Valor Total (R$)"] = df_itens_manuais_display["Valor Total (R$)"].apply(lambda x: f"R$ {x:.2f}")
+            # Formatar valores monetários (guardados em centavos)
+            df_itens_manuais_display["Valor Unitário (R$)"] = df_itens_manuais_display["Valor Unitário (R$)"].map(money.formatar)
+            df_itens_manuais_display["Valor Total (R$)"] = df_itens_manuais_display["Valor Total (R$)"].map(money.formatar)
             
             st.dataframe(df_itens_manuais_display, use_container_width=True)
 
@@ -278,38 +293,107 @@ elif modo == "✍️ Manual":
                     st.rerun()
 
             # Calcula o valor total da compra manual
-            valor_total_compra_manual = df_itens_manuais["valor_total"].sum()
+            valor_total_compra_manual = sum(item["valor_total"] for item in st.session_state.itens_manuais)
             valor_final_pago_manual = valor_total_compra_manual - descontos_manual
             
             st.markdown("---")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("💰 Valor Total dos Itens", f"R$ {valor_total_compra_manual:.2f}")
+                st.metric("💰 Valor Total dos Itens", money.formatar(valor_total_compra_manual))
             with col2:
-                st.metric("🏷️ Desconto", f"R$ {descontos_manual:.2f}")
+                st.metric("🏷️ Desconto", money.formatar(descontos_manual))
             with col3:
-                st.metric("💳 Valor Final da Compra", f"R$ {valor_final_pago_manual:.2f}")
+                st.metric("💳 Valor Final da Compra", money.formatar(valor_final_pago_manual))
+
+            def registrar_compra_manual(confirmar_repetida=False):
+                with st.spinner("Registrando compra..."):
+                    success = registrar_compra_e_itens(
+                        mercado_selecionado_manual["id"],
+                        data_compra_manual,
+                        valor_total_compra_manual,
+                        descontos_manual,
+                        valor_final_pago_manual,
+                        st.session_state.itens_manuais,
+                        confirmar_repetida=confirmar_repetida
+                    )
+                    if success:
+                        # Limpa os itens da sessão após o registro
+                        st.session_state.itens_manuais = []
+                        st.session_state.pop("impressao_repetida", None)
+                        st.rerun()
 
             if st.button("💾 Registrar Compra Manual no Banco de Dados", type="primary"):
                 if st.session_state.itens_manuais:
-                    with st.spinner("Registrando compra..."):
-                        success = registrar_compra_e_itens(
-                            mercado_selecionado_manual["id"],
-                            data_compra_manual,
-                            valor_total_compra_manual,
-                            descontos_manual,
-                            valor_final_pago_manual,
-                            st.session_state.itens_manuais
-                        )
-                        if success:
-                            # Limpa os itens da sessão após o registro
-                            st.session_state.itens_manuais = []
-                            st.rerun()
+                    registrar_compra_manual()
                 else:
                     st.warning("⚠️ Adicione ao menos um item para registrar a compra.")
+
+            # Compra igual a uma já registrada: só é gravada se o usuário confirmar que é outra
+            impressao_manual = impressao_digital.calcular(
+                {"mercado_id": mercado_selecionado_manual["id"], "data_compra": data_compra_manual,
+                 "valor_total": valor_total_compra_manual},
+                st.session_state.itens_manuais
+            )
+            if st.session_state.get("impressao_repetida") == impressao_manual:
+                if st.button("✅ Registrar mesmo assim", help="Grava esta compra como uma nova compra, igual à já registrada"):
+                    registrar_compra_manual(confirmar_repetida=True)
         else:
             st.info("📦 Nenhum item adicionado ainda. Use o formulário acima para adicionar itens.")
 
+elif modo == "📚 Importação em Lote":
+    import pandas as pd
+    from services import batch_import
+    st.subheader("📚 Importação em Lote de Notas Fiscais")
+    st.write("Envie várias notas fiscais (PDF) de uma vez. O mercado de cada nota é identificado pelo CNPJ "
+             "e notas já registradas são ignoradas.")
+
+    arquivos_lote = st.file_uploader("Notas fiscais (PDF)", type=["pdf"], accept_multiple_files=True, key="arquivos_lote")
+    mercados = db_queries.buscar_mercados()
+    opcoes_lote = [None] + list(range(len(mercados or [])))
+    idx_mercado_lote = st.selectbox(
+        "🏪 Mercado para notas com CNPJ não cadastrado",
+        options=opcoes_lote,
+        format_func=lambda i: "Nenhum (ignorar a nota)" if i is None else f"{mercados[i]['nome']} - {mercados[i]['cidade']}",
+        key="select_mercado_lote"
+    )
+
+    if arquivos_lote and st.button(f"💾 Importar {len(arquivos_lote)} notas", type="primary"):
+        mercado_padrao_id = mercados[idx_mercado_lote]["id"] if idx_mercado_lote is not None else None
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        def atualizar_lote(indice, total, resultado):
+            status_text.text(f"Registrando nota {indice} de {total}: {resultado['nome']}")
+            progress_bar.progress(indice / total)
+
+        try:
+            with st.spinner("Lendo notas fiscais..."):
+                resultados, estatisticas = batch_import.importar_arquivos(
+                    [(arquivo.name, arquivo.getvalue()) for arquivo in arquivos_lote],
+                    mercado_padrao_id=mercado_padrao_id,
+                    ao_processar=atualizar_lote
+                )
+            progress_bar.empty()
+            status_text.empty()
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("✅ Registradas", estatisticas["notas_registradas"])
+            col2.metric("🔁 Duplicadas", estatisticas["notas_duplicadas"])
+            col3.metric("❌ Com erro", estatisticas["notas_com_erro"])
+            col4.metric("📦 Itens salvos", estatisticas["itens_registrados"])
+            st.caption(
+                f"⏱️ {estatisticas['tempo_total_s']:.1f} s — {estatisticas['notas_por_s']:.2f} notas/s, "
+                f"{estatisticas['itens_por_s']:.1f} itens/s"
+            )
+            st.dataframe(pd.DataFrame(resultados).rename(columns={
+                "nome": "Arquivo", "status": "Situação", "itens": "Itens", "mensagem": "Mensagem"
+            }), use_container_width=True)
+        except Exception as e:
+            st.error(f"❌ Erro na importação em lote: {e}")
+
+# Consultas ao banco nesta execução (só com RASTREAR_CONSULTAS=1, para administradores)
+tracing.painel_lateral()
+
 # Rodapé
 st.markdown("---")
 st.markdown(
@@ -1,24 +1,60 @@
 import streamlit as st
 import pandas as pd
 from services import db_queries
+from services import frames
+from services.purchase_store import obter_store
+from services.mercados_lookup import obter_mapa_mercados
+from services.price_history import HistoricoPrecos
+from services import snapshot
+from services import forecast
+from services import analytics
+from services import tracing
+from services import profiling
 from services.supabase_client import (
     require_authentication, 
     get_user_email, 
     get_user_id,
     get_user_data
 )
+from utils import money
 import datetime
 import plotly.express as px
 
 # Abrir esta página em modo wide por padrão
 st.set_page_config(layout="wide")
 
+# Arquiva as consultas da execução anterior (só com RASTREAR_CONSULTAS=1)
+tracing.iniciar_execucao("Analisar Compras")
+# Abre a medição das seções; uma execução anterior que não chegou ao fim (st.rerun()) é
+# arquivada à parte, como incompleta (só com PERFILAR_PAGINAS=1)
+profiling.iniciar_execucao("Analisar Compras")
+
+# Métodos de projeção da seção "Tendência de Gastos"
+ROTULOS_PROJECAO = {
+    "linear": "Tendência linear",
+    "media_movel": "Média móvel (3 meses)",
+    "holt_winters": "Holt-Winters (tendência e sazonalidade)"
+}
+
+# Rótulos das colunas aceitas na ordenação da tabela de itens
+ROTULOS_ORDENACAO = {
+    "data_compra": "Data da Compra",
+    "valor_total": "Valor Total",
+    "descricao": "Descrição"
+}
+
 
 st.sidebar.title("Menu de Navegação")
 st.sidebar.markdown("GSproject")
 user_email = get_user_email()
 if user_email:
     st.sidebar.markdown(f"👤 **{user_email}**")
+usar_snapshot = st.sidebar.checkbox(
+    "⚡ Usar snapshot local",
+    key="usar_snapshot",
+    disabled=not snapshot.disponivel(),
+    help="Guarda suas compras em disco (formato colunar) e baixa do banco apenas as novas."
+)
 
 st.title("📊 Análise de Compras")
 st.write("Visualize e analise suas compras pessoais de forma detalhada.")
@@ -43,240 +79,320 @@ with col2:
         max_value=datetime.date.today()
     )
 
-# Botão para buscar
+# Botão para buscar: o período fica guardado na sessão para que filtros e
+# paginação continuem funcionando nas próximas interações com a página
 if st.button("🔍 Buscar Minhas Compras", type="primary"):
+    st.session_state["periodo_analise"] = (data_inicio, data_fim)
+
+if "periodo_analise" in st.session_state:
+    data_inicio, data_fim = st.session_state["periodo_analise"]
     if data_inicio > data_fim:
         st.error("❌ A data de início deve ser menor ou igual à data de fim.")
     else:
         with st.spinner("Buscando compras..."):
-            # Busca dados para estatísticas (cabeçalho)
             try:
-                compras_cabecalho = db_queries.get_compras_cabecalho_periodo(data_inicio, data_fim)
-                # Chama a função RPC para obter os dados detalhados para a tabela
-                compras_detalhadas = db_queries.get_compras_detalhadas_rpc(data_inicio, data_fim)
-
-                if compras_cabecalho and compras_detalhadas:
-                    df_cabecalho = pd.DataFrame(compras_cabecalho)
-                    df_detalhadas = pd.DataFrame(compras_detalhadas)
-
-                    if not df_cabecalho.empty and not df_detalhadas.empty:
-                        st.success(f"✅ Encontrados {len(df_detalhadas)} itens de compras no período selecionado!")
+                # Mercados com compras no período (lê só a coluna mercado_id do cabeçalho)
+                with profiling.secao("mercados_periodo"):
+                    mapa_mercados = obter_mapa_mercados()
+                    snapshot_compras = snapshot.obter_snapshot(get_user_id()) if usar_snapshot else None
+                    if snapshot_compras:
+                        mercados_ids_periodo = snapshot_compras.mercado_ids_periodo(data_inicio, data_fim)
+                    else:
+                        mercados_ids_periodo = db_queries.get_mercado_ids_periodo(data_inicio, data_fim)
 
+                if mercados_ids_periodo:
                     # ======================
-                    # Filtro de Mercado (corrigido: pega todos os mercados do cabeçalho)
+                    # Filtro de Mercado: aplicado nas próprias consultas ao banco
                     # ======================
-                    todos_mercados_db = db_queries.buscar_mercados()
-                    df_todos_mercados = pd.DataFrame(todos_mercados_db)
-                    mercados_ids_periodo = df_cabecalho["mercado_id"].unique().tolist()
-                    mercados_disponiveis = df_todos_mercados[df_todos_mercados["id"].isin(mercados_ids_periodo)]["nome"].tolist()
                     # Guardar seleção no session_state para não resetar
                     if "mercados_selecionados" not in st.session_state:
-                        st.session_state["mercados_selecionados"] = mercados_disponiveis
-                    mercados_selecionados = st.multiselect(
+                        st.session_state["mercados_selecionados"] = mercados_ids_periodo
+                    mercado_ids_selecionados = st.multiselect(
                         "Filtrar por Mercado",
-                        options=mercados_disponiveis,
-                        default=st.session_state["mercados_selecionados"]
+                        options=mercados_ids_periodo,
+                        default=[m for m in st.session_state["mercados_selecionados"] if m in mercados_ids_periodo],
+                        format_func=mapa_mercados.rotulo
                     )
-                    st.session_state["mercados_selecionados"] = mercados_selecionados
-
-                    if mercados_selecionados:
-                        df_detalhadas_filtrado = df_detalhadas[df_detalhadas["mercado"].isin(mercados_selecionados)]
-                        # Para filtrar o cabeçalho, precisamos dos IDs dos mercados correspondentes
-                        todos_mercados_db = db_queries.buscar_mercados()
-                        df_todos_mercados = pd.DataFrame(todos_mercados_db)
-                        mercado_ids_selecionados = df_todos_mercados[
-                            df_todos_mercados["nome"].isin(mercados_selecionados)
-                        ]["id"].tolist()
-                        df_cabecalho_filtrado = df_cabecalho[
-                            df_cabecalho["mercado_id"].isin(mercado_ids_selecionados)
-                        ]
+                    st.session_state["mercados_selecionados"] = mercado_ids_selecionados
+
+                    if mercado_ids_selecionados:
+                        with profiling.secao("carregar_compras"):
+                            if snapshot_compras:
+                                # Lê do snapshot local (já sincronizado com as compras novas)
+                                df_cabecalho_filtrado, df_detalhadas_filtrado = snapshot_compras.periodo(
+                                    data_inicio, data_fim, mercado_ids_selecionados
+                                )
+                                # Identifica os dados carregados (muda a cada sincronização)
+                                chave_dados = ("snapshot", snapshot_compras.user_id,
+                                               tuple(sorted(mercado_ids_selecionados)), snapshot_compras.sincronizado_em)
+                            else:
+                                # Reaproveita os intervalos já baixados nesta sessão e busca apenas o que falta
+                                # (cabeçalho para estatísticas e RPC detalhada para os gráficos)
+                                store = obter_store(get_user_id(), mercado_ids_selecionados)
+                                df_cabecalho_filtrado, df_detalhadas_filtrado = store.buscar(data_inicio, data_fim)
+                                chave_dados = ("banco", store.user_id, store.mercado_ids, store.versao)
 
                         if not df_detalhadas_filtrado.empty:
-                            # Tabela de visualização dos itens do período selecionado
+                            st.success(f"✅ Encontrados {len(df_detalhadas_filtrado)} itens de compras no período selecionado!")
+
+                            # Tabela de visualização dos itens do período selecionado,
+                            # carregada do banco uma página por vez (ordenação e busca feitas na consulta)
                             st.subheader("📋 Itens do Período Selecionado")
-                            df_visualizacao = df_detalhadas_filtrado.drop(columns=["desconto", "item"], errors="ignore").rename(columns={
-                                "data_compra": "Data da Compra",
-                                "descricao": "Descrição",
-                                "quantidade": "Quantidade",
-                                "unidade": "Unidade",
-                                "valor_unitario": "Valor Unitário",
-                                "valor_total": "Valor Total",
-                                "mercado": "Mercado",
-                                "cidade": "Cidade"
-                            })
-                            st.dataframe(df_visualizacao, use_container_width=True)
+                            col_busca, col_ordem, col_direcao, col_tamanho = st.columns([3, 2, 1, 1])
+                            with col_busca:
+                                busca_itens = st.text_input("🔎 Buscar item", key="busca_itens", placeholder="Ex: arroz")
+                            with col_ordem:
+                                ordenar_itens_por = st.selectbox(
+                                    "Ordenar por", options=list(db_queries.ORDENACOES_ITENS),
+                                    format_func=ROTULOS_ORDENACAO.get, key="ordenar_itens_por"
+                                )
+                            with col_direcao:
+                                itens_decrescente = st.checkbox("Decrescente", key="itens_decrescente")
+                            with col_tamanho:
+                                tamanho_pagina = st.selectbox("Itens por página", options=[50, 100, 250], key="tamanho_pagina_itens")
+
+                            filtros_itens = (
+                                data_inicio, data_fim, tuple(mercado_ids_selecionados),
+                                busca_itens, ordenar_itens_por, itens_decrescente, tamanho_pagina
+                            )
+                            if st.session_state.get("filtros_itens") != filtros_itens:
+                                # Filtros mudaram: volta para a primeira página
+                                st.session_state["filtros_itens"] = filtros_itens
+                                st.session_state["cursores_itens"] = [None]
+                            cursores_itens = st.session_state["cursores_itens"]
+
+                            with profiling.secao("itens_pagina"):
+                                linhas_pagina, proximo_cursor = db_queries.get_itens_pagina(
+                                    data_inicio, data_fim,
+                                    limite=tamanho_pagina,
+                                    cursor=cursores_itens[-1],
+                                    ordenar_por=ordenar_itens_por,
+                                    decrescente=itens_decrescente,
+                                    busca=busca_itens,
+                                    mercado_ids=mercado_ids_selecionados
+                                )
+                                # Valores em centavos (db_queries): reais só na exibição
+                                df_visualizacao = pd.DataFrame(linhas_pagina)
+                                for coluna in ("valor_unitario", "valor_total"):
+                                    if coluna in df_visualizacao.columns:
+                                        df_visualizacao[coluna] = frames.reais(df_visualizacao[coluna])
+                                df_visualizacao = df_visualizacao.drop(
+                                    columns=["id", "compra_id", "mercado_id", "desconto", "item"], errors="ignore"
+                                ).rename(columns={
+                                    "data_compra": "Data da Compra",
+                                    "codigo": "Código",
+                                    "descricao": "Descrição",
+                                    "quantidade": "Quantidade",
+                                    "unidade": "Unidade",
+                                    "valor_unitario": "Valor Unitário",
+                                    "valor_total": "Valor Total",
+                                    "mercado": "Mercado",
+                                    "cidade": "Cidade"
+                                })
+                                st.dataframe(df_visualizacao, use_container_width=True)
+
+                            col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+                            with col_anterior:
+                                if st.button("⬅️ Anterior", disabled=len(cursores_itens) == 1, key="pagina_anterior_itens"):
+                                    cursores_itens.pop()
+                                    st.rerun()
+                            with col_pagina:
+                                st.caption(f"Página {len(cursores_itens)} — {len(linhas_pagina)} itens")
+                            with col_proxima:
+                                if st.button("Próxima ➡️", disabled=proximo_cursor is None, key="proxima_pagina_itens"):
+                                    cursores_itens.append(proximo_cursor)
+                                    st.rerun()
 
                             # ========== DASHBOARD LAYOUT ========== #
-                            import numpy as np
+                            # Estatísticas por item e por mês numa única passada, memorizadas por
+                            # usuário, período, mercados e origem dos dados (services/analytics.py);
+                            # daqui em diante só exibição
+                            with profiling.secao("analise"):
+                                analise = analytics.analisar(
+                                    df_cabecalho_filtrado, df_detalhadas_filtrado,
+                                    data_inicio, data_fim, mercado_ids_selecionados, get_user_id(),
+                                    origem=chave_dados
+                                )
+                            df_gasto_mensal = analise.gasto_mensal
+
                             # Gráficos 1 e 2 lado a lado
                             col_g1, col_g2 = st.columns(2)
                             # Gráfico: Itens com Maior Aumento de Preço
                             with col_g1:
                                 st.subheader("Itens com Maior Aumento de Preço")
-                                if "codigo" in df_detalhadas_filtrado.columns:
-                                    group_cols = ["codigo", "descricao"]
-                                else:
-                                    group_cols = ["descricao"]
-                                df_precos = df_detalhadas_filtrado.groupby(group_cols).agg(
-                                    media=("valor_unitario", "mean"),
-                                    maximo=("valor_unitario", "max"),
-                                    minimo=("valor_unitario", "min"),
-                                    count=("valor_unitario", "count")
-                                ).reset_index()
-                                df_precos["var_max"] = ((df_precos["maximo"] - df_precos["media"]) / df_precos["media"]) * 100
-                                df_precos["var_min"] = ((df_precos["minimo"] - df_precos["media"]) / df_precos["media"]) * 100
-                                df_aumento = df_precos[(df_precos["count"] > 1) & (df_precos["var_max"] > 0)]
-                                df_aumento = df_aumento.sort_values("var_max", ascending=False).head(10)
-                                if not df_aumento.empty:
-                                    # Formata rótulos para porcentagem com 1 casa decimal
-                                    df_aumento = df_aumento.copy()
-                                    df_aumento["var_max_fmt"] = df_aumento["var_max"].map(lambda v: f"{v:.1f}%")
-                                    fig_aumento = px.bar(
-                                        df_aumento,
-                                        x="var_max",
-                                        y="descricao",
-                                        orientation="h",
-                                        labels={"var_max": "Variação (%)", "descricao": "Item"}
-                                    )
-                                    # Adiciona texto nas barras
-                                    fig_aumento.update_traces(text=df_aumento["var_max"].map(lambda v: f"{v:.1f}%"), textposition='outside')
-                                    fig_aumento.update_layout(yaxis={'categoryorder':'total ascending'})
-                                    st.plotly_chart(fig_aumento, use_container_width=True, height=350, key="chart_aumento")
-                                else:
-                                    st.info("Nenhum item com aumento de preço significativo neste período.")
+                                with profiling.secao("grafico_aumento"):
+                                    if not analise.aumento.empty:
+                                        fig_aumento = px.bar(
+                                            analise.aumento,
+                                            x="var_max",
+                                            y="descricao",
+                                            orientation="h",
+                                            labels={"var_max": "Variação (%)", "descricao": "Item"}
+                                        )
+                                        # Adiciona texto nas barras (porcentagem com 1 casa decimal)
+                                        fig_aumento.update_traces(text=analise.aumento["rotulo"], textposition='outside')
+                                        fig_aumento.update_layout(yaxis={'categoryorder':'total ascending'})
+                                        st.plotly_chart(fig_aumento, use_container_width=True, height=350, key="chart_aumento")
+                                    else:
+                                        st.info("Nenhum item com aumento de preço significativo neste período.")
                             # Gráfico: Itens com Maior Redução de Preço
                             with col_g2:
                                 st.subheader("Itens com Maior Redução de Preço")
-                                df_reducao = df_precos[(df_precos["count"] > 1) & (df_precos["var_min"] < 0)]
-                                df_reducao = df_reducao.sort_values("var_min").head(10)
-                                if not df_reducao.empty:
-                                    df_reducao = df_reducao.copy()
-                                    df_reducao["var_min_fmt"] = df_reducao["var_min"].map(lambda v: f"{v:.1f}%")
-                                    fig_reducao = px.bar(
-                                        df_reducao,
-                                        x="var_min",
-                                        y="descricao",
-                                        orientation="h",
-                                        labels={"var_min": "Variação (%)", "descricao": "Item"}
-                                    )
-                                    fig_reducao.update_traces(text=df_reducao["var_min"].map(lambda v: f"{v:.1f}%"), textposition='outside')
-                                    fig_reducao.update_layout(yaxis={'categoryorder':'total ascending'})
-                                    st.plotly_chart(fig_reducao, use_container_width=True, height=350, key="chart_reducao")
-                                else:
-                                    st.info("Nenhum item com redução de preço significativo neste período.")
+                                with profiling.secao("grafico_reducao"):
+                                    if not analise.reducao.empty:
+                                        fig_reducao = px.bar(
+                                            analise.reducao,
+                                            x="var_min",
+                                            y="descricao",
+                                            orientation="h",
+                                            labels={"var_min": "Variação (%)", "descricao": "Item"}
+                                        )
+                                        fig_reducao.update_traces(text=analise.reducao["rotulo"], textposition='outside')
+                                        fig_reducao.update_layout(yaxis={'categoryorder':'total ascending'})
+                                        st.plotly_chart(fig_reducao, use_container_width=True, height=350, key="chart_reducao")
+                                    else:
+                                        st.info("Nenhum item com redução de preço significativo neste período.")
 
-                            # Gasto Mensal seguido de Tendência (Regressão Linear) em coluna única
+                            # Gasto Mensal seguido de Tendência (projeção) em coluna única
                             st.subheader("Gasto Mensal")
-                            df_cabecalho_filtrado["mes"] = pd.to_datetime(df_cabecalho_filtrado["data_compra"]).dt.strftime("%B/%Y")
-                            df_cabecalho_filtrado = df_cabecalho_filtrado.sort_values("data_compra")
-                            df_gasto_mensal = df_cabecalho_filtrado.groupby("mes", sort=False)["valor_final_pago"].sum().reset_index()
-                            df_gasto_mensal["mes_ordem"] = pd.to_datetime(df_gasto_mensal["mes"], format="%B/%Y")
-                            df_gasto_mensal = df_gasto_mensal.sort_values("mes_ordem")
-                            fig_gasto_mensal = px.bar(
-                                df_gasto_mensal,
-                                x="mes",
-                                y="valor_final_pago",
-                                labels={"mes": "Mês", "valor_final_pago": "Valor total gasto"}
-                            )
-                            if not df_gasto_mensal.empty:
-                                df_gasto_mensal = df_gasto_mensal.copy()
-                                # Converter para milhares e formatar uma casa decimal
-                                df_gasto_mensal["valor_mil"] = df_gasto_mensal["valor_final_pago"] / 1000.0
-                                df_gasto_mensal["valor_mil_fmt"] = df_gasto_mensal["valor_mil"].map(lambda v: f"{v:.1f} mil")
-                                # Cálculos para os cards: total e média (valores em reais e em milhares)
-                                total_real = df_gasto_mensal["valor_final_pago"].sum()
-                                media_real = df_gasto_mensal["valor_final_pago"].mean() if not df_gasto_mensal["valor_final_pago"].empty else 0
-                                total_mil = total_real / 1000.0
-                                media_mil = media_real / 1000.0
-
-                                # Exibir dois cards acima do gráfico: Total do período e Média mensal
-                                card_col1, card_col2 = st.columns(2)
-                                try:
-                                    card_col1.metric("Total no Período", f"R$ {total_real:,.2f}", f"{total_mil:.1f} mil")
-                                    card_col2.metric("Média Mensal", f"R$ {media_real:,.2f}", f"{media_mil:.1f} mil")
-                                except Exception:
-                                    # Fallback simples caso st.metric tenha algum problema
-                                    card_col1.write(f"**Total no Período:** R$ {total_real:,.2f} (~{total_mil:.1f} mil)")
-                                    card_col2.write(f"**Média Mensal:** R$ {media_real:,.2f} (~{media_mil:.1f} mil)")
-
-                                # Atualiza o gráfico para usar valor em milhares
-                                fig_gasto_mensal = px.bar(
-                                    df_gasto_mensal,
-                                    x="mes",
-                                    y="valor_mil",
-                                    labels={"mes": "Mês", "valor_mil": "Valor (mil)"}
-                                )
-                                # adiciona rótulos com 1 casa decimal
-                                fig_gasto_mensal.update_traces(text=df_gasto_mensal["valor_mil"].map(lambda v: f"{v:.1f} mil"), textposition='outside')
-                                if len(df_gasto_mensal) >= 3:
-                                    media_mensal = df_gasto_mensal["valor_mil"].mean()
-                                    fig_gasto_mensal.add_hline(y=media_mensal, line_dash="dash", line_color="red", annotation_text="Média mensal", annotation_position="top left")
-                                st.plotly_chart(fig_gasto_mensal, use_container_width=True, height=350, key="chart_gasto_mensal")
-                            else:
-                                st.info("Nenhum gasto mensal disponível para plotar.")
+                            # Meses completos vêm pré-agregados do banco; só os meses parciais das bordas
+                            # do período são somados a partir do cabeçalho já baixado
+                            with profiling.secao("gasto_mensal"):
+                                if not df_gasto_mensal.empty:
+                                    total_real = analise.total_periodo
+                                    media_real = analise.media_mensal
+                                    total_mil = total_real / 1000.0
+                                    media_mil = media_real / 1000.0
+
+                                    # Exibir dois cards acima do gráfico: Total do período e Média mensal
+                                    card_col1, card_col2 = st.columns(2)
+                                    try:
+                                        card_col1.metric("Total no Período", f"R$ {total_real:,.2f}", f"{total_mil:.1f} mil")
+                                        card_col2.metric("Média Mensal", f"R$ {media_real:,.2f}", f"{media_mil:.1f} mil")
+                                    except Exception:
+                                        # Fallback simples caso st.metric tenha algum problema
+                                        card_col1.write(f"**Total no Período:** R$ {total_real:,.2f} (~{total_mil:.1f} mil)")
+                                        card_col2.write(f"**Média Mensal:** R$ {media_real:,.2f} (~{media_mil:.1f} mil)")
+
+                                    # Gráfico com os valores em milhares
+                                    fig_gasto_mensal = px.bar(
+                                        df_gasto_mensal,
+                                        x="mes",
+                                        y="valor_mil",
+                                        labels={"mes": "Mês", "valor_mil": "Valor (mil)"}
+                                    )
+                                    # adiciona rótulos com 1 casa decimal
+                                    fig_gasto_mensal.update_traces(text=df_gasto_mensal["rotulo"], textposition='outside')
+                                    if len(df_gasto_mensal) >= 3:
+                                        fig_gasto_mensal.add_hline(y=media_mil, line_dash="dash", line_color="red", annotation_text="Média mensal", annotation_position="top left")
+                                    st.plotly_chart(fig_gasto_mensal, use_container_width=True, height=350, key="chart_gasto_mensal")
+                                else:
+                                    st.info("Nenhum gasto mensal disponível para plotar.")
 
                             # Agora exibe a Tendência abaixo do gráfico de gasto mensal
-                            st.subheader("Tendência de Gastos (Regressão Linear)")
+                            st.subheader("Tendência de Gastos")
                             if not df_gasto_mensal.empty:
-                                meses_labels = df_gasto_mensal["mes"].tolist()
-                                df_gasto_mensal["mes_num"] = range(1, len(df_gasto_mensal) + 1)
-                                x = df_gasto_mensal["mes_num"].values.reshape(-1, 1)
-                                y = df_gasto_mensal["valor_final_pago"].values
-                                from sklearn.linear_model import LinearRegression
-                                model = LinearRegression()
-                                model.fit(x, y)
-                                x_pred = np.arange(1, len(df_gasto_mensal) + 7).reshape(-1, 1)
-                                y_pred = model.predict(x_pred)
-                                import calendar
-                                from datetime import datetime
-                                ult_mes = pd.to_datetime(df_gasto_mensal["mes"].iloc[-1], format="%B/%Y")
-                                proj_labels = []
-                                for i in range(1, 7):
-                                    next_month = ult_mes + pd.DateOffset(months=i)
-                                    proj_labels.append(next_month.strftime("%B/%Y"))
-                                x_labels = meses_labels + proj_labels
-                                # Converter y (valor_total) para milhares para exibição
-                                y_mil = y / 1000.0
-                                y_pred_mil = y_pred / 1000.0
-                                fig_tend = px.line(
-                                    x=x_labels[:len(y_mil)],
-                                    y=y_mil,
-                                    labels={"x": "Mês", "y": "Valor (mil)"}
-                                )
-                                # adicionar pontos/linhas de projeção em milhares
-                                fig_tend.add_scatter(
-                                    x=x_labels[len(y_mil):],
-                                    y=y_pred_mil[len(y_mil):],
-                                    mode="lines",
-                                    line=dict(dash="dot", color="orange"),
-                                    name="Projeção 6 meses"
+                                with profiling.secao("tendencia"):
+                                    metodo_projecao = st.selectbox(
+                                        "Método de projeção",
+                                        options=list(ROTULOS_PROJECAO),
+                                        format_func=ROTULOS_PROJECAO.get,
+                                        key="metodo_projecao"
+                                    )
+                                    meses_labels = df_gasto_mensal["mes"].tolist()
+                                    y = money.reais(df_gasto_mensal["valor_final_pago"].to_numpy())
+                                    # Memorizada pela série: reexecuções com os mesmos gastos não recalculam
+                                    projecao = forecast.projetar(y, metodo=metodo_projecao)
+                                    ult_mes = df_gasto_mensal["periodo"].iloc[-1]
+                                    proj_labels = [(ult_mes + i).strftime("%B/%Y") for i in range(1, len(projecao) + 1)]
+                                    # Valores em milhares para exibição
+                                    y_mil = df_gasto_mensal["valor_mil"].to_numpy()
+                                    fig_tend = px.line(
+                                        x=meses_labels,
+                                        y=y_mil,
+                                        labels={"x": "Mês", "y": "Valor (mil)"}
+                                    )
+                                    # faixa de confiança (95%) e projeção, em milhares
+                                    fig_tend.add_scatter(
+                                        x=proj_labels, y=projecao.superior / 1000.0, mode="lines",
+                                        line=dict(width=0), showlegend=False, hoverinfo="skip"
+                                    )
+                                    fig_tend.add_scatter(
+                                        x=proj_labels, y=projecao.inferior / 1000.0, mode="lines",
+                                        line=dict(width=0), fill="tonexty", fillcolor="rgba(255,165,0,0.2)",
+                                        name="Faixa de confiança (95%)"
+                                    )
+                                    fig_tend.add_scatter(
+                                        x=proj_labels,
+                                        y=projecao.previstos / 1000.0,
+                                        mode="lines",
+                                        line=dict(dash="dot", color="orange"),
+                                        name=f"Projeção {len(projecao)} meses"
+                                    )
+                                    # adicionar rótulos com 1 casa decimal nos pontos históricos
+                                    # os primeiros dados são o histórico (trace 0) e a projeção foi adicionada depois
+                                    if len(fig_tend.data) > 0:
+                                        try:
+                                            labels_hist = df_gasto_mensal["rotulo"].tolist()
+                                            fig_tend.data[0].update(mode='lines+markers+text', text=labels_hist, textposition='top center')
+                                        except Exception:
+                                            # fallback: apenas mostra markers se algo falhar
+                                            fig_tend.update_traces(mode='lines+markers')
+                                    st.plotly_chart(fig_tend, use_container_width=True, height=350, key="chart_tendencia")
+
+                            # =====================
+                            # Histórico de preço de um item (índice por código do produto)
+                            # =====================
+                            st.subheader("Histórico de Preço por Item")
+                            with profiling.secao("historico_precos"):
+                                chave_historico = (chave_dados, data_inicio, data_fim)
+                                if st.session_state.get("historico_precos", (None,))[0] != chave_historico:
+                                    st.session_state["historico_precos"] = (
+                                        chave_historico, HistoricoPrecos.de_itens(df_detalhadas_filtrado)
+                                    )
+                                historico_precos = st.session_state["historico_precos"][1]
+                                df_produtos = historico_precos.produtos()
+                                produto_escolhido = st.selectbox(
+                                    "Item",
+                                    options=df_produtos["chave"].tolist(),
+                                    format_func=dict(zip(df_produtos["chave"], df_produtos["descricao"])).get,
+                                    key="produto_historico"
                                 )
-                                # adicionar rótulos com 1 casa decimal nos pontos históricos
-                                # os primeiros dados são o histórico (trace 0) e a projeção foi adicionada depois
-                                if len(fig_tend.data) > 0:
-                                    try:
-                                        labels_hist = [f"{v:.1f} mil" for v in y_mil]
-                                        fig_tend.data[0].update(mode='lines+markers+text', text=labels_hist, textposition='top center')
-                                    except Exception:
-                                        # fallback: apenas mostra markers se algo falhar
-                                        fig_tend.update_traces(mode='lines+markers')
-                                st.plotly_chart(fig_tend, use_container_width=True, height=350, key="chart_tendencia")
+                                serie_preco = historico_precos.serie(produto_escolhido) if produto_escolhido else None
+                                if serie_preco is not None:
+                                    estatisticas_preco = serie_preco.estatisticas()
+                                    variacao_preco = serie_preco.variacao_ultima()
+                                    hist_col1, hist_col2, hist_col3 = st.columns(3)
+                                    # Série em centavos (services/price_history.py): reais só na exibição
+                                    hist_col1.metric("Último preço", money.formatar(serie_preco.precos[-1]),
+                                                     f"{variacao_preco['variacao_pct']:+.1f}% vs. compra anterior"
+                                                     if variacao_preco and variacao_preco["variacao_pct"] is not None else None,
+                                                     delta_color="inverse")
+                                    hist_col2.metric("Preço médio", money.formatar(round(estatisticas_preco["media"])))
+                                    hist_col3.metric("Registros", estatisticas_preco["n"])
+                                    df_serie = serie_preco.para_frame()
+                                    df_serie["preco"] = money.reais(df_serie["preco"].to_numpy())
+                                    df_serie["mercado"] = df_serie["mercado"].map(mapa_mercados.nome)
+                                    df_serie["media_movel"] = money.reais(serie_preco.media_movel(min(3, len(serie_preco))))
+                                    fig_historico = px.line(
+                                        df_serie, x="data", y="preco", color="mercado", markers=True,
+                                        labels={"data": "Data", "preco": "Preço unitário (R$)", "mercado": "Mercado"}
+                                    )
+                                    if len(serie_preco) >= 3:
+                                        fig_historico.add_scatter(
+                                            x=df_serie["data"], y=df_serie["media_movel"], mode="lines",
+                                            line=dict(dash="dot", color="gray"), name="Média móvel (3)"
+                                        )
+                                    st.plotly_chart(fig_historico, use_container_width=True, height=350, key="chart_historico_preco")
 
                             # =====================
                             # ANÁLISE FINAL: Preço médio dos itens no período selecionado
                             # =====================
                             st.subheader("Preço Médio dos Itens no Período Selecionado")
-                            df_media_itens = df_detalhadas_filtrado.groupby("descricao").agg(
-                                media=("valor_unitario", "mean"),
-                                maximo=("valor_unitario", "max"),
-                                minimo=("valor_unitario", "min"),
-                                qtd_registro=("valor_unitario", "count")
-                            ).reset_index()
-                            df_media_itens = df_media_itens.rename(columns={
-                                "descricao": "Descrição", "media": "Média", "maximo": "Máx.", "minimo": "Mín.", "qtd_registro": "Qtd. Registro"
-                            })
                             st.dataframe(
-                                df_media_itens[["Descrição", "Média", "Máx.", "Mín.", "Qtd. Registro"]],
+                                analise.preco_medio.rename(columns={
+                                    "descricao": "Descrição", "media": "Média", "maximo": "Máx.", "minimo": "Mín.", "qtd_registro": "Qtd. Registro"
+                                }),
                                 use_container_width=True
                             )
                         else:
@@ -292,6 +408,12 @@ if st.button("🔍 Buscar Minhas Compras", type="primary"):
                 else:
                     st.error(f"❌ Erro ao buscar compras: {e}")
 
+# Marca a execução como completa (só com PERFILAR_PAGINAS=1; ver a página "Desempenho")
+profiling.fechar_execucao("Analisar Compras")
+
+# Consultas ao banco nesta execução (só com RASTREAR_CONSULTAS=1, para administradores)
+tracing.painel_lateral()
+
 # Rodapé
 st.markdown("---")
 st.markdown(
@@ -1,15 +1,19 @@
 import streamlit as st
 from services import db_queries
+from services import tracing
 from services.supabase_client import (
     require_authentication, 
     get_user_email, 
     get_user_id,
     supabase
 )
-import pandas as pd
+from services.cache import invalidar_tabelas
 
 st.set_page_config(page_title="Gerenciar Mercados", layout="wide")
 
+# Arquiva as consultas da execução anterior (só com RASTREAR_CONSULTAS=1)
+tracing.iniciar_execucao("Mercados")
+
 require_authentication()
 
 # Definir tabs corretamente
@@ -19,8 +23,10 @@ with tab1:
     st.subheader("🏪 Mercados Cadastrados")
     st.write("Veja todos os mercados disponíveis para registrar suas compras.")
     try:
-        mercados = supabase.table("mercados").select("*").order("nome", desc=False).execute().data
+        mercados = db_queries.buscar_mercados()
         if mercados:
+            # pandas só é carregado quando há mercados para exibir
+            import pandas as pd
             df_mercados = pd.DataFrame(mercados)
             # Exibe os campos concatenados
             df_mercados["Mercado"] = (
@@ -86,6 +92,7 @@ with tab2:
                         st.warning("⚠️ Já existe um mercado com este nome nesta cidade.")
                     else:
                         response = supabase.table("mercados").insert(mercado_data).execute()
+                        invalidar_tabelas("mercados")
                         if response.data:
                             st.success("✅ Mercado adicionado com sucesso!")
                             st.balloons()
@@ -111,6 +118,9 @@ with st.expander("ℹ️ Sobre a Funcionalidade Comunitária"):
     - Utilize o nome oficial e um endereço completo
     """)
 
+# Consultas ao banco nesta execução (só com RASTREAR_CONSULTAS=1, para administradores)
+tracing.painel_lateral()
+
 # Rodapé
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,103 @@
+import streamlit as st
+from services import profiling
+from services import tracing
+from services.supabase_client import (
+    require_authentication,
+    is_admin_user
+)
+import datetime
+import statistics
+
+st.set_page_config(page_title="Desempenho", layout="wide")
+
+# Arquiva as consultas da execução anterior (só com RASTREAR_CONSULTAS=1)
+tracing.iniciar_execucao("Desempenho")
+# Arquiva como incompleta uma execução de outra página que não chegou ao fim (só com PERFILAR_PAGINAS=1)
+profiling.iniciar_execucao("Desempenho")
+
+require_authentication()
+if not is_admin_user():
+    st.error("🚫 Esta página é restrita a administradores.")
+    st.stop()
+
+st.title("⏱️ Desempenho das Páginas")
+st.write("Tempo e pico de memória das seções medidas nas últimas execuções de cada página.")
+
+if not profiling.ativo():
+    st.info("O perfil está desligado. Inicie o app com a variável de ambiente `PERFILAR_PAGINAS=1` para registrar as execuções.")
+    st.stop()
+
+paginas = profiling.paginas()
+if not paginas:
+    st.info("Nenhuma execução registrada ainda. Use as páginas do app e volte aqui.")
+    st.stop()
+
+col_pagina, col_limpar = st.columns([4, 1])
+with col_pagina:
+    pagina = st.selectbox("Página", options=paginas, key="pagina_perfil")
+with col_limpar:
+    if st.button("🗑️ Limpar histórico", key="limpar_perfil"):
+        profiling.limpar(pagina)
+        st.rerun()
+
+execucoes = profiling.historico(pagina)
+totais_ms = [execucao["total_segundos"] * 1000 for execucao in execucoes]
+# Execuções que não chegaram ao fim da página (st.rerun(), exceção) só medem parte dela
+totais_completas_ms = [total for total, execucao in zip(totais_ms, execucoes) if execucao["completa"]]
+ultima = execucoes[-1]
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Execuções guardadas", len(execucoes), help=f"{len(execucoes) - len(totais_completas_ms)} incompleta(s)")
+col2.metric("Última execução", f"{totais_ms[-1]:.0f} ms" + ("" if ultima["completa"] else " (incompleta)"))
+col3.metric("Mediana (completas)", f"{statistics.median(totais_completas_ms):.0f} ms" if totais_completas_ms else "—")
+col4.metric("Pico de memória (última)", f"{ultima['pico_bytes'] / 1024 ** 2:.1f} MB" if ultima["pico_bytes"] else "—")
+
+# pandas e plotly só são carregados quando há execuções para exibir (não para quem não é administrador)
+import pandas as pd
+import plotly.express as px
+
+# Tempo total das seções em cada execução guardada
+st.subheader("Tempo por Execução")
+df_execucoes = pd.DataFrame({
+    "Execução": [datetime.datetime.fromtimestamp(execucao["fim"]).strftime("%H:%M:%S") for execucao in execucoes],
+    "Tempo (ms)": totais_ms,
+    "Completa": ["Sim" if execucao["completa"] else "Não" for execucao in execucoes]
+})
+fig_execucoes = px.line(df_execucoes, x="Execução", y="Tempo (ms)", markers=True, hover_data=["Completa"])
+st.plotly_chart(fig_execucoes, use_container_width=True, height=300, key="chart_execucoes_perfil")
+
+# Estatísticas de cada seção no histórico
+st.subheader("Seções")
+df_resumo = pd.DataFrame(profiling.resumo_secoes(execucoes))
+df_resumo["secao"] = ["  " * nivel + nome for nome, nivel in zip(df_resumo["secao"], df_resumo["nivel"])]
+st.dataframe(
+    df_resumo.drop(columns=["nivel"]).rename(columns={
+        "secao": "Seção", "execucoes": "Execuções", "media_ms": "Média (ms)", "mediana_ms": "Mediana (ms)",
+        "p95_ms": "p95 (ms)", "max_ms": "Máx. (ms)", "pico_max_kb": "Pico máx. (KB)"
+    }).round(1),
+    use_container_width=True, hide_index=True
+)
+
+# Detalhe da última execução, na ordem em que as seções terminaram
+st.subheader("Última Execução")
+df_ultima = pd.DataFrame(ultima["secoes"])
+df_ultima["ms"] = (df_ultima["segundos"] * 1000).round(1)
+df_ultima["pico_kb"] = (df_ultima["pico_bytes"] / 1024).round(1)
+fig_ultima = px.bar(
+    df_ultima[df_ultima["nivel"] == 0],
+    x="ms",
+    y="secao",
+    orientation="h",
+    labels={"ms": "Tempo (ms)", "secao": "Seção"}
+)
+fig_ultima.update_layout(yaxis={'categoryorder': 'total ascending'})
+st.plotly_chart(fig_ultima, use_container_width=True, height=350, key="chart_ultima_perfil")
+st.dataframe(
+    df_ultima[["secao", "nivel", "ms", "pico_kb", "erro"]].rename(columns={
+        "secao": "Seção", "nivel": "Nível", "ms": "Tempo (ms)", "pico_kb": "Pico (KB)", "erro": "Erro"
+    }),
+    use_container_width=True, hide_index=True
+)
+
+# Consultas ao banco nesta execução (só com RASTREAR_CONSULTAS=1, para administradores)
+tracing.painel_lateral()
@@ -4,7 +4,8 @@ from services.supabase_client import (
     get_current_user, 
     is_user_authenticated, 
     logout_user,
-    get_user_email
+    get_user_email,
+    limpar_identidade
 )
 import re
 
@@ -79,6 +80,7 @@ else:
                             })
                             
                             if response.user:
+                                limpar_identidade()
                                 st.success("✅ Login realizado com sucesso!")
                                 st.balloons()
                                 st.rerun()
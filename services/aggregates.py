@@ -0,0 +1,69 @@
+import pandas as pd
+
+from services import db_queries, frames
+
+# Frequência do pandas para cada granularidade de `gastos_periodo`
+# (semanas começando na segunda-feira, como o date_trunc('week') do PostgreSQL)
+FREQUENCIAS = {"mes": "M", "semana": "W-SUN"}
+
+
+def _periodos_completos(inicio, fim, freq):
+    """Primeiro e último período inteiramente contidos em [inicio, fim] (ou None se não houver)"""
+    primeiro = pd.Period(inicio, freq=freq)
+    ultimo = pd.Period(fim, freq=freq)
+    if primeiro.start_time.date() != inicio:
+        primeiro += 1
+    if ultimo.end_time.date() != fim:
+        ultimo -= 1
+    return (primeiro, ultimo) if primeiro <= ultimo else None
+
+
+def gastos_por_periodo(inicio, fim, mercado_ids, df_cabecalho, granularidade="mes"):
+    """
+    Retorna um DataFrame com as colunas "periodo" (pd.Period) e "valor_final_pago"
+    (int64, em centavos), uma linha por período com compras, em ordem cronológica.
+
+    Os períodos inteiramente contidos em [inicio, fim] são lidos dos agregados do banco;
+    os períodos parciais das bordas são somados a partir de `df_cabecalho` (as compras
+    do intervalo, já filtradas pelos mercados, no formato de services/frames.py). Se a tabela de agregados não existir,
+    tudo é calculado a partir de `df_cabecalho`.
+    """
+    freq = FREQUENCIAS[granularidade]
+    completos = _periodos_completos(inicio, fim, freq)
+    partes = []
+
+    if completos:
+        try:
+            linhas = db_queries.get_gastos_agregados(
+                completos[0].start_time.date(), completos[1].start_time.date(),
+                granularidade=granularidade, mercado_ids=mercado_ids
+            )
+            df_agregado = pd.DataFrame(linhas or [], columns=["periodo", "valor_final_pago"])
+            df_agregado["periodo"] = pd.PeriodIndex(pd.to_datetime(df_agregado["periodo"]), freq=freq)
+            df_agregado["valor_final_pago"] = df_agregado["valor_final_pago"].astype("int64")
+            partes.append(df_agregado)
+        except Exception as e:
+            if not db_queries.recurso_inexistente(e):
+                raise
+            completos = None
+
+    if not df_cabecalho.empty:
+        df_local = pd.DataFrame({
+            "periodo": pd.Series(frames.datas(df_cabecalho["data_compra"])).dt.to_period(freq),
+            "valor_final_pago": df_cabecalho["valor_final_pago"].to_numpy(dtype="int64", na_value=0)
+        })
+        if completos:
+            df_local = df_local[(df_local["periodo"] < completos[0]) | (df_local["periodo"] > completos[1])]
+        partes.append(df_local)
+
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame({
+            "periodo": pd.PeriodIndex([], freq=freq),
+            "valor_final_pago": pd.Series([], dtype="int64")
+        })
+    return (
+        pd.concat(partes, ignore_index=True)
+        .groupby("periodo", sort=True)["valor_final_pago"].sum()
+        .reset_index()
+    )
@@ -0,0 +1,185 @@
+"""
+Estatísticas da página "Analisar Compras", calculadas fora da página.
+
+As estatísticas por item saem de uma única passada sobre os itens do período: as linhas
+são agrupadas por (código, descrição) com uma ordenação dos códigos de grupo, e média,
+máximo, mínimo e contagem são reduções do NumPy sobre as fatias contíguas de cada grupo.
+A tabela de preço médio por descrição é derivada desses grupos (somas e contagens), sem
+reler os itens. Os gastos por mês vêm de `gastos_por_periodo`.
+
+`analisar` devolve uma `AnaliseCompras` memorizada por usuário, período, conjunto de
+mercados, origem dos dados (snapshot local ou banco) e versão das tabelas de compras: reexecuções da página com os mesmos filtros
+não recalculam nada, e registrar ou remover uma compra descarta o resultado.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from services import db_queries, frames
+from services.aggregates import gastos_por_periodo
+from services.cache import CacheLRU, versao_tabelas
+from utils import money
+
+# Itens exibidos nos gráficos de aumento e redução de preço
+TOP_VARIACOES = 10
+
+_analises = CacheLRU(max_itens=16, ttl=600)
+
+
+class AnaliseCompras:
+    """
+    Resultado de `analisar`:
+    - `itens`: por (código, descrição), colunas media, maximo, minimo, count, var_max, var_min;
+    - `aumento` / `reducao`: os itens (comprados mais de uma vez) com maior variação do preço
+      máximo / mínimo em relação à média, com o rótulo "rotulo" já formatado;
+    - `preco_medio`: por descrição, colunas media, maximo, minimo, qtd_registro;
+    - `gasto_mensal`: colunas periodo, valor_final_pago (centavos), mes, valor_mil e rotulo;
+    - `total_periodo` e `media_mensal`, em reais (somados em centavos);
+    - `segundos`: tempo do cálculo (o da primeira chamada, para resultados memorizados).
+    """
+
+    def __init__(self, itens, preco_medio, gasto_mensal, segundos, top=TOP_VARIACOES):
+        self.itens = itens
+        self.preco_medio = preco_medio
+        self.gasto_mensal = gasto_mensal
+        self.segundos = segundos
+        repetidos = itens[itens["count"] > 1]
+        self.aumento = _com_rotulo(_maiores(repetidos[repetidos["var_max"] > 0], "var_max", top, decrescente=True),
+                                   "var_max", "{:.1f}%")
+        self.reducao = _com_rotulo(_maiores(repetidos[repetidos["var_min"] < 0], "var_min", top, decrescente=False),
+                                   "var_min", "{:.1f}%")
+        valores = gasto_mensal["valor_final_pago"].to_numpy(dtype=np.int64)
+        total = int(valores.sum())
+        self.total_periodo = money.reais(total)
+        self.media_mensal = total / len(valores) / money.CENTAVOS_POR_REAL if len(valores) else 0.0
+
+
+def _maiores(df, coluna, top, decrescente):
+    valores = df[coluna].to_numpy()
+    ordem = np.argsort(-valores if decrescente else valores, kind="stable")[:top]
+    return df.iloc[ordem].reset_index(drop=True)
+
+
+def _com_rotulo(df, coluna, formato):
+    df = df.copy()
+    df["rotulo"] = [formato.format(v) for v in df[coluna].to_numpy()]
+    return df
+
+
+def _fatias(grupos):
+    """Ordem que deixa cada grupo numa fatia contígua e o início de cada fatia"""
+    ordem = np.argsort(grupos, kind="stable")
+    ordenados = grupos[ordem]
+    return ordem, np.flatnonzero(np.r_[True, ordenados[1:] != ordenados[:-1]])
+
+
+def _frames_vazios(colunas_itens):
+    return (
+        pd.DataFrame(columns=colunas_itens + ["media", "maximo", "minimo", "count", "var_max", "var_min"]),
+        pd.DataFrame(columns=["descricao", "media", "maximo", "minimo", "qtd_registro"]),
+    )
+
+
+def estatisticas_itens(df_detalhadas):
+    """
+    Estatísticas de preço unitário por (código, descrição) e por descrição, numa única
+    passada sobre os itens (frame de services/frames.py, preços em centavos).
+    Retorna (itens, preco_medio), em reais; veja `AnaliseCompras`.
+    Itens sem descrição ou sem preço são ignorados, como no groupby do pandas.
+    """
+    tem_codigo = "codigo" in df_detalhadas.columns
+    colunas_itens = ["codigo", "descricao"] if tem_codigo else ["descricao"]
+    if df_detalhadas.empty:
+        return _frames_vazios(colunas_itens)
+
+    cod_descricao, descricoes = pd.factorize(df_detalhadas["descricao"], sort=True)
+    if tem_codigo:
+        cod_codigo, codigos = pd.factorize(df_detalhadas["codigo"], sort=True)
+    else:
+        cod_codigo, codigos = np.zeros(len(df_detalhadas), dtype=np.intp), pd.Index([])
+    # Preços em centavos (services/frames.py): somas, máximos e mínimos exatos em inteiros
+    valores = df_detalhadas["valor_unitario"]
+    precos = valores.to_numpy(dtype=np.int64, na_value=0)
+    validas = (cod_descricao >= 0) & valores.notna().to_numpy()
+    if not validas.any():
+        return _frames_vazios(colunas_itens)
+
+    # Um código de grupo por linha, em ordem de (código, descrição); código ausente (-1) vira 0
+    n_descricoes = len(descricoes)
+    grupos = (cod_codigo[validas].astype(np.int64) + 1) * n_descricoes + cod_descricao[validas]
+    ordem, inicios = _fatias(grupos)
+    precos = precos[validas][ordem]
+    grupos = grupos[ordem][inicios]
+    soma = np.add.reduceat(precos, inicios)
+    maximo = np.maximum.reduceat(precos, inicios)
+    minimo = np.minimum.reduceat(precos, inicios)
+    contagem = np.diff(np.r_[inicios, len(precos)])
+    grupo_codigo, grupo_descricao = grupos // n_descricoes - 1, grupos % n_descricoes
+
+    # Por descrição: combina os grupos (inclusive os sem código, que o groupby por código descarta)
+    ordem_d, inicios_d = _fatias(grupo_descricao)
+    contagem_d = np.add.reduceat(contagem[ordem_d], inicios_d)
+    preco_medio = pd.DataFrame({
+        "descricao": descricoes.take(grupo_descricao[ordem_d][inicios_d]),
+        "media": np.add.reduceat(soma[ordem_d], inicios_d) / contagem_d / frames.CENTAVOS_POR_REAL,
+        "maximo": np.maximum.reduceat(maximo[ordem_d], inicios_d) / frames.CENTAVOS_POR_REAL,
+        "minimo": np.minimum.reduceat(minimo[ordem_d], inicios_d) / frames.CENTAVOS_POR_REAL,
+        "qtd_registro": contagem_d,
+    })
+
+    # Estatísticas por item em reais, para exibição
+    com_codigo = grupo_codigo >= 0
+    media = soma[com_codigo] / contagem[com_codigo] / frames.CENTAVOS_POR_REAL
+    maximo = maximo[com_codigo] / frames.CENTAVOS_POR_REAL
+    minimo = minimo[com_codigo] / frames.CENTAVOS_POR_REAL
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_max = (maximo - media) / media * 100
+        var_min = (minimo - media) / media * 100
+    itens = pd.DataFrame({
+        **({"codigo": codigos.take(grupo_codigo[com_codigo])} if tem_codigo else {}),
+        "descricao": descricoes.take(grupo_descricao[com_codigo]),
+        "media": media,
+        "maximo": maximo,
+        "minimo": minimo,
+        "count": contagem[com_codigo],
+        "var_max": var_max,
+        "var_min": var_min,
+    })
+    return itens, preco_medio
+
+
+def gasto_mensal(data_inicio, data_fim, mercado_ids, df_cabecalho):
+    """Gastos por mês do período (em centavos), com o rótulo do mês e o valor em milhares de reais"""
+    df = gastos_por_periodo(data_inicio, data_fim, mercado_ids, df_cabecalho, granularidade="mes")
+    df["mes"] = df["periodo"].dt.strftime("%B/%Y")
+    df["valor_mil"] = money.reais(df["valor_final_pago"].to_numpy()) / 1000.0
+    df["rotulo"] = [f"{v:.1f} mil" for v in df["valor_mil"].to_numpy()]
+    return df
+
+
+def analisar(df_cabecalho, df_detalhadas, data_inicio, data_fim, mercado_ids, user_id, origem=None,
+             top=TOP_VARIACOES):
+    """
+    Estatísticas do período (ver `AnaliseCompras`), memorizadas por (usuário, período,
+    mercados, origem, versão das tabelas de compras). `origem` identifica de onde vieram os
+    frames, ex.: ("snapshot", ..., sincronização) ou ("banco", ..., versão do store): o snapshot
+    pode estar atrás ou à frente do que a versão das tabelas desta sessão indica.
+    """
+    chave = (
+        user_id, str(data_inicio), str(data_fim), tuple(sorted(mercado_ids or ())), origem, top,
+        versao_tabelas(*db_queries.TABELAS_COMPRAS_DETALHADAS),
+    )
+    encontrado, analise = _analises.get(chave)
+    if encontrado:
+        return analise
+    inicio = time.perf_counter()
+    itens, preco_medio = estatisticas_itens(df_detalhadas)
+    mensal = gasto_mensal(data_inicio, data_fim, mercado_ids, df_cabecalho)
+    analise = AnaliseCompras(itens, preco_medio, mensal, time.perf_counter() - inicio, top)
+    _analises.set(chave, analise)
+    return analise
+
+
+def limpar_cache():
+    _analises.limpar()
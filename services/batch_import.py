@@ -0,0 +1,225 @@
+"""
+Importação em lote de notas fiscais (NFC-e) em PDF.
+
+Os PDFs são lidos em paralelo em um pool de processos (um por núcleo), as notas
+já registradas são descartadas pelo hash do arquivo (antes da leitura) e pela chave
+de acesso, e as restantes são gravadas com a mesma rotina de registro da página
+"Registrar Compras".
+
+Uso pela linha de comando:
+    python -m services.batch_import caminho/para/pasta nota1.pdf ... --email usuario@exemplo.com
+A senha é lida da variável de ambiente SUPABASE_PASSWORD ou pedida no terminal.
+"""
+import argparse
+import getpass
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services import db_queries
+from services.parse_cache import hash_arquivo
+from services.supabase_client import get_user_id, supabase
+from utils.pdf_reader import ler_nota_bytes
+
+
+def listar_pdfs(caminhos):
+    """Expande pastas em seus arquivos .pdf e retorna a lista de caminhos, ordenada"""
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, nomes in os.walk(caminho):
+                arquivos.extend(os.path.join(raiz, nome) for nome in nomes if nome.lower().endswith(".pdf"))
+        else:
+            arquivos.append(caminho)
+    return sorted(arquivos)
+
+
+def ler_notas(arquivos, max_processos=None):
+    """
+    Lê as notas em paralelo. `arquivos` é uma lista de tuplas (nome, conteúdo em bytes).
+    Retorna a lista de notas na mesma ordem, no formato de `pdf_reader.ler_nota_bytes`.
+    """
+    if not arquivos:
+        return []
+    max_processos = max_processos or os.cpu_count() or 1
+    if max_processos == 1 or len(arquivos) == 1:
+        return [ler_nota_bytes(nome, conteudo) for nome, conteudo in arquivos]
+    nomes = [nome for nome, _ in arquivos]
+    conteudos = [conteudo for _, conteudo in arquivos]
+    # "spawn": o servidor do Streamlit tem outras threads (tornado, pool HTTP, locks do cache);
+    # um fork copiaria locks que elas seguram e os processos poderiam travar
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(max_processos, len(arquivos)), mp_context=contexto) as pool:
+        return list(pool.map(ler_nota_bytes, nomes, conteudos, chunksize=4))
+
+
+def _mapa_mercados_por_cnpj():
+    mapa = {}
+    for mercado in db_queries.buscar_mercados() or []:
+        cnpj = re.sub(r"\D", "", mercado.get("cnpj") or "")
+        if cnpj:
+            mapa[cnpj] = mercado["id"]
+    return mapa
+
+
+def importar_notas(notas, mercado_padrao_id=None, ao_processar=None):
+    """
+    Registra as notas lidas, ignorando as repetidas e as já registradas pelo usuário.
+    O mercado é identificado pelo CNPJ da nota; se não for encontrado, usa `mercado_padrao_id`.
+    `ao_processar(indice, total, resultado)` é chamado após cada nota.
+    Retorna uma lista de resultados {"nome", "status", "itens", "mensagem"}.
+    """
+    user_id = get_user_id()
+    if not user_id:
+        raise RuntimeError("Usuário não autenticado.")
+
+    mercados_por_cnpj = _mapa_mercados_por_cnpj()
+    chaves = {nota["chave_acesso"] for nota in notas if nota.get("chave_acesso")}
+    chaves_vistas = db_queries.buscar_chaves_registradas(chaves) if chaves else set()
+    hashes_vistos = set()
+
+    resultados = []
+    for indice, nota in enumerate(notas, 1):
+        resultado = {"nome": nota["nome"], "status": "registrada", "itens": 0, "mensagem": ""}
+        chave = nota.get("chave_acesso")
+        hash_nota = nota.get("hash_arquivo")
+        mercado_id = mercados_por_cnpj.get(nota.get("cnpj") or "", mercado_padrao_id)
+        if nota.get("erro"):
+            resultado.update(status="erro", mensagem=nota["erro"])
+        elif nota.get("registrada"):
+            resultado.update(status="duplicada", mensagem="Arquivo já registrado.")
+        elif not nota["itens"]:
+            resultado.update(status="erro", mensagem="Nenhum item encontrado no PDF.")
+        elif (chave and chave in chaves_vistas) or (hash_nota and hash_nota in hashes_vistos):
+            resultado.update(status="duplicada", mensagem="Nota já registrada.")
+        elif not nota.get("data_emissao"):
+            resultado.update(status="erro", mensagem="Data de emissão não encontrada.")
+        elif not mercado_id:
+            resultado.update(status="erro", mensagem=f"Mercado com CNPJ {nota.get('cnpj')} não cadastrado.")
+        else:
+            # Centavos (utils/money.py): a soma dos itens é exata
+            valor_total = sum(item["valor_total"] for item in nota["itens"])
+            cabecalho = {
+                "mercado_id": mercado_id,
+                "data_compra": nota["data_emissao"],
+                "valor_total": valor_total,
+                "descontos": 0,
+                "valor_final_pago": valor_total
+            }
+            if chave:
+                cabecalho["chave_acesso"] = chave
+            if hash_nota:
+                cabecalho["hash_arquivo"] = hash_nota
+            try:
+                compra_id, itens_registrados, falhas = db_queries.registrar_compra_completa(
+                    cabecalho, nota["itens"], user_id
+                )
+                resultado["itens"] = itens_registrados
+                if not compra_id:
+                    resultado.update(status="erro", mensagem="Nenhum item foi registrado.")
+                elif falhas:
+                    resultado.update(status="parcial", mensagem=f"{len(falhas)} lote(s) de itens falharam.")
+                if compra_id and chave:
+                    chaves_vistas.add(chave)
+                if compra_id and hash_nota:
+                    hashes_vistos.add(hash_nota)
+            except db_queries.CompraDuplicada:
+                resultado.update(status="duplicada", mensagem="Compra já registrada.")
+            except Exception as e:
+                resultado.update(status="erro", mensagem=str(e))
+        resultados.append(resultado)
+        if ao_processar:
+            ao_processar(indice, len(notas), resultado)
+    return resultados
+
+
+def importar_arquivos(arquivos, mercado_padrao_id=None, max_processos=None, ao_processar=None):
+    """
+    Lê e registra um lote de PDFs (lista de tuplas (nome, bytes)).
+    Arquivos já registrados (mesmo hash) não são lidos.
+    Retorna (resultados, estatisticas), com a vazão medida em notas/s e itens/s.
+    """
+    inicio = time.perf_counter()
+    hashes = [hash_arquivo(conteudo) for _, conteudo in arquivos]
+    registrados = db_queries.buscar_hashes_registrados(set(hashes)) if hashes else set()
+    lidas = iter(ler_notas(
+        [arquivo for arquivo, hash_nota in zip(arquivos, hashes) if hash_nota not in registrados],
+        max_processos=max_processos
+    ))
+    notas = []
+    for (nome, _), hash_nota in zip(arquivos, hashes):
+        if hash_nota in registrados:
+            nota = {"nome": nome, "erro": None, "chave_acesso": None, "cnpj": None,
+                    "data_emissao": None, "itens": [], "registrada": True}
+        else:
+            nota = next(lidas)
+        notas.append({**nota, "hash_arquivo": hash_nota})
+    tempo_leitura = time.perf_counter() - inicio
+    resultados = importar_notas(notas, mercado_padrao_id=mercado_padrao_id, ao_processar=ao_processar)
+    tempo_total = time.perf_counter() - inicio
+
+    itens_lidos = sum(len(nota["itens"]) for nota in notas)
+    itens_registrados = sum(r["itens"] for r in resultados)
+    estatisticas = {
+        "notas": len(notas),
+        "notas_registradas": sum(1 for r in resultados if r["status"] in ("registrada", "parcial")),
+        "notas_duplicadas": sum(1 for r in resultados if r["status"] == "duplicada"),
+        "notas_com_erro": sum(1 for r in resultados if r["status"] == "erro"),
+        "itens_lidos": itens_lidos,
+        "itens_registrados": itens_registrados,
+        "tempo_leitura_s": tempo_leitura,
+        "tempo_total_s": tempo_total,
+        "notas_por_s": len(notas) / tempo_total if tempo_total else 0.0,
+        "itens_por_s": itens_registrados / tempo_total if tempo_total else 0.0,
+        "leitura_notas_por_s": len(notas) / tempo_leitura if tempo_leitura else 0.0,
+        "leitura_itens_por_s": itens_lidos / tempo_leitura if tempo_leitura else 0.0,
+    }
+    return resultados, estatisticas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa em lote notas fiscais (NFC-e) em PDF.")
+    parser.add_argument("caminhos", nargs="+", help="Arquivos PDF ou pastas contendo PDFs")
+    parser.add_argument("--email", required=True, help="Email da conta no Supabase")
+    parser.add_argument("--mercado-id", type=int, default=None,
+                        help="Mercado usado quando o CNPJ da nota não estiver cadastrado")
+    parser.add_argument("--processos", type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+    args = parser.parse_args(argv)
+
+    arquivos_pdf = listar_pdfs(args.caminhos)
+    if not arquivos_pdf:
+        print("Nenhum PDF encontrado.")
+        return 1
+
+    senha = os.getenv("SUPABASE_PASSWORD") or getpass.getpass("Senha: ")
+    supabase.auth.sign_in_with_password({"email": args.email, "password": senha})
+
+    arquivos = []
+    for caminho in arquivos_pdf:
+        with open(caminho, "rb") as f:
+            arquivos.append((caminho, f.read()))
+
+    def mostrar(indice, total, resultado):
+        print(f"[{indice}/{total}] {resultado['status']:<10} {resultado['nome']} {resultado['mensagem']}")
+
+    _, estatisticas = importar_arquivos(
+        arquivos, mercado_padrao_id=args.mercado_id, max_processos=args.processos, ao_processar=mostrar
+    )
+    print(
+        f"\n{estatisticas['notas_registradas']} de {estatisticas['notas']} notas registradas "
+        f"({estatisticas['notas_duplicadas']} duplicadas, {estatisticas['notas_com_erro']} com erro) "
+        f"em {estatisticas['tempo_total_s']:.1f} s"
+    )
+    print(
+        f"Vazão: {estatisticas['notas_por_s']:.2f} notas/s, {estatisticas['itens_por_s']:.1f} itens/s "
+        f"(leitura dos PDFs: {estatisticas['leitura_notas_por_s']:.2f} notas/s, "
+        f"{estatisticas['leitura_itens_por_s']:.1f} itens/s)"
+    )
+    return 0 if estatisticas["notas_com_erro"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
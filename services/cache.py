@@ -0,0 +1,129 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from services.supabase_client import get_user_id
+
+# ======================
+# CACHE LRU COM TTL
+# ======================
+
+class CacheLRU:
+    """Cache em memória com validade (TTL) e limite de itens (descarta o menos usado)"""
+
+    def __init__(self, max_itens=128, ttl=300):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        """Retorna (encontrado, valor). Entradas expiradas são descartadas."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return False, None
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return False, None
+            self._dados.move_to_end(chave)
+            return True, valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+# Caches registrados para cada tabela lida, usados na invalidação
+_caches_por_tabela = {}
+# Contador de escritas por tabela, para quem guarda dados fora destes caches
+_versoes_por_tabela = {}
+_lock_registro = threading.Lock()
+
+
+def _usuario_atual():
+    """Id do usuário da sessão (servido pela identidade em memória)"""
+    try:
+        return get_user_id()
+    except Exception:
+        return None
+
+
+def _congelar(valor):
+    """Converte argumentos em algo que possa ser usado como chave do cache"""
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        itens = [_congelar(v) for v in valor]
+        return tuple(sorted(itens, key=repr)) if isinstance(valor, (set, frozenset)) else tuple(itens)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    return valor if isinstance(valor, (str, int, float, bool, type(None))) else str(valor)
+
+
+def cache_leitura(tabelas, ttl=300, max_itens=128, por_usuario=True):
+    """
+    Decorador para funções de leitura do banco.
+    O resultado fica guardado por `ttl` segundos, com chave formada pelo usuário
+    atual (se `por_usuario`) e pelos argumentos da chamada. Qualquer escrita em
+    uma das `tabelas` (ver `invalidar_tabelas`) descarta os resultados guardados.
+    """
+    def decorador(funcao):
+        cache = CacheLRU(max_itens=max_itens, ttl=ttl)
+        with _lock_registro:
+            for tabela in tabelas:
+                _caches_por_tabela.setdefault(tabela, []).append(cache)
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            chave = (
+                _usuario_atual() if por_usuario else None,
+                _congelar(args),
+                _congelar(kwargs),
+            )
+            encontrado, valor = cache.get(chave)
+            if encontrado:
+                return valor
+            valor = funcao(*args, **kwargs)
+            cache.set(chave, valor)
+            return valor
+
+        wrapper.cache = cache
+        return wrapper
+    return decorador
+
+
+def invalidar_tabelas(*tabelas):
+    """Descarta os resultados em cache de todas as leituras que dependem das tabelas"""
+    for tabela in tabelas:
+        _versoes_por_tabela[tabela] = _versoes_por_tabela.get(tabela, 0) + 1
+        for cache in _caches_por_tabela.get(tabela, []):
+            cache.limpar()
+
+
+def versao_tabelas(*tabelas):
+    """Retorna uma tupla que muda sempre que alguma das tabelas for invalidada"""
+    return tuple(_versoes_por_tabela.get(tabela, 0) for tabela in tabelas)
+
+
+def escrita(*tabelas):
+    """Decorador para funções de escrita: invalida o cache das tabelas após a chamada"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                invalidar_tabelas(*tabelas)
+        return wrapper
+    return decorador
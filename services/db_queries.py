@@ -1,67 +1,294 @@
 from services.supabase_client import supabase
+from services.cache import cache_leitura, escrita
+from utils import impressao_digital, money
+
+# Toda leitura de compras devolve os valores monetários (colunas numeric em reais) em
+# centavos, com `money.linhas_de_banco`; as gravações convertem de volta com `money.para_banco`.
+
+# Tabelas das quais a RPC de compras detalhadas depende
+TABELAS_COMPRAS_DETALHADAS = ("compras_cabecalho", "compras_itens", "mercados")
+
+# ======================
+# PLANOS DE CONSULTA (compartilhados com db_queries_async)
+# ======================
+
+# Um plano é um gerador que monta as consultas e trata as respostas sem executar nada:
+# cada `yield` entrega uma consulta (ou uma tupla de consultas independentes) e recebe
+# a resposta (ou a tupla de respostas); o `return` é o resultado já convertido. Um erro da
+# consulta é lançado de volta no plano, no ponto do `yield`. `executar_plano` roda um plano
+# com o cliente síncrono; `db_queries_async` roda os mesmos planos com o assíncrono.
+
+def executar_plano(plano):
+    """Roda um plano de consulta executando as consultas uma a uma"""
+    resposta, erro = None, None
+    while True:
+        try:
+            consulta = plano.throw(erro) if erro is not None else plano.send(resposta)
+        except StopIteration as fim:
+            return fim.value
+        try:
+            if isinstance(consulta, tuple):
+                resposta = tuple(c.execute() for c in consulta)
+            else:
+                resposta = consulta.execute()
+            erro = None
+        except Exception as e:
+            resposta, erro = None, e
+
+def plano_mercados(cliente):
+    res = yield cliente.table("mercados").select("*").order("nome", desc=False)
+    return res.data
+
+def plano_cabecalho_periodo(cliente, start_date, end_date, mercado_ids=None):
+    query = (
+        cliente.table("compras_cabecalho")
+        .select("*")
+        .gte("data_compra", str(start_date))
+        .lte("data_compra", str(end_date))
+    )
+    if mercado_ids is not None:
+        query = query.in_("mercado_id", list(mercado_ids))
+    res = yield query.order("data_compra", desc=False)
+    return money.linhas_de_banco(res.data)
+
+def plano_mercado_ids_periodo(cliente, start_date, end_date):
+    res = yield (
+        cliente.table("compras_cabecalho")
+        .select("mercado_id")
+        .gte("data_compra", str(start_date))
+        .lte("data_compra", str(end_date))
+    )
+    return sorted({linha["mercado_id"] for linha in res.data or []})
+
+def plano_compras_detalhadas_periodo(cliente, start_date, end_date, mercado_ids=None):
+    params = {"data_inicio": str(start_date), "data_fim": str(end_date)}
+    if mercado_ids is None:
+        res = yield cliente.rpc("get_compras_detalhadas_periodo", params)
+        return money.linhas_de_banco(res.data)
+    try:
+        res = yield cliente.rpc("get_compras_detalhadas_periodo", {**params, "mercado_ids": list(mercado_ids)})
+        return money.linhas_de_banco(res.data)
+    except Exception as e:
+        if not recurso_inexistente(e):
+            raise
+    # Versão antiga da RPC, sem o parâmetro mercado_ids: filtra pelo nome do mercado
+    mercados, res = yield (
+        cliente.table("mercados").select("id, nome"),
+        cliente.rpc("get_compras_detalhadas_periodo", params),
+    )
+    nomes = {m["nome"] for m in mercados.data or [] if m["id"] in set(mercado_ids)}
+    return money.linhas_de_banco([linha for linha in res.data or [] if linha.get("mercado") in nomes])
 
 # ======================
 # MERCADOS
 # ======================
 
+@escrita("mercados")
 def registrar_mercado(nome, cidade):
     """Insere um novo mercado no banco"""
     data = {"nome": nome, "cidade": cidade}
     res = supabase.table("mercados").insert(data).execute()
     return res.data
 
+@cache_leitura(["mercados"], ttl=600, por_usuario=False)
 def buscar_mercados():
     """Busca todos os mercados cadastrados"""
-    res = supabase.table("mercados").select("*").order("nome", desc=False).execute()
-    return res.data
+    return executar_plano(plano_mercados(supabase))
 
 # ======================
 # COMPRAS (CABEÇALHO)
 # ======================
 
+@escrita("compras_cabecalho")
 def insert_compra(data):
     """
-    Insere o cabeçalho de uma compra e retorna o registro criado.
-    Espera um dicionário no formato:
+    Insere o cabeçalho de uma compra e retorna o registro criado, com os valores em centavos.
+    Espera um dicionário no formato (valores em centavos, ver utils/money.py):
     {
         "mercado_id": int,
         "data_compra": "YYYY-MM-DD",
-        "valor_total": float,
-        "descontos": float,
-        "valor_final_pago": float
+        "valor_total": int,
+        "descontos": int,
+        "valor_final_pago": int,
+        "chave_acesso": str,  # opcional, chave de 44 dígitos da NFC-e
+        "hash_arquivo": str,  # opcional, sha256 do PDF de origem
+        "impressao_digital": str  # ver utils/impressao_digital.py
     }
     """
-    res = supabase.table("compras_cabecalho").insert(data).execute()
-    return res.data[0] if res.data else None
+    res = supabase.table("compras_cabecalho").insert(money.para_banco(data)).execute()
+    return money.de_banco(res.data[0]) if res.data else None
 
-def get_compras_cabecalho_periodo(start_date, end_date):
-    """Busca compras em um intervalo de datas (apenas cabeçalho)"""
-    res = (
-        supabase.table("compras_cabecalho")
-        .select("*")
-        .gte("data_compra", str(start_date))
-        .lte("data_compra", str(end_date))
-        .order("data_compra", desc=False)
-        .execute()
-    )
+@escrita("compras_cabecalho", "compras_itens")
+def delete_compra(compra_id):
+    """Remove o cabeçalho de uma compra (usado para desfazer registros incompletos)"""
+    res = supabase.table("compras_cabecalho").delete().eq("id", compra_id).execute()
     return res.data
 
-def get_compras_detalhadas_rpc(start_date, end_date):
-    """Chama a função RPC para buscar compras detalhadas em um intervalo de datas"""
+@escrita("compras_cabecalho", "compras_itens")
+def registrar_compra_rpc(cabecalho, itens):
+    """
+    Registra cabeçalho e itens em uma única transação, via RPC
+    `registrar_compra_com_itens` (ver sql/registrar_compra_com_itens.sql).
+    Se qualquer item falhar, nada é gravado. Retorna o id da compra criada.
+    Valores em centavos, como em `insert_compra` e `insert_item`.
+    """
     res = supabase.rpc(
-        "get_compras_detalhadas_periodo",
-        {"data_inicio": str(start_date), "data_fim": str(end_date)}
+        "registrar_compra_com_itens",
+        {"p_cabecalho": money.para_banco(cabecalho), "p_itens": [money.para_banco(item) for item in itens]}
     ).execute()
     return res.data
 
+def recurso_inexistente(erro):
+    """Indica se o erro veio de uma função RPC, tabela ou coluna que não existe no banco"""
+    mensagem = str(erro)
+    return ("PGRST202" in mensagem or "PGRST205" in mensagem or "schema cache" in mensagem
+            or coluna_inexistente(erro))
+
+def violacao_unicidade(erro):
+    """Indica se o erro veio de um índice único (registro repetido)"""
+    mensagem = str(erro)
+    return "23505" in mensagem or "duplicate key" in mensagem
+
+def coluna_inexistente(erro):
+    """Indica se o erro veio de uma coluna que não existe no banco (migração de sql/ ainda não aplicada)"""
+    mensagem = str(erro)
+    return "42703" in mensagem or "PGRST204" in mensagem
+
+@cache_leitura(["compras_cabecalho"])
+def get_compras_cabecalho_periodo(start_date, end_date, mercado_ids=None):
+    """
+    Busca compras em um intervalo de datas (apenas cabeçalho), opcionalmente só dos mercados
+    informados. Valores em centavos.
+    """
+    return executar_plano(plano_cabecalho_periodo(supabase, start_date, end_date, mercado_ids))
+
+@cache_leitura(["compras_cabecalho"])
+def get_mercado_ids_periodo(start_date, end_date):
+    """Retorna os ids (ordenados) dos mercados com compras no intervalo, lendo só a coluna mercado_id"""
+    return executar_plano(plano_mercado_ids_periodo(supabase, start_date, end_date))
+
+@cache_leitura(TABELAS_COMPRAS_DETALHADAS)
+def get_compras_detalhadas_rpc(start_date, end_date, mercado_ids=None):
+    """
+    Chama a função RPC para buscar compras detalhadas em um intervalo de datas.
+    Com `mercado_ids`, o filtro por mercado é feito no banco
+    (ver sql/get_compras_detalhadas_periodo.sql). Valores em centavos.
+    """
+    return executar_plano(plano_compras_detalhadas_periodo(supabase, start_date, end_date, mercado_ids))
+
+# Colunas aceitas para ordenar a listagem paginada de itens
+ORDENACOES_ITENS = ("data_compra", "valor_total", "descricao")
+
+@cache_leitura(TABELAS_COMPRAS_DETALHADAS)
+def get_itens_pagina(start_date, end_date, limite=100, cursor=None, ordenar_por="data_compra",
+                     decrescente=False, busca=None, mercado_ids=None):
+    """
+    Busca uma página de itens do período (RPC `get_compras_detalhadas_pagina`), ordenada
+    por (`ordenar_por`, id) e começando depois de `cursor`. Filtros são aplicados no banco.
+    Retorna uma tupla (linhas, proximo_cursor), com os valores das linhas em centavos;
+    proximo_cursor é None na última página.
+    """
+    if ordenar_por not in ORDENACOES_ITENS:
+        raise ValueError(f"Ordenação não suportada: {ordenar_por}")
+    params = {
+        "data_inicio": str(start_date),
+        "data_fim": str(end_date),
+        # Uma linha a mais indica se existe próxima página
+        "limite": limite + 1,
+        "ordenar_por": ordenar_por,
+        "decrescente": decrescente,
+        "p_apos_valor": str(cursor[0]) if cursor else None,
+        "p_apos_id": cursor[1] if cursor else None,
+        "busca": busca or None,
+        "mercado_ids": list(mercado_ids) if mercado_ids is not None else None,
+    }
+    linhas = supabase.rpc("get_compras_detalhadas_pagina", params).execute().data or []
+    if len(linhas) <= limite:
+        return money.linhas_de_banco(linhas), None
+    linhas = linhas[:limite]
+    # O cursor volta para o banco: guarda o valor como veio (em reais), antes da conversão
+    ultima = linhas[-1]
+    cursor = (ultima[ordenar_por], ultima["id"])
+    return money.linhas_de_banco(linhas), cursor
+
+# ======================
+# GASTOS AGREGADOS POR PERÍODO
+# ======================
+
+@cache_leitura(["compras_cabecalho"])
+def get_gastos_agregados(start_period, end_period, granularidade="mes", mercado_ids=None):
+    """
+    Busca os gastos pré-agregados (tabela `gastos_periodo`, mantida por trigger) entre
+    dois inícios de período, inclusive. `granularidade` é "mes" ou "semana".
+    Retorna uma linha por período e mercado, com o valor em centavos:
+    {"periodo": "YYYY-MM-DD", "mercado_id": int, "valor_final_pago": int, "qtd_compras": int}
+    """
+    query = (
+        supabase.table("gastos_periodo")
+        .select("periodo, mercado_id, valor_final_pago, qtd_compras")
+        .eq("granularidade", granularidade)
+        .gte("periodo", str(start_period))
+        .lte("periodo", str(end_period))
+    )
+    if mercado_ids is not None:
+        query = query.in_("mercado_id", list(mercado_ids))
+    res = query.order("periodo", desc=False).execute()
+    return money.linhas_de_banco(res.data)
+
+# ======================
+# SINCRONIZAÇÃO DO SNAPSHOT LOCAL
+# ======================
+
+# Linhas por requisição (o máximo padrão do PostgREST no Supabase)
+TAMANHO_LOTE_SINCRONIZACAO = 1000
+
+def get_compras_cabecalho_desde(apos_id, limite=TAMANHO_LOTE_SINCRONIZACAO, data_inicio=None, data_fim=None):
+    """
+    Cabeçalhos com id maior que `apos_id`, em ordem de id, opcionalmente só os do período.
+    Valores em centavos.
+    """
+    query = (
+        supabase.table("compras_cabecalho")
+        .select("id, mercado_id, data_compra, valor_total, descontos, valor_final_pago")
+        .gt("id", apos_id)
+    )
+    if data_inicio is not None:
+        query = query.gte("data_compra", str(data_inicio))
+    if data_fim is not None:
+        query = query.lte("data_compra", str(data_fim))
+    res = query.order("id", desc=False).limit(limite).execute()
+    return money.linhas_de_banco(res.data)
+
+def get_compras_detalhadas_desde(apos_id, limite=TAMANHO_LOTE_SINCRONIZACAO, data_inicio=None, data_fim=None):
+    """
+    Itens detalhados (mesmas colunas de `get_compras_detalhadas_rpc`) com id maior que
+    `apos_id`, em ordem de id, opcionalmente só os das compras do período
+    (ver sql/get_compras_detalhadas_desde.sql). Valores em centavos.
+    """
+    params = {"p_apos_id": apos_id, "limite": limite}
+    if data_inicio is not None or data_fim is not None:
+        params.update(p_data_inicio=str(data_inicio) if data_inicio else None,
+                      p_data_fim=str(data_fim) if data_fim else None)
+    res = supabase.rpc("get_compras_detalhadas_desde", params).execute()
+    return money.linhas_de_banco(res.data)
+
+def get_assinaturas_compras():
+    """
+    Assinatura das compras por mês, mantida por trigger (ver sql/get_assinaturas_compras.sql):
+    uma linha {"mes": "YYYY-MM-01", "qtd_compras": int, "assinatura": str} por mês com
+    compras; a assinatura muda a cada alteração no mês. Sem cache: serve para conferir se o snapshot local está em dia.
+    """
+    return supabase.rpc("get_assinaturas_compras", {}).execute().data or []
+
 # ======================
 # ITENS DA COMPRA
 # ======================
 
+@escrita("compras_itens")
 def insert_item(data):
     """
     Insere um item vinculado a uma compra.
-    Espera um dicionário no formato:
+    Espera um dicionário no formato (valores em centavos):
     {
         "compra_id": int,
         "user_id": str,  # Necessário para RLS
@@ -69,14 +296,245 @@ def insert_item(data):
         "descricao": str,
         "quantidade": float,
         "unidade": str,
-        "valor_unitario": float,
-        "valor_total": float
+        "valor_unitario": int,
+        "valor_total": int
     }
     """
-    res = supabase.table("compras_itens").insert(data).execute()
+    res = supabase.table("compras_itens").insert(money.para_banco(data)).execute()
     return res.data
 
+TAMANHO_LOTE_ITENS = 50
+
+@escrita("compras_itens")
+def insert_itens(compra_id, user_id, itens, tamanho_lote=TAMANHO_LOTE_ITENS, ao_concluir_lote=None):
+    """
+    Insere os itens de uma compra em lotes, com uma requisição por lote.
+    `ao_concluir_lote(processados, total)` é chamado após cada lote (útil para barra de progresso).
+    Retorna uma tupla (itens_registrados, falhas), onde cada falha é um dicionário
+    {"inicio": int, "fim": int, "erro": str} com o intervalo de itens do lote que falhou.
+    """
+    total = len(itens)
+    registrados = 0
+    falhas = []
+    for inicio in range(0, total, tamanho_lote):
+        lote = [
+            {"compra_id": compra_id, "user_id": user_id, **money.para_banco(item)}
+            for item in itens[inicio:inicio + tamanho_lote]
+        ]
+        try:
+            res = supabase.table("compras_itens").insert(lote).execute()
+            registrados += len(res.data) if res.data else len(lote)
+        except Exception as e:
+            falhas.append({"inicio": inicio, "fim": inicio + len(lote), "erro": str(e)})
+        if ao_concluir_lote:
+            ao_concluir_lote(inicio + len(lote), total)
+    return registrados, falhas
+
+# ======================
+# REGISTRO COMPLETO DE COMPRAS
+# ======================
+
+class CompraDuplicada(Exception):
+    """A compra já foi registrada pelo usuário (mesma impressão digital)"""
+
+    def __init__(self, compra_id=None, impressao=None):
+        super().__init__("Compra já registrada." if compra_id is None else f"Compra já registrada (id {compra_id}).")
+        self.compra_id = compra_id
+        self.impressao = impressao
+
+def buscar_compra_por_impressao(impressoes):
+    """
+    Id da compra do usuário gravada com alguma destas impressões digitais (a atual e a legada,
+    ver `impressao_digital.impressoes`), ou None (busca pelo índice único, sem cache).
+    Sem a coluna impressao_digital no banco (sql/compras_cabecalho_impressao_digital.sql), retorna None.
+    """
+    try:
+        res = (
+            supabase.table("compras_cabecalho")
+            .select("id")
+            .in_("impressao_digital", list(impressoes))
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        if not coluna_inexistente(e):
+            raise
+        return None
+    return res.data[0]["id"] if res.data else None
+
+# Colunas do cabeçalho criadas por migrações opcionais (sql/); sem elas a compra é gravada assim mesmo
+COLUNAS_OPCIONAIS_CABECALHO = ("hash_arquivo", "impressao_digital")
+
+def _insert_compra_colunas_existentes(cabecalho):
+    """`insert_compra`, descartando as colunas opcionais que o banco ainda não tem"""
+    while True:
+        try:
+            return insert_compra(cabecalho)
+        except Exception as e:
+            ausentes = [c for c in COLUNAS_OPCIONAIS_CABECALHO if c in cabecalho and c in str(e)]
+            if not (coluna_inexistente(e) and ausentes):
+                raise
+            cabecalho = {k: v for k, v in cabecalho.items() if k not in ausentes}
+
+def registrar_compra_completa(cabecalho, itens, user_id, ao_concluir_lote=None, confirmar_repetida=False):
+    """
+    Registra uma compra com seus itens (valores em centavos, ver `insert_compra` e `insert_item`).
+    Usa a RPC transacional quando disponível; caso contrário insere o cabeçalho e
+    depois os itens em lotes, descartando o cabeçalho se nenhum item for gravado.
+    Retorna uma tupla (compra_id, itens_registrados, falhas); compra_id é None
+    quando a compra não foi registrada.
+    Lança `CompraDuplicada` se a mesma compra já estiver registrada (ver `utils.impressao_digital`).
+    Com `confirmar_repetida` (o usuário confirmou que é outra compra igual), uma compra sem
+    chave de acesso é gravada com a impressão da próxima repetição livre.
+    Sem a coluna impressao_digital no banco, a compra é gravada sem essa verificação.
+    """
+    if cabecalho.get("impressao_digital"):
+        impressoes = [cabecalho["impressao_digital"]]
+    else:
+        impressoes = impressao_digital.impressoes(cabecalho, itens)
+    repeticao = 0
+    # A mesma compra pode estar gravada com a impressão atual ou com a legada
+    compra_existente = buscar_compra_por_impressao(impressoes)
+    while compra_existente:
+        if not confirmar_repetida or impressoes[0].startswith(impressao_digital.PREFIXO_NFCE):
+            raise CompraDuplicada(compra_existente, impressoes[0])
+        repeticao += 1
+        impressoes = impressao_digital.impressoes(cabecalho, itens, repeticao=repeticao)
+        compra_existente = buscar_compra_por_impressao(impressoes)
+    impressao = impressoes[0]
+    cabecalho = {**cabecalho, "impressao_digital": impressao}
+
+    try:
+        compra_id = registrar_compra_rpc(cabecalho, itens)
+    except Exception as e:
+        # Registrada ao mesmo tempo por outra sessão: o índice único recusa a segunda
+        if violacao_unicidade(e):
+            raise CompraDuplicada(impressao=impressao) from e
+        if not recurso_inexistente(e):
+            raise
+        compra_id = None
+    if compra_id:
+        if ao_concluir_lote:
+            ao_concluir_lote(len(itens), len(itens))
+        return compra_id, len(itens), []
+
+    try:
+        compra_registrada = _insert_compra_colunas_existentes(cabecalho)
+    except Exception as e:
+        if violacao_unicidade(e):
+            raise CompraDuplicada(impressao=impressao) from e
+        raise
+    compra_id = compra_registrada.get("id") if isinstance(compra_registrada, dict) else None
+    if not compra_id:
+        raise RuntimeError("Erro ao obter ID da compra registrada.")
+
+    itens_registrados, falhas = insert_itens(compra_id, user_id, itens, ao_concluir_lote=ao_concluir_lote)
+    if itens_registrados == 0:
+        delete_compra(compra_id)
+        return None, 0, falhas
+    return compra_id, itens_registrados, falhas
+
+def buscar_chaves_registradas(chaves, tamanho_lote=TAMANHO_LOTE_ITENS):
+    """Retorna o conjunto das chaves de acesso (NFC-e) que o usuário já registrou"""
+    chaves = list(chaves)
+    registradas = set()
+    for inicio in range(0, len(chaves), tamanho_lote):
+        res = (
+            supabase.table("compras_cabecalho")
+            .select("chave_acesso")
+            .in_("chave_acesso", chaves[inicio:inicio + tamanho_lote])
+            .execute()
+        )
+        registradas.update(linha["chave_acesso"] for linha in res.data or [])
+    return registradas
+
+def buscar_hashes_registrados(hashes, tamanho_lote=TAMANHO_LOTE_ITENS):
+    """
+    Retorna o conjunto dos hashes de arquivo (sha256 do PDF) que o usuário já registrou.
+    Sem a coluna hash_arquivo no banco (sql/compras_cabecalho_hash_arquivo.sql), retorna
+    um conjunto vazio: só a chave de acesso é conferida.
+    """
+    hashes = list(hashes)
+    registrados = set()
+    for inicio in range(0, len(hashes), tamanho_lote):
+        try:
+            res = (
+                supabase.table("compras_cabecalho")
+                .select("hash_arquivo")
+                .in_("hash_arquivo", hashes[inicio:inicio + tamanho_lote])
+                .execute()
+            )
+        except Exception as e:
+            if not coluna_inexistente(e):
+                raise
+            return set()
+        registrados.update(linha["hash_arquivo"] for linha in res.data or [])
+    return registrados
+
+@cache_leitura(["compras_cabecalho"])
+def buscar_compra_por_hash(hash_arquivo):
+    """
+    Compra do usuário registrada a partir do arquivo com este hash (sha256), ou None;
+    valor em centavos. Sem a coluna hash_arquivo no banco, retorna None (só a chave de
+    acesso é conferida).
+    """
+    try:
+        res = (
+            supabase.table("compras_cabecalho")
+            .select("id, data_compra, valor_final_pago")
+            .eq("hash_arquivo", hash_arquivo)
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        if not coluna_inexistente(e):
+            raise
+        return None
+    return money.de_banco(res.data[0]) if res.data else None
+
+# ======================
+# COMPRAS DUPLICADAS
+# ======================
+
+def get_impressoes_desde(apos_id, limite=TAMANHO_LOTE_SINCRONIZACAO):
+    """
+    Cabeçalhos com os dados da impressão digital, com id maior que `apos_id`, em ordem de id.
+    Valores em centavos.
+    """
+    res = (
+        supabase.table("compras_cabecalho")
+        .select("id, mercado_id, data_compra, valor_total, valor_final_pago, chave_acesso, impressao_digital")
+        .gt("id", apos_id)
+        .order("id", desc=False)
+        .limit(limite)
+        .execute()
+    )
+    return money.linhas_de_banco(res.data)
+
+@escrita("compras_cabecalho", "compras_itens")
+def delete_compras(compra_ids):
+    """
+    Remove várias compras com seus itens. Os itens são removidos antes dos cabeçalhos,
+    sem depender de `on delete cascade` na chave estrangeira de compras_itens.
+    """
+    compra_ids = list(compra_ids)
+    supabase.table("compras_itens").delete().in_("compra_id", compra_ids).execute()
+    res = supabase.table("compras_cabecalho").delete().in_("id", compra_ids).execute()
+    return res.data
+
+@escrita("compras_cabecalho")
+def definir_impressao_digital(compra_id, impressao):
+    """Grava a impressão digital de uma compra registrada antes da coluna existir"""
+    res = (
+        supabase.table("compras_cabecalho")
+        .update({"impressao_digital": impressao})
+        .eq("id", compra_id)
+        .execute()
+    )
+    return res.data
+
+@cache_leitura(["compras_itens"])
 def get_itens_por_compra(compra_id):
-    """Busca todos os itens de uma compra específica"""
+    """Busca todos os itens de uma compra específica. Valores em centavos."""
     res = supabase.table("compras_itens").select("*").eq("compra_id", compra_id).execute()
-    return res.data
+    return money.linhas_de_banco(res.data)
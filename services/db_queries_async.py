@@ -0,0 +1,90 @@
+"""
+Variante assíncrona das consultas de leitura de `db_queries`, para buscar ao mesmo
+tempo dados independentes (cabeçalhos, itens detalhados, mercados...).
+
+As funções têm as mesmas assinaturas das versões síncronas, mas retornam corrotinas;
+`reunir` executa várias delas em paralelo e devolve os resultados na mesma ordem:
+
+    cabecalho, detalhadas = db_queries_async.reunir(
+        db_queries_async.get_compras_cabecalho_periodo(inicio, fim),
+        db_queries_async.get_compras_detalhadas_rpc(inicio, fim),
+    )
+
+O tempo total passa a ser o da consulta mais lenta, e não a soma de todas.
+Como em `db_queries`, os valores monetários saem em centavos.
+"""
+import asyncio
+import contextvars
+
+from services import db_queries
+from services.supabase_client import cliente_async_da_sessao, executar_async
+
+# Cliente assíncrono da sessão que chamou `reunir` (as corrotinas rodam fora da thread da página)
+_cliente_atual = contextvars.ContextVar("cliente_supabase_async")
+
+
+def reunir(*consultas):
+    """Executa as consultas ao mesmo tempo e retorna uma lista com os resultados, na ordem"""
+    cliente = cliente_async_da_sessao()
+
+    async def _todas():
+        _cliente_atual.set(cliente)
+        return await asyncio.gather(*consultas)
+
+    return executar_async(_todas())
+
+
+def _supabase():
+    return _cliente_atual.get()
+
+
+async def _executar_plano(plano):
+    """
+    Roda um plano de consulta de `db_queries` (ver `db_queries.executar_plano`) com o
+    cliente assíncrono; as consultas de uma mesma etapa vão juntas, em paralelo
+    """
+    resposta, erro = None, None
+    while True:
+        try:
+            consulta = plano.throw(erro) if erro is not None else plano.send(resposta)
+        except StopIteration as fim:
+            return fim.value
+        try:
+            if isinstance(consulta, tuple):
+                resposta = tuple(await asyncio.gather(*(c.execute() for c in consulta)))
+            else:
+                resposta = await consulta.execute()
+            erro = None
+        except Exception as e:
+            resposta, erro = None, e
+
+
+# ======================
+# MERCADOS
+# ======================
+
+async def buscar_mercados():
+    """Retorna todos os mercados cadastrados"""
+    return await _executar_plano(db_queries.plano_mercados(_supabase()))
+
+
+# ======================
+# COMPRAS
+# ======================
+
+async def get_compras_cabecalho_periodo(start_date, end_date, mercado_ids=None):
+    """
+    Busca compras em um intervalo de datas (apenas cabeçalho), opcionalmente só dos mercados
+    informados. Valores em centavos.
+    """
+    return await _executar_plano(db_queries.plano_cabecalho_periodo(_supabase(), start_date, end_date, mercado_ids))
+
+async def get_mercado_ids_periodo(start_date, end_date):
+    """Retorna os ids (ordenados) dos mercados com compras no intervalo"""
+    return await _executar_plano(db_queries.plano_mercado_ids_periodo(_supabase(), start_date, end_date))
+
+async def get_compras_detalhadas_rpc(start_date, end_date, mercado_ids=None):
+    """Compras detalhadas do período (RPC `get_compras_detalhadas_periodo`), como em `db_queries`, em centavos"""
+    return await _executar_plano(
+        db_queries.plano_compras_detalhadas_periodo(_supabase(), start_date, end_date, mercado_ids)
+    )
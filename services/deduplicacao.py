@@ -0,0 +1,103 @@
+"""
+Limpeza das compras registradas em duplicidade antes da impressão digital existir.
+
+Cabeçalhos e itens do usuário são lidos uma única vez, em lotes por id (sem uma consulta
+por compra); as compras são agrupadas pela impressão digital (ver utils/impressao_digital.py)
+e a mais antiga de cada grupo é mantida. Por padrão só mostra o que seria feito; com
+--aplicar, remove as duplicadas e grava a impressão digital das compras mantidas, que
+passam a ser protegidas pelo índice único (ver sql/compras_cabecalho_impressao_digital.sql).
+
+Uso pela linha de comando:
+    python -m services.deduplicacao --email usuario@exemplo.com [--aplicar]
+A senha é lida da variável de ambiente SUPABASE_PASSWORD ou pedida no terminal.
+"""
+import argparse
+import getpass
+import os
+import sys
+
+from services import db_queries
+from services.supabase_client import supabase
+from utils import impressao_digital, money
+
+
+def _baixar_tudo(buscar, coluna_id):
+    linhas = []
+    apos_id = 0
+    while True:
+        lote = buscar(apos_id) or []
+        if not lote:
+            return linhas
+        linhas.extend(lote)
+        apos_id = lote[-1][coluna_id]
+
+
+def planejar():
+    """
+    Encontra as compras duplicadas do usuário. Retorna (duplicadas, a_preencher):
+    `duplicadas` é uma lista de {"id", "mantida", "data_compra", "valor_final_pago"} e
+    `a_preencher` um dicionário {compra_id: impressão digital} das compras mantidas sem impressão.
+    """
+    cabecalhos = _baixar_tudo(db_queries.get_impressoes_desde, "id")
+    itens_por_compra = {}
+    for item in _baixar_tudo(db_queries.get_compras_detalhadas_desde, "item"):
+        itens_por_compra.setdefault(item["compra_id"], []).append(item)
+
+    mantidas = {}
+    duplicadas = []
+    a_preencher = {}
+    # Em ordem de id: a primeira compra de cada impressão é a mantida
+    for cabecalho in cabecalhos:
+        gravada = cabecalho.get("impressao_digital")
+        calculadas = impressao_digital.impressoes(cabecalho, itens_por_compra.get(cabecalho["id"], []))
+        # Uma impressão gravada no formato legado agrupa com a atual da mesma compra;
+        # as de repetições confirmadas pelo usuário ficam como estão
+        impressao = calculadas[0] if not gravada or gravada in calculadas else gravada
+        if impressao in mantidas:
+            duplicadas.append({
+                "id": cabecalho["id"],
+                "mantida": mantidas[impressao],
+                "data_compra": cabecalho["data_compra"],
+                "valor_final_pago": cabecalho.get("valor_final_pago"),
+            })
+        else:
+            mantidas[impressao] = cabecalho["id"]
+            if not gravada:
+                a_preencher[cabecalho["id"]] = impressao
+    return duplicadas, a_preencher
+
+
+def aplicar(duplicadas, a_preencher, tamanho_lote=db_queries.TAMANHO_LOTE_ITENS):
+    """Remove as duplicadas (em lotes) e só depois grava as impressões, para não violar o índice único"""
+    ids = [compra["id"] for compra in duplicadas]
+    for inicio in range(0, len(ids), tamanho_lote):
+        db_queries.delete_compras(ids[inicio:inicio + tamanho_lote])
+    for compra_id, impressao in a_preencher.items():
+        db_queries.definir_impressao_digital(compra_id, impressao)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove compras registradas em duplicidade.")
+    parser.add_argument("--email", required=True, help="Email da conta no Supabase")
+    parser.add_argument("--aplicar", action="store_true",
+                        help="Remove as duplicadas e grava as impressões (sem esta opção, só mostra)")
+    args = parser.parse_args(argv)
+
+    senha = os.getenv("SUPABASE_PASSWORD") or getpass.getpass("Senha: ")
+    supabase.auth.sign_in_with_password({"email": args.email, "password": senha})
+
+    duplicadas, a_preencher = planejar()
+    for compra in duplicadas:
+        print(f"duplicada  id {compra['id']} ({compra['data_compra']}, {money.formatar(compra['valor_final_pago'] or 0)}) "
+              f"-> mantida id {compra['mantida']}")
+    print(f"\n{len(duplicadas)} compras duplicadas, {len(a_preencher)} compras sem impressão digital")
+    if not args.aplicar:
+        print("Nada foi alterado (use --aplicar para remover as duplicadas).")
+        return 0
+    aplicar(duplicadas, a_preencher)
+    print("Duplicadas removidas e impressões digitais gravadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Projeção do gasto mensal (seção "Tendência de Gastos"), só com NumPy.
+
+Métodos disponíveis:
+- "linear": reta de tendência por mínimos quadrados, em forma fechada;
+- "media_movel": média dos últimos `janela` meses, mantida no horizonte;
+- "holt_winters": suavização exponencial com tendência aditiva e, quando a série
+  cobre pelo menos dois ciclos de `periodo` meses, sazonalidade aditiva. As constantes
+  de suavização são escolhidas numa grade pelo menor erro um passo à frente.
+
+Todos retornam uma `Projecao` com os valores ajustados ao histórico, os previstos e uma
+faixa de confiança a partir do desvio dos resíduos (aproximação normal). Os resultados
+são memorizados pela série e pelos parâmetros: as reexecuções da página com os mesmos
+gastos mensais não recalculam nada.
+"""
+import functools
+import itertools
+
+import numpy as np
+
+METODOS = ("linear", "media_movel", "holt_winters")
+HORIZONTE_PADRAO = 6
+# Quantis da normal para os níveis de confiança aceitos
+QUANTIS_NORMAL = {0.80: 1.2816, 0.90: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+# Grade das constantes de suavização do Holt-Winters
+GRADE_SUAVIZACAO = (0.1, 0.3, 0.5, 0.7, 0.9)
+
+
+class Projecao:
+    """
+    Resultado de `projetar`: `ajustados` tem o tamanho do histórico (NaN onde o método
+    não tem previsão); `previstos`, `inferior` e `superior` têm o tamanho do horizonte.
+    """
+
+    def __init__(self, metodo, ajustados, previstos, erro_padrao, largura):
+        self.metodo = metodo
+        self.ajustados = ajustados
+        self.previstos = previstos
+        self.erro_padrao = erro_padrao
+        self.inferior = previstos - largura
+        self.superior = previstos + largura
+        for valores in (self.ajustados, self.previstos, self.inferior, self.superior):
+            valores.setflags(write=False)  # compartilhados entre chamadas pela memorização
+
+    def __len__(self):
+        return len(self.previstos)
+
+
+def _desvio(residuos, graus_usados):
+    """Desvio padrão dos resíduos (sem NaN), descontando os parâmetros estimados"""
+    residuos = residuos[~np.isnan(residuos)]
+    graus = len(residuos) - graus_usados
+    if graus <= 0:
+        return 0.0
+    return float(np.sqrt(np.dot(residuos, residuos) / graus))
+
+
+def _linear(y, horizonte, z, metodo="linear"):
+    n = len(y)
+    x = np.arange(n, dtype=float)
+    x_medio = x.mean()
+    sxx = float(np.dot(x - x_medio, x - x_medio))
+    inclinacao = float(np.dot(x - x_medio, y - y.mean()) / sxx) if sxx else 0.0
+    intercepto = float(y.mean() - inclinacao * x_medio)
+    ajustados = intercepto + inclinacao * x
+    x_futuro = np.arange(n, n + horizonte, dtype=float)
+    previstos = intercepto + inclinacao * x_futuro
+    erro = _desvio(y - ajustados, 2)
+    # Intervalo de previsão da regressão: mais largo quanto mais longe do centro dos dados
+    fator = np.sqrt(1 + 1 / n + ((x_futuro - x_medio) ** 2 / sxx if sxx else 0.0))
+    return Projecao(metodo, ajustados, previstos, erro, z * erro * fator)
+
+
+def _media_movel(y, horizonte, z, janela):
+    janela = max(1, min(janela, len(y)))
+    soma = np.concatenate(([0.0], np.cumsum(y)))
+    ajustados = np.full(len(y), np.nan)
+    # Previsão de cada mês: a média dos `janela` meses anteriores
+    ajustados[janela:] = (soma[janela:-1] - soma[:-janela - 1]) / janela
+    previstos = np.full(horizonte, (soma[-1] - soma[-janela - 1]) / janela)
+    erro = _desvio(y - ajustados, 0) or float(y[-janela:].std())
+    return Projecao("media_movel", ajustados, previstos, erro, np.full(horizonte, z * erro))
+
+
+def _suavizar(y, alfa, beta, gama, periodo):
+    """Holt-Winters aditivo; retorna (previsões um passo à frente, nível, tendência, sazonais)"""
+    n = len(y)
+    if periodo:
+        media = float(y[:periodo].mean())
+        tendencia = float((y[periodo:2 * periodo].mean() - media) / periodo)
+        # A média do primeiro ciclo é o nível no seu meio: os sazonais iniciais são o desvio
+        # de cada mês em relação à reta de tendência, e o nível parte do fim do ciclo
+        meio = (periodo - 1) / 2
+        sazonais = list(y[:periodo] - (media + tendencia * (np.arange(periodo) - meio)))
+        nivel = media + tendencia * meio
+    else:
+        nivel, tendencia, sazonais = float(y[0]), float(y[1] - y[0]) if n > 1 else 0.0, []
+    ajustados = np.full(n, np.nan)
+    inicio = periodo or 1
+    for t in range(inicio, n):
+        sazonal = sazonais[t % periodo] if periodo else 0.0
+        ajustados[t] = nivel + tendencia + sazonal
+        nivel_anterior = nivel
+        nivel = alfa * (y[t] - sazonal) + (1 - alfa) * (nivel + tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * tendencia
+        if periodo:
+            sazonais[t % periodo] = gama * (y[t] - nivel) + (1 - gama) * sazonal
+    return ajustados, nivel, tendencia, sazonais
+
+
+def _holt_winters(y, horizonte, z, periodo):
+    n = len(y)
+    periodo = periodo if periodo and n >= 2 * periodo else 0
+    if n < 3:
+        # Poucos meses para suavizar: a reta de tendência, ainda rotulada como Holt-Winters
+        return _linear(y, horizonte, z, metodo="holt_winters")
+    melhor = None
+    gamas = GRADE_SUAVIZACAO if periodo else (0.0,)
+    for alfa, beta, gama in itertools.product(GRADE_SUAVIZACAO, GRADE_SUAVIZACAO, gamas):
+        resultado = _suavizar(y, alfa, beta, gama, periodo)
+        residuos = y - resultado[0]
+        sse = float(np.nansum(residuos ** 2))
+        if melhor is None or sse < melhor[0]:
+            melhor = (sse, (alfa, beta), resultado)
+    _, (alfa, beta), (ajustados, nivel, tendencia, sazonais) = melhor
+    passos = np.arange(1, horizonte + 1)
+    previstos = nivel + passos * tendencia
+    if periodo:
+        previstos = previstos + np.array([sazonais[(n + h - 1) % periodo] for h in passos])
+    erro = _desvio(y - ajustados, 2 + (1 if periodo else 0))
+    # Variância da previsão h passos à frente do método de Holt: 1 + soma de (alfa(1 + j beta))²
+    acumulada = np.concatenate(([0.0], np.cumsum((alfa * (1 + passos[:-1] * beta)) ** 2)))
+    return Projecao("holt_winters", ajustados, previstos, erro, z * erro * np.sqrt(1 + acumulada))
+
+
+@functools.lru_cache(maxsize=64)
+def _projetar(valores, metodo, horizonte, confianca, janela, periodo):
+    y = np.array(valores, dtype=float)
+    z = QUANTIS_NORMAL[confianca]
+    if metodo == "linear":
+        return _linear(y, horizonte, z)
+    if metodo == "media_movel":
+        return _media_movel(y, horizonte, z, janela)
+    return _holt_winters(y, horizonte, z, periodo)
+
+
+def projetar(valores, metodo="linear", horizonte=HORIZONTE_PADRAO, confianca=0.95, janela=3, periodo=12):
+    """
+    Projeta os próximos `horizonte` valores da série mensal `valores` (em ordem cronológica).
+    `janela` é usada pela média móvel e `periodo` (meses por ciclo) pelo Holt-Winters.
+    Retorna uma `Projecao`, ou None se a série estiver vazia.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de projeção inválido: {metodo}")
+    if confianca not in QUANTIS_NORMAL:
+        raise ValueError(f"Nível de confiança não suportado: {confianca}")
+    valores = tuple(float(v) for v in valores)
+    if not valores:
+        return None
+    return _projetar(valores, metodo, int(horizonte), confianca, int(janela), int(periodo))
+
+
+def limpar_cache():
+    _projetar.cache_clear()
@@ -0,0 +1,156 @@
+"""
+Montagem dos DataFrames de compras com tipos compactos, a partir dos registros do banco.
+
+`pd.DataFrame(registros)` guarda cada texto como um objeto Python por linha (descrição,
+mercado, cidade... repetidos em todas as linhas) e os números como float64. Aqui cada
+coluna do esquema é extraída dos registros e convertida direto para o tipo final, sem
+um DataFrame intermediário de objetos:
+- "categoria": textos repetidos viram `pd.Categorical` (códigos inteiros + valores únicos);
+- "centavos": dinheiro, que `db_queries` já entrega em centavos (utils/money.py), vira
+  int64 (Int64 se houver valores ausentes); converta para reais só para exibir (`reais`);
+- "data": datas viram date32 do Arrow (4 bytes), ou datetime64 sem pyarrow;
+- "id" e "real": int64 e float64.
+Colunas que não estão no esquema são mantidas como vieram.
+Para ler as datas como NumPy use `datas`: a conversão do pandas a partir do date32 é lenta.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+
+from utils.money import CENTAVOS_POR_REAL
+
+# Colunas de `get_compras_cabecalho_periodo` (e do cabeçalho do snapshot)
+ESQUEMA_CABECALHO = {
+    "id": "id", "mercado_id": "id", "data_compra": "data",
+    "valor_total": "centavos", "descontos": "centavos", "valor_final_pago": "centavos",
+    "user_id": "categoria",
+}
+# Colunas das RPCs de itens detalhados (`get_compras_detalhadas_rpc`, `get_compras_detalhadas_desde`)
+ESQUEMA_DETALHADAS = {
+    "item": "id", "compra_id": "id", "data_compra": "data",
+    "codigo": "categoria", "descricao": "categoria", "quantidade": "real", "unidade": "categoria",
+    "valor_unitario": "centavos", "valor_total": "centavos", "desconto": "centavos",
+    "mercado_id": "id", "mercado": "categoria", "cidade": "categoria",
+}
+
+
+def _tipo_data():
+    return pd.ArrowDtype(pa.date32()) if pa is not None else "datetime64[s]"
+
+
+def _ordenada(categorica):
+    """Categorias em ordem crescente, como as de `pd.Categorical` (agrupamentos saem em ordem alfabética)"""
+    return categorica.reorder_categories(categorica.categories.sort_values())
+
+
+def _categoria(valores):
+    if pa is not None:
+        try:
+            return _ordenada(pa.array(valores, type=pa.string()).dictionary_encode().to_pandas().array)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    return pd.Categorical(valores)
+
+
+def _centavos(valores):
+    try:
+        return np.asarray(valores, dtype=np.int64)
+    except TypeError:
+        # Valores ausentes (None)
+        return pd.array(valores, dtype="Int64")
+
+
+def _data(valores):
+    if pa is not None:
+        try:
+            # Colunas date do PostgREST já vêm como "AAAA-MM-DD"
+            textos = pa.array(valores, type=pa.string())
+            return pd.array(textos.cast(pa.date32()), dtype=_tipo_data())
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            textos = pa.array([str(v)[:10] if v is not None else None for v in valores], type=pa.string())
+            return pd.array(textos.cast(pa.date32()), dtype=_tipo_data())
+    return np.array([str(v)[:10] if v is not None else "NaT" for v in valores], dtype="datetime64[D]")
+
+
+def _id(valores):
+    try:
+        return np.asarray(valores, dtype=np.int64)
+    except (TypeError, ValueError):
+        return pd.array(valores, dtype="Int64")
+
+
+CONVERSORES = {
+    "categoria": _categoria,
+    "centavos": _centavos,
+    "data": _data,
+    "id": _id,
+    "real": lambda valores: np.asarray(valores, dtype=float),
+}
+
+
+def vazio(esquema):
+    """Frame sem linhas com as colunas e os tipos do esquema"""
+    return de_registros([], esquema)
+
+
+def de_registros(linhas, esquema):
+    """Lista de dicts do PostgREST -> DataFrame com os tipos do esquema, uma coluna por vez"""
+    linhas = linhas or []
+    nomes = list(linhas[0]) if linhas else list(esquema)
+    colunas = {}
+    for nome in nomes:
+        valores = [linha.get(nome) for linha in linhas]
+        tipo = esquema.get(nome)
+        colunas[nome] = CONVERSORES[tipo](valores) if tipo else valores
+    return pd.DataFrame(colunas, copy=False)
+
+
+def de_tabela_arrow(tabela, esquema):
+    """Tabela Arrow (ex.: do snapshot) -> DataFrame com os mesmos tipos de `de_registros`"""
+    colunas = {}
+    for nome in tabela.column_names:
+        coluna = tabela.column(nome)
+        tipo = esquema.get(nome)
+        if tipo == "categoria":
+            # Um dicionário único para todos os segmentos
+            colunas[nome] = _ordenada(coluna.combine_chunks().dictionary_encode().to_pandas().array)
+        elif tipo == "centavos":
+            centavos = coluna.cast(pa.int64()).to_numpy(zero_copy_only=False)
+            colunas[nome] = pd.array(centavos, dtype="Int64") if coluna.null_count else centavos
+        elif tipo == "data":
+            colunas[nome] = pd.array(coluna.cast(pa.date32()), dtype=_tipo_data())
+        else:
+            colunas[nome] = coluna.to_pandas()
+    return pd.DataFrame(colunas, copy=False)
+
+
+def concatenar(frames):
+    """Concatena frames do mesmo esquema mantendo as colunas categóricas (une as categorias)"""
+    frames = [df for df in frames if not df.empty] or frames[:1]
+    if len(frames) <= 1:
+        return frames[0] if frames else pd.DataFrame()
+    colunas = {}
+    for nome in frames[0].columns:
+        partes = [df[nome] for df in frames]
+        if all(isinstance(parte.dtype, pd.CategoricalDtype) for parte in partes):
+            colunas[nome] = union_categoricals(partes, sort_categories=True, ignore_order=True)
+        else:
+            colunas[nome] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(colunas, copy=False)
+
+
+def datas(serie):
+    """Coluna de datas (date32, datetime64 ou texto) -> array NumPy datetime64[D]"""
+    if pa is not None and isinstance(serie.dtype, pd.ArrowDtype):
+        return pa.array(serie.array).to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    return pd.to_datetime(serie).to_numpy().astype("datetime64[D]")
+
+
+def reais(serie):
+    """Coluna em centavos -> array float64 em reais (NaN onde faltar), para exibição"""
+    return serie.to_numpy(dtype=float, na_value=np.nan) / CENTAVOS_POR_REAL
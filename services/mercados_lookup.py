@@ -0,0 +1,37 @@
+import streamlit as st
+
+from services import db_queries
+from services.cache import versao_tabelas
+
+
+class MapaMercados:
+    """Consulta de mercados por id e por nome, montada uma única vez a partir de `buscar_mercados`"""
+
+    def __init__(self, mercados):
+        self.por_id = {m["id"]: m for m in mercados}
+        self.ids_por_nome = {}
+        for m in mercados:
+            self.ids_por_nome.setdefault(m["nome"], []).append(m["id"])
+
+    def nome(self, mercado_id):
+        mercado = self.por_id.get(mercado_id)
+        return mercado["nome"] if mercado else str(mercado_id)
+
+    def rotulo(self, mercado_id):
+        """Nome e cidade do mercado, para exibição em seletores"""
+        mercado = self.por_id.get(mercado_id)
+        return f"{mercado['nome']} - {mercado['cidade']}" if mercado else str(mercado_id)
+
+    def ids(self, nomes):
+        """Ids de todos os mercados com os nomes informados"""
+        return [mercado_id for nome in nomes for mercado_id in self.ids_por_nome.get(nome, [])]
+
+
+def obter_mapa_mercados():
+    """Retorna o MapaMercados da sessão, refeito apenas quando um mercado é cadastrado"""
+    versao = versao_tabelas("mercados")
+    guardado = st.session_state.get("mapa_mercados")
+    if guardado is None or guardado[0] != versao:
+        guardado = (versao, MapaMercados(db_queries.buscar_mercados() or []))
+        st.session_state["mapa_mercados"] = guardado
+    return guardado[1]
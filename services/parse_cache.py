@@ -0,0 +1,106 @@
+"""
+Cache das notas fiscais já lidas, pela impressão (sha256) do conteúdo do PDF.
+
+Cada interação na tela de upload (mercado, desconto, data) executa a página de novo;
+sem o cache, o PDF seria relido pelo pdfplumber a cada execução. A leitura fica
+guardada em memória (LRU compartilhado pelo processo) e, se a variável de ambiente
+PARSE_CACHE_DIR estiver definida, também em disco, um arquivo JSON por nota.
+
+O mesmo hash é gravado em `compras_cabecalho.hash_arquivo` no registro da compra,
+permitindo saber se o arquivo enviado já foi registrado
+(ver `db_queries.buscar_compra_por_hash`).
+"""
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+
+from services.cache import CacheLRU
+from utils import nfce_parser, pdf_reader
+
+# Mudanças no leitor que alteram o resultado devem incrementar a versão (invalida o disco)
+VERSAO_LEITOR = 2
+DIRETORIO_CACHE = os.getenv("PARSE_CACHE_DIR")
+CAMPOS_METADADOS = ("chave_acesso", "cnpj", "data_emissao")
+
+_notas_lidas = CacheLRU(max_itens=32, ttl=3600)
+
+
+def hash_arquivo(conteudo):
+    """Hash sha256 (hexadecimal) do conteúdo do arquivo"""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _caminho(chave, diretorio):
+    return os.path.join(diretorio, f"{chave}.json")
+
+
+def _ler_disco(chave, diretorio):
+    try:
+        with open(_caminho(chave, diretorio), encoding="utf-8") as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if dados.get("versao") != VERSAO_LEITOR:
+        return None
+    colunas = {
+        c: np.array(dados["colunas"][c], dtype=nfce_parser.tipo_coluna(c))
+        for c in nfce_parser.COLUNAS
+    }
+    return {**{c: dados.get(c) for c in CAMPOS_METADADOS}, "itens": nfce_parser.ItensNota(colunas)}
+
+
+def _gravar_disco(chave, nota, diretorio):
+    dados = {
+        "versao": VERSAO_LEITOR,
+        **{c: nota.get(c) for c in CAMPOS_METADADOS},
+        "colunas": {c: valores.tolist() for c, valores in nota["itens"].colunas.items()},
+    }
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = _caminho(chave, diretorio)
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+        os.replace(caminho + ".tmp", caminho)
+    except OSError:
+        pass  # o disco é só uma segunda camada do cache
+
+
+def obter(hash_nota, modo=pdf_reader.MODO_PADRAO, diretorio=DIRETORIO_CACHE):
+    """Nota lida anteriormente (formato de `pdf_reader.ler_nota_colunar`), ou None"""
+    chave = f"{hash_nota}-{modo}"
+    encontrado, nota = _notas_lidas.get(chave)
+    if encontrado:
+        return nota
+    if diretorio:
+        nota = _ler_disco(chave, diretorio)
+        if nota is not None:
+            _notas_lidas.set(chave, nota)
+        return nota
+    return None
+
+
+def guardar(hash_nota, nota, modo=pdf_reader.MODO_PADRAO, diretorio=DIRETORIO_CACHE):
+    """Guarda a leitura da nota (metadados e `nfce_parser.ItensNota`) e a retorna"""
+    chave = f"{hash_nota}-{modo}"
+    nota = {**{c: nota.get(c) for c in CAMPOS_METADADOS}, "itens": nota["itens"]}
+    _notas_lidas.set(chave, nota)
+    if diretorio:
+        _gravar_disco(chave, nota, diretorio)
+    return nota
+
+
+def ler_nota(conteudo, modo=pdf_reader.MODO_PADRAO):
+    """`pdf_reader.ler_nota_colunar` a partir dos bytes do PDF, lendo o arquivo só na primeira vez"""
+    hash_nota = hash_arquivo(conteudo)
+    nota = obter(hash_nota, modo)
+    if nota is None:
+        nota = guardar(hash_nota, pdf_reader.ler_nota_colunar(io.BytesIO(conteudo), modo), modo)
+    return nota
+
+
+def limpar():
+    """Descarta as notas guardadas em memória"""
+    _notas_lidas.limpar()
@@ -0,0 +1,180 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from services import frames
+
+CODIGO_MANUAL = "MANUAL"
+
+
+def normalizar_descricao(descricao):
+    """Maiúsculas, sem acentos e com espaços simples, para agrupar itens digitados à mão"""
+    texto = unicodedata.normalize("NFKD", str(descricao or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().upper()
+
+
+def chave_produto(codigo, descricao):
+    """Chave do produto: o código da nota ou, para itens manuais, a descrição normalizada"""
+    codigo = str(codigo or "").strip()
+    if codigo and codigo != CODIGO_MANUAL:
+        return f"cod:{codigo}"
+    return f"desc:{normalizar_descricao(descricao)}"
+
+
+class SeriePreco:
+    """
+    Observações de preço de um produto em ordem cronológica, com somas acumuladas
+    para responder estatísticas de qualquer intervalo de datas em O(log n).
+    Preços em centavos (int64), como em utils/money.py: médias, extremos e variações
+    também saem em centavos, e só a exibição converte para reais.
+    """
+
+    def __init__(self, descricao, datas, precos, mercados):
+        ordem = np.argsort(datas, kind="stable")
+        self.descricao = descricao
+        self.datas = datas[ordem]
+        self.precos = precos[ordem]
+        self.mercados = mercados[ordem]
+        # Soma exata em inteiros; a dos quadrados em float, que não transborda
+        self._soma = np.concatenate(([0], np.cumsum(self.precos)))
+        self._soma_quadrados = np.concatenate(([0.0], np.cumsum(self.precos.astype(float) ** 2)))
+
+    def __len__(self):
+        return len(self.precos)
+
+    def _indices(self, inicio=None, fim=None):
+        i = 0 if inicio is None else int(np.searchsorted(self.datas, np.datetime64(inicio, "D"), side="left"))
+        j = len(self.datas) if fim is None else int(np.searchsorted(self.datas, np.datetime64(fim, "D"), side="right"))
+        return i, j
+
+    def estatisticas(self, inicio=None, fim=None):
+        """Quantidade, média e desvio padrão dos preços no intervalo (datas inclusivas)"""
+        i, j = self._indices(inicio, fim)
+        n = j - i
+        if n == 0:
+            return {"n": 0, "media": None, "desvio": None}
+        media = (self._soma[j] - self._soma[i]) / n
+        variancia = max((self._soma_quadrados[j] - self._soma_quadrados[i]) / n - media ** 2, 0.0)
+        return {"n": n, "media": float(media), "desvio": float(variancia ** 0.5)}
+
+    def extremos(self, inicio=None, fim=None):
+        """Menor e maior preço no intervalo"""
+        i, j = self._indices(inicio, fim)
+        if i == j:
+            return None, None
+        trecho = self.precos[i:j]
+        return int(trecho.min()), int(trecho.max())
+
+    def variacao_ultima(self):
+        """Último preço, preço anterior e variação percentual entre eles"""
+        if len(self.precos) < 2:
+            return None
+        ultimo, anterior = int(self.precos[-1]), int(self.precos[-2])
+        variacao = (ultimo - anterior) / anterior * 100 if anterior else None
+        return {"ultimo": ultimo, "anterior": anterior, "variacao_pct": variacao, "data": self.datas[-1]}
+
+    def media_movel(self, janela):
+        """Média móvel das últimas `janela` observações (NaN enquanto não houver observações suficientes)"""
+        medias = np.full(len(self.precos), np.nan)
+        if janela <= len(self.precos):
+            medias[janela - 1:] = (self._soma[janela:] - self._soma[:-janela]) / janela
+        return medias
+
+    def para_frame(self):
+        return pd.DataFrame({"data": self.datas, "preco": self.precos, "mercado": self.mercados})
+
+
+class HistoricoPrecos:
+    """
+    Índice de preços por produto, montado em uma única passada sobre os itens comprados.
+    Cada produto tem sua série geral e uma série por mercado.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._descricoes = {}
+
+    @classmethod
+    def de_itens(cls, df_itens):
+        """
+        Monta o índice a partir de um frame de itens (services/frames.py) com as colunas
+        "codigo", "descricao", "data_compra", "valor_unitario" e "mercado_id" (ou "mercado").
+        """
+        historico = cls()
+        historico.adicionar_itens(df_itens)
+        return historico
+
+    def adicionar_itens(self, df_itens):
+        """Inclui novas observações, reconstruindo apenas as séries dos produtos afetados"""
+        if not df_itens.empty and df_itens["valor_unitario"].hasnans:
+            # Itens sem preço não entram na série
+            df_itens = df_itens[df_itens["valor_unitario"].notna()]
+        if df_itens.empty:
+            return
+        coluna_mercado = "mercado_id" if "mercado_id" in df_itens.columns else "mercado"
+        codigos = df_itens["codigo"] if "codigo" in df_itens.columns else pd.Series("", index=df_itens.index)
+        # Chave calculada uma vez por par (código, descrição) distinto, não por linha
+        cod_codigo, codigos_unicos = pd.factorize(codigos)
+        cod_descricao, descricoes_unicas = pd.factorize(df_itens["descricao"])
+        pares, pares_unicos = pd.factorize((cod_codigo.astype(np.int64) + 1) * (len(descricoes_unicas) + 1)
+                                           + cod_descricao + 1)
+        chaves_pares = np.array([
+            chave_produto(codigos_unicos[c - 1] if c else None, descricoes_unicas[d - 1] if d else None)
+            for c, d in zip(*np.divmod(pares_unicos, len(descricoes_unicas) + 1))
+        ], dtype=object)
+        chaves = chaves_pares[pares]
+        descricoes = df_itens["descricao"].to_numpy()
+        datas = frames.datas(df_itens["data_compra"])
+        precos = df_itens["valor_unitario"].to_numpy(dtype=np.int64)
+        mercados = df_itens[coluna_mercado].to_numpy()
+
+        # Uma única ordenação por (produto, mercado, data); cada série é uma fatia contígua
+        codigos_chave, chaves_unicas = pd.factorize(chaves)
+        codigos_mercado, mercados_unicos = pd.factorize(mercados)
+        ordem = np.lexsort((datas, codigos_mercado, codigos_chave))
+        codigos_chave, codigos_mercado = codigos_chave[ordem], codigos_mercado[ordem]
+        datas, precos, mercados, descricoes = datas[ordem], precos[ordem], mercados[ordem], descricoes[ordem]
+
+        limites_chave = np.flatnonzero(np.diff(codigos_chave)) + 1
+        for ini, fim in zip(np.r_[0, limites_chave], np.r_[limites_chave, len(ordem)]):
+            chave = chaves_unicas[codigos_chave[ini]]
+            self._descricoes.setdefault(chave, descricoes[fim - 1])
+            self._incluir(chave, None, datas[ini:fim], precos[ini:fim], mercados[ini:fim])
+            limites_mercado = np.flatnonzero(np.diff(codigos_mercado[ini:fim])) + 1
+            for m_ini, m_fim in zip(np.r_[0, limites_mercado] + ini, np.r_[limites_mercado, fim - ini] + ini):
+                self._incluir(chave, mercados_unicos[codigos_mercado[m_ini]],
+                              datas[m_ini:m_fim], precos[m_ini:m_fim], mercados[m_ini:m_fim])
+
+    def _incluir(self, chave, mercado, datas, precos, mercados):
+        anterior = self._series.get((chave, mercado))
+        if anterior is not None:
+            datas = np.concatenate((anterior.datas, datas))
+            precos = np.concatenate((anterior.precos, precos))
+            mercados = np.concatenate((anterior.mercados, mercados))
+        self._series[(chave, mercado)] = SeriePreco(self._descricoes[chave], datas, precos, mercados)
+
+    def serie(self, chave, mercado=None):
+        """Série de preços do produto (em todos os mercados ou em um mercado específico)"""
+        return self._series.get((chave, mercado))
+
+    def produtos(self):
+        """Produtos indexados, com descrição e número de observações, dos mais comprados para os menos"""
+        linhas = [
+            {"chave": chave, "descricao": serie.descricao, "observacoes": len(serie)}
+            for (chave, mercado), serie in self._series.items() if mercado is None
+        ]
+        df = pd.DataFrame(linhas, columns=["chave", "descricao", "observacoes"])
+        return df.sort_values(["observacoes", "descricao"], ascending=[False, True], ignore_index=True)
+
+    def variacoes(self):
+        """Último preço contra o anterior, para cada produto com ao menos duas observações"""
+        linhas = []
+        for (chave, mercado), serie in self._series.items():
+            if mercado is None:
+                variacao = serie.variacao_ultima()
+                if variacao:
+                    linhas.append({"chave": chave, "descricao": serie.descricao, **variacao})
+        return pd.DataFrame(linhas, columns=["chave", "descricao", "ultimo", "anterior", "variacao_pct", "data"])
@@ -0,0 +1,253 @@
+"""
+Perfil das seções mais pesadas das páginas (agrupamentos, montagem de gráficos,
+projeções), para descobrir onde vai o tempo de cada execução.
+
+Com a variável de ambiente PERFILAR_PAGINAS=1, cada trecho envolvido por
+`secao("nome")` (ou função decorada com `perfilar("nome")`) registra o tempo e o pico
+de memória alocada (tracemalloc) enquanto rodava. `iniciar_execucao(pagina)`, chamado no
+início da página, abre a execução; `fechar_execucao(pagina)`, no fim, a arquiva como
+completa. Uma execução que não chega ao fim (`st.rerun()` no meio da página, exceção,
+execução interrompida pelo Streamlit) é arquivada como incompleta no início da seguinte,
+sem se misturar a ela. O histórico das últimas execuções de cada página fica no processo e
+é exibido na página de administração "Desempenho".
+
+Desligado (padrão), `secao` devolve sempre o mesmo gerenciador vazio e `perfilar`
+devolve a própria função: o custo é o de um `with` que não faz nada.
+PERFILAR_MEMORIA=0 mantém só os tempos (o tracemalloc deixa as alocações mais lentas).
+O pico de memória é do processo: com várias sessões rodando ao mesmo tempo, é aproximado.
+"""
+import functools
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import streamlit as st
+
+ATIVO = os.getenv("PERFILAR_PAGINAS", "").lower() in ("1", "true", "sim")
+MEMORIA = ATIVO and os.getenv("PERFILAR_MEMORIA", "1").lower() not in ("0", "false", "nao", "não")
+# Chave em st.session_state da execução atual: {"pagina", "secoes"}
+CHAVE_EXECUCAO = "perfil_execucao"
+# Execuções guardadas por página
+MAX_EXECUCOES = 50
+
+# Histórico do processo: {pagina: deque de execuções}
+_historico = {}
+_lock_historico = threading.Lock()
+# Seções abertas na thread (para o pico de memória de seções aninhadas)
+_pilha = threading.local()
+# Seções registradas fora de uma sessão do Streamlit (linha de comando, benchmarks)
+_secoes_globais = []
+
+
+def ativo():
+    return ATIVO
+
+
+def _execucao_da_sessao():
+    """Execução atual da sessão do Streamlit, ou None fora de uma sessão"""
+    try:
+        execucao = st.session_state.get(CHAVE_EXECUCAO)
+        if execucao is None:
+            execucao = {"pagina": None, "secoes": []}
+            st.session_state[CHAVE_EXECUCAO] = execucao
+        return execucao
+    except Exception:
+        return None
+
+
+def _secoes_da_sessao():
+    execucao = _execucao_da_sessao()
+    return execucao["secoes"] if execucao is not None else _secoes_globais
+
+
+class _SecaoNula:
+    """Usado com o perfil desligado"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_SECAO_NULA = _SecaoNula()
+
+
+class _Secao:
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        pilha = getattr(_pilha, "abertas", None)
+        if pilha is None:
+            pilha = _pilha.abertas = []
+        self._nivel = len(pilha)
+        self._memoria_inicial = 0
+        self._pico = 0
+        if MEMORIA:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            atual, pico = tracemalloc.get_traced_memory()
+            # O pico do tracemalloc é global: a seção de fora guarda o que já viu antes de zerá-lo
+            if pilha:
+                pilha[-1]._pico = max(pilha[-1]._pico, pico)
+            tracemalloc.reset_peak()
+            self._memoria_inicial = atual
+        pilha.append(self)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, rastro):
+        segundos = time.perf_counter() - self._inicio
+        pilha = _pilha.abertas
+        pilha.pop()
+        pico_bytes = liquido_bytes = 0
+        if MEMORIA and tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            self._pico = max(self._pico, pico)
+            if pilha:
+                pilha[-1]._pico = max(pilha[-1]._pico, self._pico)
+            pico_bytes = max(self._pico - self._memoria_inicial, 0)
+            liquido_bytes = atual - self._memoria_inicial
+        _secoes_da_sessao().append({
+            "secao": self.nome,
+            "nivel": self._nivel,
+            "segundos": segundos,
+            "pico_bytes": pico_bytes,
+            "liquido_bytes": liquido_bytes,
+            "erro": tipo.__name__ if tipo else None,
+        })
+        return False
+
+
+def secao(nome):
+    """
+    Gerenciador de contexto que mede o trecho:
+
+        with profiling.secao("precos_por_item"):
+            ...
+    """
+    if not ATIVO:
+        return _SECAO_NULA
+    return _Secao(nome)
+
+
+def perfilar(nome=None):
+    """Decorador equivalente a `secao`; o nome padrão é o da função"""
+    def decorar(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with _Secao(nome or funcao.__qualname__):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorar
+
+
+def _arquivar(pagina, secoes, completa):
+    """Guarda as seções como uma execução da página no histórico do processo"""
+    if not secoes:
+        return None
+    execucao = {
+        "pagina": pagina,
+        "fim": time.time(),
+        "completa": completa,
+        # Só as seções de primeiro nível: as aninhadas já estão contidas nelas
+        "total_segundos": sum(s["segundos"] for s in secoes if s["nivel"] == 0),
+        "pico_bytes": max(s["pico_bytes"] for s in secoes),
+        "secoes": secoes,
+    }
+    with _lock_historico:
+        _historico.setdefault(pagina, deque(maxlen=MAX_EXECUCOES)).append(execucao)
+    return execucao
+
+
+def iniciar_execucao(pagina):
+    """
+    Abre uma execução da página. As seções que sobraram da execução anterior (que não
+    chegou a `fechar_execucao`) são arquivadas como uma execução incompleta, e não somadas
+    a esta. Deve ser chamado no início da página; não faz nada com o perfil desligado.
+    """
+    if not ATIVO:
+        return None
+    atual = _execucao_da_sessao()
+    if atual is None:
+        anterior, _secoes_globais[:] = list(_secoes_globais), []
+        return _arquivar(pagina, anterior, completa=False)
+    anterior = atual
+    st.session_state[CHAVE_EXECUCAO] = {"pagina": pagina, "secoes": []}
+    if anterior["pagina"] is None:
+        return None
+    return _arquivar(anterior["pagina"], anterior["secoes"], completa=False)
+
+
+def fechar_execucao(pagina):
+    """
+    Arquiva as seções medidas desde `iniciar_execucao` como uma execução completa da página.
+    Deve ser chamado no fim da página; não faz nada com o perfil desligado.
+    """
+    if not ATIVO:
+        return None
+    execucao = _execucao_da_sessao()
+    if execucao is None:
+        secoes, _secoes_globais[:] = list(_secoes_globais), []
+    else:
+        secoes, execucao["secoes"] = execucao["secoes"], []
+    return _arquivar(pagina, secoes, completa=True)
+
+
+def paginas():
+    with _lock_historico:
+        return sorted(_historico)
+
+
+def historico(pagina):
+    """Execuções guardadas da página, da mais antiga para a mais recente"""
+    with _lock_historico:
+        return list(_historico.get(pagina, ()))
+
+
+def resumo_secoes(execucoes):
+    """
+    Estatísticas por seção sobre as execuções: lista de {secao, nivel, execucoes,
+    media_ms, mediana_ms, p95_ms, max_ms, pico_max_kb}, da mais demorada para a mais rápida.
+    """
+    por_secao = {}
+    for execucao in execucoes:
+        # Uma seção pode rodar mais de uma vez na mesma execução: soma as ocorrências
+        tempos_execucao = {}
+        for s in execucao["secoes"]:
+            chave = (s["secao"], s["nivel"])
+            tempo, pico = tempos_execucao.get(chave, (0.0, 0))
+            tempos_execucao[chave] = (tempo + s["segundos"], max(pico, s["pico_bytes"]))
+        for chave, valores in tempos_execucao.items():
+            por_secao.setdefault(chave, []).append(valores)
+
+    resumo = []
+    for (nome, nivel), valores in por_secao.items():
+        tempos = sorted(tempo * 1000 for tempo, _ in valores)
+        resumo.append({
+            "secao": nome,
+            "nivel": nivel,
+            "execucoes": len(tempos),
+            "media_ms": sum(tempos) / len(tempos),
+            "mediana_ms": statistics.median(tempos),
+            "p95_ms": tempos[min(len(tempos) - 1, int(0.95 * len(tempos)))],
+            "max_ms": tempos[-1],
+            "pico_max_kb": max(pico for _, pico in valores) / 1024,
+        })
+    return sorted(resumo, key=lambda r: -r["media_ms"])
+
+
+def limpar(pagina=None):
+    """Descarta o histórico de uma página (ou de todas)"""
+    with _lock_historico:
+        if pagina is None:
+            _historico.clear()
+        else:
+            _historico.pop(pagina, None)
@@ -0,0 +1,117 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from services import db_queries, db_queries_async, frames
+from services.cache import versao_tabelas
+
+UM_DIA = datetime.timedelta(days=1)
+
+
+def _para_data(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    return datetime.date.fromisoformat(str(valor))
+
+
+def intervalos_faltantes(intervalos, inicio, fim):
+    """
+    Dado uma lista ordenada de intervalos [inicio, fim] já baixados (datas inclusivas,
+    sem sobreposição), retorna os sub-intervalos de [inicio, fim] que ainda faltam.
+    """
+    faltantes = []
+    cursor = inicio
+    for ini, fi in intervalos:
+        if fi < cursor:
+            continue
+        if ini > fim:
+            break
+        if ini > cursor:
+            faltantes.append((cursor, ini - UM_DIA))
+        cursor = max(cursor, fi + UM_DIA)
+        if cursor > fim:
+            break
+    if cursor <= fim:
+        faltantes.append((cursor, fim))
+    return faltantes
+
+
+def mesclar_intervalos(intervalos):
+    """Ordena e une intervalos sobrepostos ou vizinhos (diferença de um dia)"""
+    mesclados = []
+    for ini, fi in sorted(intervalos):
+        if mesclados and ini <= mesclados[-1][1] + UM_DIA:
+            mesclados[-1] = (mesclados[-1][0], max(mesclados[-1][1], fi))
+        else:
+            mesclados.append((ini, fi))
+    return mesclados
+
+
+class PurchaseStore:
+    """
+    Guarda as compras já baixadas de um usuário (opcionalmente só de alguns mercados)
+    e os intervalos de datas que elas cobrem.
+    Ao pedir um período, busca no banco apenas os trechos que ainda não foram baixados
+    e devolve o recorte do período a partir dos dados acumulados.
+    """
+
+    def __init__(self, user_id, mercado_ids=None):
+        self.user_id = user_id
+        self.mercado_ids = mercado_ids
+        self.versao = versao_tabelas(*db_queries.TABELAS_COMPRAS_DETALHADAS)
+        self.intervalos = []
+        self.cabecalho = pd.DataFrame()
+        self.detalhadas = pd.DataFrame()
+
+    def _baixar(self, intervalos):
+        """Busca cabeçalhos e itens de todos os intervalos ao mesmo tempo"""
+        consultas = []
+        for inicio, fim in intervalos:
+            consultas.append(db_queries_async.get_compras_cabecalho_periodo(inicio, fim, mercado_ids=self.mercado_ids))
+            consultas.append(db_queries_async.get_compras_detalhadas_rpc(inicio, fim, mercado_ids=self.mercado_ids))
+        resultados = db_queries_async.reunir(*consultas)
+        # Intervalos faltantes são disjuntos dos já baixados: basta concatenar
+        cabecalhos = [frames.de_registros(r, frames.ESQUEMA_CABECALHO) for r in resultados[0::2] if r]
+        detalhadas = [frames.de_registros(r, frames.ESQUEMA_DETALHADAS) for r in resultados[1::2] if r]
+        if cabecalhos:
+            self.cabecalho = frames.concatenar([self.cabecalho, *cabecalhos])
+        if detalhadas:
+            self.detalhadas = frames.concatenar([self.detalhadas, *detalhadas])
+
+    def buscar(self, inicio, fim):
+        """Retorna (df_cabecalho, df_detalhadas) do período, baixando só o que falta"""
+        inicio, fim = _para_data(inicio), _para_data(fim)
+        faltantes = intervalos_faltantes(self.intervalos, inicio, fim)
+        if faltantes:
+            self._baixar(faltantes)
+            self.intervalos = mesclar_intervalos(self.intervalos + faltantes)
+        return self._recortar(self.cabecalho, inicio, fim), self._recortar(self.detalhadas, inicio, fim)
+
+    @staticmethod
+    def _recortar(df, inicio, fim):
+        if df.empty:
+            return df
+        datas = frames.datas(df["data_compra"])
+        mascara = (datas >= np.datetime64(inicio, "D")) & (datas <= np.datetime64(fim, "D"))
+        ordem = np.argsort(datas[mascara], kind="stable")
+        return df[mascara].iloc[ordem].reset_index(drop=True)
+
+
+def obter_store(user_id, mercado_ids=None):
+    """
+    Retorna o PurchaseStore da sessão atual. Um novo store é criado ao trocar de usuário
+    ou de seleção de mercados, ou quando alguma compra foi registrada/removida desde a
+    criação do anterior.
+    """
+    mercado_ids = tuple(sorted(mercado_ids)) if mercado_ids is not None else None
+    store = st.session_state.get("purchase_store")
+    versao = versao_tabelas(*db_queries.TABELAS_COMPRAS_DETALHADAS)
+    if (store is None or store.user_id != user_id or store.mercado_ids != mercado_ids
+            or store.versao != versao):
+        store = PurchaseStore(user_id, mercado_ids)
+        st.session_state["purchase_store"] = store
+    return store
@@ -0,0 +1,308 @@
+"""
+Snapshot local e colunar das compras de um usuário, para análises sem esperar o banco.
+
+Cabeçalhos e itens detalhados ficam em arquivos Arrow IPC no disco, um por mês de
+compra, lidos com memory map (as colunas são acessadas direto do arquivo, sem cópia).
+A sincronização compara a assinatura de cada mês no banco (quantidade de compras e uma
+versão que os triggers renovam a cada alteração no mês, ver sql/get_assinaturas_compras.sql)
+com a guardada no snapshot e baixa de novo, inteiros, só os meses diferentes. Assim entram compras novas (inclusive com id menor que o último
+recebido), alterações, remoções e renomeação de mercados. Sem a RPC de assinaturas no
+banco, cada sincronização baixa tudo.
+
+Os arquivos ficam em `SNAPSHOT_DIR` (padrão ~/.cache/supermarket_control/snapshots), numa
+pasta por usuário com permissão 0700, SEM criptografia: qualquer um com acesso à conta do
+sistema operacional (ou a um backup do disco) lê as compras. Não use em máquinas compartilhadas.
+
+Requer pyarrow (instalado junto com o Streamlit); sem ele, `disponivel()` retorna False.
+Os valores monetários são gravados em centavos (int64), como `db_queries` os entrega (utils/money.py).
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+from services import db_queries, frames
+from services.cache import versao_tabelas
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+
+DIRETORIO_SNAPSHOTS = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "supermarket_control", "snapshots")
+)
+VERSAO_FORMATO = 3
+TABELAS = ("cabecalho", "itens")
+# Intervalo mínimo (s) entre sincronizações automáticas de uma mesma sessão
+INTERVALO_SINCRONIZACAO = 60
+
+# Um lock por usuário: sessões do mesmo usuário não gravam segmentos ao mesmo tempo
+_locks_usuarios = {}
+_lock_registro = threading.Lock()
+
+
+def disponivel():
+    return pa is not None
+
+
+def _esquemas():
+    return {
+        "cabecalho": pa.schema([
+            ("id", pa.int64()), ("mercado_id", pa.int64()), ("data_compra", pa.date32()),
+            ("valor_total", pa.int64()), ("descontos", pa.int64()), ("valor_final_pago", pa.int64()),
+        ]),
+        "itens": pa.schema([
+            ("item", pa.int64()), ("compra_id", pa.int64()), ("data_compra", pa.date32()),
+            ("codigo", pa.string()), ("descricao", pa.string()), ("quantidade", pa.float64()),
+            ("unidade", pa.string()), ("valor_unitario", pa.int64()), ("valor_total", pa.int64()),
+            ("desconto", pa.int64()), ("mercado_id", pa.int64()), ("mercado", pa.string()),
+            ("cidade", pa.string()),
+        ]),
+    }
+
+
+def _para_tabela(linhas, esquema):
+    """Lista de dicts de `db_queries` (valores em centavos) -> tabela Arrow com o esquema fixo do snapshot"""
+    colunas = []
+    for campo in esquema:
+        valores = [linha.get(campo.name) for linha in linhas]
+        if pa.types.is_date32(campo.type):
+            colunas.append(pa.array([str(v)[:10] if v is not None else None for v in valores]).cast(campo.type))
+        else:
+            colunas.append(pa.array(valores, type=campo.type))
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+def _lock_usuario(user_id):
+    with _lock_registro:
+        return _locks_usuarios.setdefault(user_id, threading.Lock())
+
+
+def _mes(data):
+    """Primeiro dia do mês de uma data ("YYYY-MM-DD"), a chave dos segmentos"""
+    return str(data)[:7] + "-01"
+
+
+def _fim_do_mes(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    proximo = datetime.date(ano + numero // 12, numero % 12 + 1, 1)
+    return proximo - datetime.timedelta(days=1)
+
+
+def _intervalos(meses):
+    """Agrupa meses (ordenados) em intervalos contíguos de datas [inicio, fim], um por busca"""
+    intervalos = []
+    for mes in sorted(meses):
+        inicio = datetime.date.fromisoformat(mes)
+        if intervalos and intervalos[-1][1] + datetime.timedelta(days=1) == inicio:
+            intervalos[-1][1] = _fim_do_mes(mes)
+        else:
+            intervalos.append([inicio, _fim_do_mes(mes)])
+    return intervalos
+
+
+def _baixar(buscar, coluna_id, data_inicio=None, data_fim=None):
+    """Todas as linhas de `buscar` (paginada por id) no intervalo"""
+    linhas = []
+    apos_id = 0
+    while True:
+        lote = buscar(apos_id, data_inicio=data_inicio, data_fim=data_fim) or []
+        if not lote:
+            return linhas
+        linhas.extend(lote)
+        apos_id = lote[-1][coluna_id]
+
+
+class SnapshotCompras:
+    """Snapshot de um usuário em `diretorio/<user_id>/` (segmentos .arrow por mês e meta.json)"""
+
+    def __init__(self, user_id, diretorio=DIRETORIO_SNAPSHOTS):
+        if not disponivel():
+            raise RuntimeError("pyarrow não está instalado")
+        self.user_id = user_id
+        self.diretorio = diretorio
+        self.pasta = os.path.join(diretorio, str(user_id))
+        self.esquemas = _esquemas()
+        self.sincronizado_em = None
+        self._tabelas = {}
+        self.meta = self._ler_meta()
+
+    # ---------- metadados ----------
+
+    def _meta_vazia(self):
+        # meses: {"YYYY-MM-01": {"assinatura": str, "cabecalho": arquivo, "itens": arquivo}}
+        return {"versao": VERSAO_FORMATO, "meses": {}, "proximo_segmento": 1}
+
+    def _ler_meta(self):
+        try:
+            with open(os.path.join(self.pasta, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("versao") == VERSAO_FORMATO:
+                return meta
+        except (OSError, ValueError):
+            pass
+        return self._meta_vazia()
+
+    def _gravar_meta(self):
+        caminho = os.path.join(self.pasta, "meta.json")
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(caminho + ".tmp", caminho)
+
+    def _criar_pasta(self):
+        os.makedirs(self.diretorio, mode=0o700, exist_ok=True)
+        os.makedirs(self.pasta, mode=0o700, exist_ok=True)
+        # makedirs não altera a permissão de uma pasta que já existia
+        os.chmod(self.pasta, 0o700)
+
+    # ---------- segmentos ----------
+
+    def _gravar_segmento(self, nome, tabela):
+        arquivo = f"{nome}-{self.meta['proximo_segmento']:06d}.arrow"
+        self.meta["proximo_segmento"] += 1
+        caminho = os.path.join(self.pasta, arquivo)
+        with pa.OSFile(caminho + ".tmp", "wb") as saida, ipc.new_file(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        os.replace(caminho + ".tmp", caminho)
+        return arquivo
+
+    def _substituir_meses(self, meses, linhas_por_tabela, assinaturas):
+        """Troca os segmentos de `meses` pelas linhas baixadas (meses sem linhas são removidos)"""
+        por_mes = {nome: {} for nome in TABELAS}
+        for nome, linhas in linhas_por_tabela.items():
+            for linha in linhas:
+                por_mes[nome].setdefault(_mes(linha["data_compra"]), []).append(linha)
+        for mes in meses:
+            if mes not in por_mes["cabecalho"]:
+                self.meta["meses"].pop(mes, None)
+                continue
+            self.meta["meses"][mes] = {"assinatura": assinaturas.get(mes), **{
+                nome: self._gravar_segmento(nome, _para_tabela(por_mes[nome].get(mes, []), self.esquemas[nome]))
+                for nome in TABELAS
+            }}
+
+    def _remover_orfaos(self):
+        """Apaga os segmentos que o meta.json não referencia mais (meses substituídos, formato antigo)"""
+        em_uso = {dados[nome] for dados in self.meta["meses"].values() for nome in TABELAS}
+        for arquivo in os.listdir(self.pasta):
+            if (arquivo.endswith(".arrow") or arquivo.endswith(".arrow.tmp")) and arquivo not in em_uso:
+                try:
+                    os.remove(os.path.join(self.pasta, arquivo))
+                except OSError:
+                    pass
+
+    # ---------- sincronização ----------
+
+    def _assinaturas_remotas(self):
+        """{mes: assinatura} do banco, ou None se a RPC de assinaturas não existir"""
+        try:
+            return {_mes(linha["mes"]): linha["assinatura"] for linha in db_queries.get_assinaturas_compras()}
+        except Exception as e:
+            if not db_queries.recurso_inexistente(e):
+                raise
+            return None
+
+    def sincronizar(self):
+        """Baixa de novo os meses cuja assinatura mudou no banco e troca os segmentos deles"""
+        with _lock_usuario(self.user_id):
+            self._criar_pasta()
+            self.meta = self._ler_meta()
+            self._tabelas = {}
+            remotas = self._assinaturas_remotas()
+            locais = {mes: dados["assinatura"] for mes, dados in self.meta["meses"].items()}
+            if remotas is None:
+                # Sem assinaturas não há como saber o que mudou: baixa tudo
+                linhas = {
+                    "cabecalho": _baixar(db_queries.get_compras_cabecalho_desde, "id"),
+                    "itens": _baixar(db_queries.get_compras_detalhadas_desde, "item"),
+                }
+                meses = set(locais) | {_mes(linha["data_compra"]) for linha in linhas["cabecalho"]}
+                remotas = {}
+            else:
+                meses = {mes for mes in set(remotas) | set(locais) if remotas.get(mes) != locais.get(mes)}
+                linhas = {"cabecalho": [], "itens": []}
+                for inicio, fim in _intervalos(meses):
+                    linhas["cabecalho"] += _baixar(db_queries.get_compras_cabecalho_desde, "id", inicio, fim)
+                    linhas["itens"] += _baixar(db_queries.get_compras_detalhadas_desde, "item", inicio, fim)
+            if meses:
+                self._substituir_meses(meses, linhas, remotas)
+                self._gravar_meta()
+            self._remover_orfaos()
+        self.sincronizado_em = time.time()
+        return self
+
+    # ---------- leitura ----------
+
+    def _ler_segmentos(self, nome):
+        return [
+            ipc.open_file(pa.memory_map(os.path.join(self.pasta, self.meta["meses"][mes][nome]))).read_all()
+            for mes in sorted(self.meta["meses"])
+        ]
+
+    def tabela(self, nome):
+        """Tabela Arrow ("cabecalho" ou "itens") com os segmentos mapeados em memória, sem cópia"""
+        if nome not in self._tabelas:
+            try:
+                partes = self._ler_segmentos(nome)
+            except FileNotFoundError:
+                # Outra sessão do mesmo usuário sincronizou e trocou os segmentos
+                self.meta = self._ler_meta()
+                partes = self._ler_segmentos(nome)
+            self._tabelas[nome] = pa.concat_tables(partes) if partes else self.esquemas[nome].empty_table()
+        return self._tabelas[nome]
+
+    def coluna(self, nome, coluna):
+        """Acesso direto (zero-copy) a uma coluna do snapshot"""
+        return self.tabela(nome).column(coluna)
+
+    def _filtrar(self, tabela, inicio, fim, mercado_ids=None):
+        datas = tabela.column("data_compra")
+        mascara = pc.and_(
+            pc.greater_equal(datas, pa.scalar(inicio, pa.date32())),
+            pc.less_equal(datas, pa.scalar(fim, pa.date32())),
+        )
+        if mercado_ids is not None:
+            mascara = pc.and_(mascara, pc.is_in(tabela.column("mercado_id"), pa.array(list(mercado_ids), pa.int64())))
+        return tabela.filter(mascara)
+
+    def mercado_ids_periodo(self, inicio, fim):
+        """Ids (ordenados) dos mercados com compras no intervalo"""
+        ids = pc.unique(self._filtrar(self.tabela("cabecalho"), inicio, fim).column("mercado_id"))
+        return sorted(ids.to_pylist())
+
+    def periodo(self, inicio, fim, mercado_ids=None):
+        """Retorna (df_cabecalho, df_detalhadas) do período, no mesmo formato de `PurchaseStore.buscar`"""
+        cabecalho = self._filtrar(self.tabela("cabecalho"), inicio, fim, mercado_ids)
+        itens = self._filtrar(self.tabela("itens"), inicio, fim, mercado_ids)
+        cabecalho = cabecalho.sort_by([("data_compra", "ascending"), ("id", "ascending")])
+        itens = itens.sort_by([("data_compra", "ascending"), ("item", "ascending")])
+        return (
+            frames.de_tabela_arrow(cabecalho, frames.ESQUEMA_CABECALHO),
+            frames.de_tabela_arrow(itens, frames.ESQUEMA_DETALHADAS),
+        )
+
+
+def obter_snapshot(user_id):
+    """
+    Snapshot da sessão atual, sincronizado ao ser criado, quando alguma compra foi
+    registrada/removida neste processo ou a cada `INTERVALO_SINCRONIZACAO` segundos.
+    Retorna None se pyarrow não estiver disponível.
+    """
+    if not disponivel() or not user_id:
+        return None
+    versao = versao_tabelas(*db_queries.TABELAS_COMPRAS_DETALHADAS)
+    guardado = st.session_state.get("snapshot_compras")
+    if guardado is None or guardado[1].user_id != user_id:
+        guardado = (None, SnapshotCompras(user_id))
+    snapshot = guardado[1]
+    if (guardado[0] != versao or snapshot.sincronizado_em is None
+            or time.time() - snapshot.sincronizado_em > INTERVALO_SINCRONIZACAO):
+        snapshot.sincronizar()
+    st.session_state["snapshot_compras"] = (versao, snapshot)
+    return snapshot
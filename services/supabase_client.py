@@ -1,44 +1,296 @@
 
 import streamlit as st
-from supabase import create_client
+from services import tracing
+import asyncio
+import base64
+import hashlib
+import hmac
+import httpx
+import importlib.util
+import json
 import os
+import threading
+import time
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 load_dotenv()
 
-@st.cache_resource
-def init_supabase_client():
+# Chave em st.session_state do cliente Supabase da sessão
+CHAVE_CLIENTE = "supabase_client"
+
+
+def _config(nome, padrao=None):
+    """Lê uma configuração de st.secrets (Streamlit Cloud) ou das variáveis de ambiente (localhost)"""
     try:
-        # Se existir no Streamlit Cloud, usa secrets
-        supabase_url = st.secrets["SUPABASE_URL"]
-        supabase_key = st.secrets["SUPABASE_KEY"]
+        return st.secrets[nome]
     except Exception:
-        # Caso contrário, pega das variáveis de ambiente (localhost)
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-    
+        return os.getenv(nome, padrao)
+
+
+class _TransporteCompartilhado(httpx.BaseTransport):
+    """Usa o pool de conexões do processo; fechar o cliente da sessão não fecha o pool"""
+
+    def __init__(self, transporte):
+        self._transporte = transporte
+
+    def handle_request(self, request):
+        return self._transporte.handle_request(request)
+
+    def close(self):
+        pass
+
+
+def _limites_conexoes():
+    return httpx.Limits(
+        max_connections=int(_config("SUPABASE_MAX_CONEXOES", 50)),
+        max_keepalive_connections=int(_config("SUPABASE_MAX_CONEXOES_OCIOSAS", 20)),
+        keepalive_expiry=float(_config("SUPABASE_KEEPALIVE_S", 30)),
+    )
+
+
+def _usar_http2():
+    http2 = str(_config("SUPABASE_HTTP2", "auto")).lower()
+    return importlib.util.find_spec("h2") is not None if http2 == "auto" else http2 in ("1", "true", "sim")
+
+
+def _timeout():
+    return httpx.Timeout(float(_config("SUPABASE_TIMEOUT_S", 120)), connect=10.0)
+
+
+@st.cache_resource
+def _pool_conexoes():
+    """
+    Pool de conexões HTTP compartilhado por todas as sessões (keep-alive e HTTP/2
+    quando o pacote h2 está instalado), com limites configuráveis.
+    """
+    return httpx.HTTPTransport(http2=_usar_http2(), limits=_limites_conexoes())
+
+
+def init_supabase_client():
+    """
+    Cria um cliente Supabase novo, com estado de autenticação próprio, sobre o
+    pool de conexões compartilhado. Cada sessão do Streamlit usa o seu (ver
+    `cliente_da_sessao`), para que o token de um usuário nunca seja visto por outro.
+    """
+    supabase_url = _config("SUPABASE_URL")
+    supabase_key = _config("SUPABASE_KEY")
+
     if not supabase_url or not supabase_key:
         st.error("Credenciais do Supabase não configuradas. Verifique st.secrets ou variáveis de ambiente.")
         st.stop()
 
-    return create_client(supabase_url, supabase_key)
+    # O cliente HTTP guarda cabeçalhos (incluindo o token), por isso é um por sessão;
+    # só o transporte, que mantém as conexões abertas, é compartilhado
+    cliente_http = httpx.Client(
+        transport=_TransporteCompartilhado(_pool_conexoes()),
+        timeout=_timeout(),
+        follow_redirects=True,
+    )
+    # Importado só aqui: o pacote supabase custa ~0,4 s e páginas sem login não precisam dele
+    from supabase import create_client, ClientOptions
+
+    # A renovação do token fica com a identidade da sessão (sem threads de timer por cliente)
+    opcoes = ClientOptions(httpx_client=cliente_http, auto_refresh_token=False)
+    return create_client(supabase_url, supabase_key, options=opcoes)
+
+
+def cliente_da_sessao():
+    """Cliente Supabase da sessão atual, criado no primeiro uso"""
+    cliente = st.session_state.get(CHAVE_CLIENTE)
+    if cliente is None:
+        cliente = init_supabase_client()
+        st.session_state[CHAVE_CLIENTE] = cliente
+    return cliente
+
+
+class _ClienteDaSessao:
+    """Encaminha `supabase.table(...)`, `supabase.auth...` etc. para o cliente da sessão atual"""
+
+    def __getattr__(self, nome):
+        # Com RASTREAR_CONSULTAS=1, as consultas passam pelo rastreador da sessão (ver services/tracing.py)
+        return getattr(tracing.envolver(cliente_da_sessao()), nome)
+
+
+supabase = _ClienteDaSessao()
+
+# ======================
+# CLIENTE ASSÍNCRONO
+# ======================
+
+# Chave em st.session_state do cliente assíncrono da sessão (e do token com que foi criado)
+CHAVE_CLIENTE_ASYNC = "supabase_client_async"
+_loop_async = None
+_lock_loop_async = threading.Lock()
+
+
+class _TransporteAsyncCompartilhado(httpx.AsyncBaseTransport):
+    """Versão assíncrona de `_TransporteCompartilhado`"""
+
+    def __init__(self, transporte):
+        self._transporte = transporte
+
+    async def handle_async_request(self, request):
+        return await self._transporte.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+def _loop_de_fundo():
+    """
+    Event loop do processo em que rodam todas as consultas assíncronas. Como as
+    conexões de um pool assíncrono ficam presas ao loop que as abriu, um único loop
+    permanente permite reaproveitá-las entre reruns e sessões.
+    """
+    global _loop_async
+    with _lock_loop_async:
+        if _loop_async is None:
+            _loop_async = asyncio.new_event_loop()
+            threading.Thread(target=_loop_async.run_forever, name="supabase-async", daemon=True).start()
+    return _loop_async
+
+
+def executar_async(corrotina):
+    """Executa a corrotina no loop de fundo e espera o resultado (chamado a partir do script da página)"""
+    return asyncio.run_coroutine_threadsafe(corrotina, _loop_de_fundo()).result()
+
+
+_pool_async = None
+_lock_pool_async = threading.Lock()
+
+
+def _pool_conexoes_async():
+    """
+    Pool de conexões assíncrono do processo. É criado a partir do loop de fundo (fora
+    de qualquer script), por isso é um singleton do módulo e não um `st.cache_resource`.
+    """
+    global _pool_async
+    with _lock_pool_async:
+        if _pool_async is None:
+            _pool_async = httpx.AsyncHTTPTransport(http2=_usar_http2(), limits=_limites_conexoes())
+    return _pool_async
+
+
+async def _criar_cliente_async(token):
+    cliente_http = httpx.AsyncClient(
+        transport=_TransporteAsyncCompartilhado(_pool_conexoes_async()),
+        timeout=_timeout(),
+        follow_redirects=True,
+    )
+    from supabase import acreate_client, AsyncClientOptions
+
+    cabecalhos = {"Authorization": f"Bearer {token}"} if token else {}
+    opcoes = AsyncClientOptions(httpx_client=cliente_http, headers=cabecalhos, auto_refresh_token=False)
+    return await acreate_client(_config("SUPABASE_URL"), _config("SUPABASE_KEY"), options=opcoes)
+
+
+def cliente_async_da_sessao():
+    """
+    Cliente Supabase assíncrono da sessão atual, autenticado com o token da identidade
+    da sessão (as políticas de RLS continuam valendo). É recriado quando o token é renovado.
+    """
+    identidade = _identidade()
+    token = identidade["token"] if identidade else None
+    salvo = st.session_state.get(CHAVE_CLIENTE_ASYNC)
+    if salvo is None or salvo[0] != token:
+        salvo = (token, executar_async(_criar_cliente_async(token)))
+        st.session_state[CHAVE_CLIENTE_ASYNC] = salvo
+    return tracing.envolver(salvo[1])
+
+
+# ======================
+# IDENTIDADE DA SESSÃO
+# ======================
+
+# Chave em st.session_state (o prefixo "user_" faz o logout descartá-la)
+CHAVE_IDENTIDADE = "user_identidade"
+# Antecedência (s) com que o token é renovado antes de expirar
+MARGEM_RENOVACAO = 60
+
+
+def _base64url(trecho: str) -> bytes:
+    return base64.urlsafe_b64decode(trecho + "=" * (-len(trecho) % 4))
+
+
+def validar_jwt(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Valida o access token localmente e retorna suas claims (ou None se inválido).
+    Confere o formato e a expiração; se SUPABASE_JWT_SECRET estiver configurado,
+    confere também a assinatura HS256.
+    """
+    try:
+        cabecalho, corpo, assinatura = token.split(".")
+        claims = json.loads(_base64url(corpo))
+        segredo = _config("SUPABASE_JWT_SECRET")
+        if segredo:
+            if json.loads(_base64url(cabecalho)).get("alg") != "HS256":
+                return None
+            esperada = hmac.new(segredo.encode(), f"{cabecalho}.{corpo}".encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(esperada, _base64url(assinatura)):
+                return None
+    except Exception:
+        return None
+    if not claims.get("sub") or float(claims.get("exp", 0)) <= time.time():
+        return None
+    return claims
+
+
+def _identidade_da_sessao(sessao) -> Optional[Dict[str, Any]]:
+    if not sessao or not sessao.access_token:
+        return None
+    claims = validar_jwt(sessao.access_token)
+    if not claims:
+        return None
+    usuario = sessao.user
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email") or (usuario.email if usuario else None),
+        "usuario": usuario,
+        "token": sessao.access_token,
+        "expira_em": float(claims["exp"]),
+    }
+
+
+def _identidade() -> Optional[Dict[str, Any]]:
+    """
+    Identidade do usuário da sessão, guardada em st.session_state.
+    Só há chamada de rede quando o token está perto de expirar (renovação).
+    """
+    identidade = st.session_state.get(CHAVE_IDENTIDADE)
+    if identidade and identidade["expira_em"] - MARGEM_RENOVACAO > time.time():
+        return identidade
+    # Sem cliente na sessão não há login (a sessão fica no cliente): nada a criar nem importar
+    if st.session_state.get(CHAVE_CLIENTE) is None:
+        st.session_state.pop(CHAVE_IDENTIDADE, None)
+        return None
+    try:
+        sessao = supabase.auth.get_session()  # lida do armazenamento local do cliente
+        if sessao and sessao.expires_at and sessao.expires_at - MARGEM_RENOVACAO <= time.time():
+            sessao = supabase.auth.refresh_session(sessao.refresh_token).session
+        identidade = _identidade_da_sessao(sessao)
+    except Exception:
+        identidade = None
+    if identidade:
+        st.session_state[CHAVE_IDENTIDADE] = identidade
+    else:
+        st.session_state.pop(CHAVE_IDENTIDADE, None)
+    return identidade
+
+
+def limpar_identidade():
+    """Descarta a identidade guardada (após login ou logout)"""
+    st.session_state.pop(CHAVE_IDENTIDADE, None)
 
-supabase = init_supabase_client()
 
 # Funções de autenticação
 def get_current_user():
     """Retorna o usuário atual autenticado"""
-    try:
-        response = supabase.auth.get_user()
-        return response.user if response else None
-    except Exception as e:
-        st.error(f"Erro ao obter usuário: {e}")
-        return None
+    identidade = _identidade()
+    return identidade["usuario"] if identidade else None
 
 def is_user_authenticated() -> bool:
     """Verifica se o usuário está autenticado"""
-    user = get_current_user()
-    return user is not None
+    return _identidade() is not None
 
 def require_authentication():
     """Força autenticação - redireciona para login se não autenticado"""
@@ -49,13 +301,13 @@ def require_authentication():
 
 def get_user_id() -> Optional[str]:
     """Retorna o ID do usuário atual"""
-    user = get_current_user()
-    return user.id if user else None
+    identidade = _identidade()
+    return identidade["id"] if identidade else None
 
 def get_user_email() -> Optional[str]:
     """Retorna o email do usuário atual"""
-    user = get_current_user()
-    return user.email if user else None
+    identidade = _identidade()
+    return identidade["email"] if identidade else None
 
 def is_admin_user() -> bool:
     """Verifica se o usuário atual é administrador"""
@@ -0,0 +1,337 @@
+"""
+Rastreamento das chamadas ao Supabase (tabelas e RPCs), para descobrir quais
+consultas dominam o tempo de cada página.
+
+Com a variável de ambiente RASTREAR_CONSULTAS=1, o cliente da sessão (síncrono e
+assíncrono) é envolvido por `ClienteRastreado`: cada `execute()` registra tabela ou
+RPC, operação, filtros, linhas retornadas, tamanho da resposta (JSON) e tempo.
+As chamadas são agrupadas por execução da página (`iniciar_execucao`, chamado no início
+de cada página, arquiva as da execução anterior, mesmo que ela tenha parado no meio com
+`st.stop()` ou uma exceção) e somadas no processo, para exportação em JSON ou no formato
+de texto do Prometheus. `painel_lateral`, no fim da página, mostra as da execução atual
+aos administradores.
+
+Desligado (padrão), o cliente é usado diretamente, sem nenhum custo.
+"""
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+ATIVO = os.getenv("RASTREAR_CONSULTAS", "").lower() in ("1", "true", "sim")
+# Chave em st.session_state do rastreador da sessão
+CHAVE_RASTREADOR = "rastreador_consultas"
+# Execuções de página guardadas por sessão
+MAX_EXECUCOES = 20
+# Chamadas iguais (tabela/RPC e operação) numa mesma execução a partir das quais há suspeita de N+1
+LIMITE_REPETICOES = 5
+# Métodos do construtor de consultas que definem a operação (os demais são filtros/modificadores)
+OPERACOES = ("select", "insert", "update", "upsert", "delete")
+
+# Totais do processo, por (tipo, nome, operação)
+_totais = {}
+_lock_totais = threading.Lock()
+
+
+def ativo():
+    return ATIVO
+
+
+class Rastreador:
+    """Chamadas da execução atual de uma página e o histórico das últimas execuções"""
+
+    def __init__(self, max_execucoes=MAX_EXECUCOES):
+        self.pagina = None
+        self.chamadas = []
+        self.execucoes = deque(maxlen=max_execucoes)
+        self._lock = threading.Lock()
+
+    def registrar(self, chamada):
+        with self._lock:
+            self.chamadas.append(chamada)
+        _acumular(chamada)
+
+    def iniciar_execucao(self, pagina):
+        """Arquiva as chamadas da execução anterior (se houver) e passa a contar as de `pagina`"""
+        with self._lock:
+            anterior, chamadas = self.pagina, self.chamadas
+            self.pagina, self.chamadas = pagina, []
+        if anterior is None and not chamadas:
+            return None
+        execucao = {"pagina": anterior, "fim": time.time(), **resumir(chamadas), "chamadas": chamadas}
+        self.execucoes.append(execucao)
+        return execucao
+
+    def execucao_atual(self):
+        """Resumo das chamadas feitas até agora na execução atual, sem arquivá-las"""
+        with self._lock:
+            chamadas = list(self.chamadas)
+        return {"pagina": self.pagina, **resumir(chamadas), "chamadas": chamadas}
+
+
+def resumir(chamadas):
+    """Totais de uma lista de chamadas e as combinações repetidas (possível N+1)"""
+    contagem = {}
+    for chamada in chamadas:
+        chave = f"{chamada['tipo']}:{chamada['nome']}:{chamada['operacao']}"
+        contagem[chave] = contagem.get(chave, 0) + 1
+    return {
+        "total_chamadas": len(chamadas),
+        "total_segundos": sum(c["segundos"] for c in chamadas),
+        "total_linhas": sum(c["linhas"] for c in chamadas),
+        "total_bytes": sum(c["bytes"] for c in chamadas),
+        "repetidas": {chave: n for chave, n in contagem.items() if n >= LIMITE_REPETICOES},
+    }
+
+
+def _acumular(chamada):
+    chave = (chamada["tipo"], chamada["nome"], chamada["operacao"])
+    with _lock_totais:
+        total = _totais.setdefault(chave, {"chamadas": 0, "erros": 0, "linhas": 0, "bytes": 0, "segundos": 0.0})
+        total["chamadas"] += 1
+        total["erros"] += 1 if chamada["erro"] else 0
+        total["linhas"] += chamada["linhas"]
+        total["bytes"] += chamada["bytes"]
+        total["segundos"] += chamada["segundos"]
+
+
+_rastreador_global = Rastreador()
+
+
+def rastreador_da_sessao():
+    """Rastreador da sessão do Streamlit (ou um do processo, fora de uma sessão, como na linha de comando)"""
+    try:
+        rastreador = st.session_state.get(CHAVE_RASTREADOR)
+        if rastreador is None:
+            rastreador = Rastreador()
+            st.session_state[CHAVE_RASTREADOR] = rastreador
+        return rastreador
+    except Exception:
+        return _rastreador_global
+
+
+# ======================
+# CLIENTE RASTREADO
+# ======================
+
+def _descrever(metodo, args):
+    """Filtro legível: "eq(mercado_id=3)", "in_(mercado_id, 12 valores)"..."""
+    if not args:
+        return f"{metodo}()"
+    coluna, *valores = args
+    if len(valores) == 1 and isinstance(valores[0], (list, tuple, set, frozenset)):
+        return f"{metodo}({coluna}, {len(valores[0])} valores)"
+    if valores:
+        return f"{metodo}({coluna}={str(valores[0])[:40]})"
+    return f"{metodo}({str(coluna)[:40]})"
+
+
+def _tamanho(dados):
+    if dados is None:
+        return 0
+    return len(json.dumps(dados, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+class _ConsultaRastreada:
+    """Envolve um construtor de consulta do postgrest e registra a chamada no `execute()`"""
+
+    def __init__(self, construtor, rastreador, tipo, nome, operacao, filtros=()):
+        self._construtor = construtor
+        self._rastreador = rastreador
+        self._tipo = tipo
+        self._nome = nome
+        self._operacao = operacao
+        self._filtros = filtros
+
+    def __getattr__(self, atributo):
+        valor = getattr(self._construtor, atributo)
+        if not callable(valor):
+            # Propriedades que retornam o construtor, como `not_`
+            if hasattr(valor, "execute"):
+                return _ConsultaRastreada(valor, self._rastreador, self._tipo, self._nome, self._operacao,
+                                          self._filtros + (atributo,))
+            return valor
+
+        def chamar(*args, **kwargs):
+            resultado = valor(*args, **kwargs)
+            if not hasattr(resultado, "execute"):
+                return resultado
+            if atributo in OPERACOES:
+                return _ConsultaRastreada(resultado, self._rastreador, self._tipo, self._nome, atributo, self._filtros)
+            filtros = self._filtros + (_descrever(atributo, args),)
+            return _ConsultaRastreada(resultado, self._rastreador, self._tipo, self._nome, self._operacao, filtros)
+
+        return chamar
+
+    def _registrar(self, inicio, resposta=None, erro=None):
+        segundos = time.perf_counter() - inicio
+        dados = getattr(resposta, "data", None)
+        self._rastreador.registrar({
+            "tipo": self._tipo,
+            "nome": self._nome,
+            "operacao": self._operacao,
+            "filtros": list(self._filtros),
+            "linhas": len(dados) if isinstance(dados, list) else int(dados is not None),
+            "bytes": _tamanho(dados),
+            "segundos": segundos,
+            "erro": erro,
+        })
+
+    async def _aguardar(self, pendente, inicio):
+        try:
+            resposta = await pendente
+        except Exception as e:
+            self._registrar(inicio, erro=str(e)[:200])
+            raise
+        self._registrar(inicio, resposta)
+        return resposta
+
+    def execute(self):
+        inicio = time.perf_counter()
+        try:
+            resposta = self._construtor.execute()
+        except Exception as e:
+            self._registrar(inicio, erro=str(e)[:200])
+            raise
+        # Construtores do cliente assíncrono retornam uma corrotina
+        if inspect.isawaitable(resposta):
+            return self._aguardar(resposta, inicio)
+        self._registrar(inicio, resposta)
+        return resposta
+
+
+class ClienteRastreado:
+    """Cliente Supabase cujas consultas (`table`, `from_`, `rpc`) são registradas no rastreador"""
+
+    def __init__(self, cliente, rastreador):
+        self._cliente = cliente
+        self._rastreador = rastreador
+
+    def table(self, nome):
+        return _ConsultaRastreada(self._cliente.table(nome), self._rastreador, "tabela", nome, "select")
+
+    def from_(self, nome):
+        return _ConsultaRastreada(self._cliente.from_(nome), self._rastreador, "tabela", nome, "select")
+
+    def rpc(self, nome, params=None, *args, **kwargs):
+        construtor = self._cliente.rpc(nome, params, *args, **kwargs)
+        filtros = tuple(_descrever("param", (chave, valor)) for chave, valor in sorted((params or {}).items()))
+        return _ConsultaRastreada(construtor, self._rastreador, "rpc", nome, "rpc", filtros)
+
+    def __getattr__(self, nome):
+        return getattr(self._cliente, nome)
+
+
+def envolver(cliente):
+    """O próprio cliente, ou o cliente rastreado se o rastreamento estiver ligado"""
+    if not ATIVO:
+        return cliente
+    return ClienteRastreado(cliente, rastreador_da_sessao())
+
+
+# ======================
+# EXPORTAÇÃO
+# ======================
+
+def totais():
+    """Totais do processo por tabela/RPC e operação"""
+    with _lock_totais:
+        return [
+            {"tipo": tipo, "nome": nome, "operacao": operacao, **valores}
+            for (tipo, nome, operacao), valores in sorted(_totais.items())
+        ]
+
+
+def exportar_json(rastreador=None):
+    """Totais do processo e, se informado, as execuções guardadas do rastreador"""
+    dados = {"totais": totais()}
+    if rastreador is not None:
+        dados["execucoes"] = list(rastreador.execucoes)
+    return json.dumps(dados, indent=2, ensure_ascii=False, default=str)
+
+
+METRICAS_PROMETHEUS = (
+    ("supabase_chamadas_total", "chamadas", "counter", "Chamadas ao Supabase"),
+    ("supabase_erros_total", "erros", "counter", "Chamadas ao Supabase que falharam"),
+    ("supabase_linhas_total", "linhas", "counter", "Linhas retornadas"),
+    ("supabase_bytes_total", "bytes", "counter", "Tamanho das respostas (JSON), em bytes"),
+    ("supabase_segundos_total", "segundos", "counter", "Tempo total das chamadas, em segundos"),
+)
+
+
+def _rotulo(valor):
+    """Valor de rótulo do Prometheus, com barra invertida, aspas e quebras de linha escapadas"""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exportar_prometheus():
+    """Totais do processo no formato de texto do Prometheus"""
+    linhas = []
+    itens = totais()
+    for metrica, campo, tipo, descricao in METRICAS_PROMETHEUS:
+        linhas.append(f"# HELP {metrica} {descricao}")
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        for item in itens:
+            rotulos = ",".join(f'{rotulo}="{_rotulo(item[rotulo])}"' for rotulo in ("tipo", "nome", "operacao"))
+            linhas.append(f"{metrica}{{{rotulos}}} {item[campo]}")
+    return "\n".join(linhas) + "\n"
+
+
+# ======================
+# PAINEL DE DEPURAÇÃO
+# ======================
+
+def iniciar_execucao(pagina):
+    """
+    Marca o início de uma execução da página: arquiva no histórico da sessão as chamadas
+    da execução anterior. Deve ser chamado no início da página, antes de qualquer consulta;
+    não faz nada com o rastreamento desligado.
+    """
+    if not ATIVO:
+        return
+    rastreador_da_sessao().iniciar_execucao(pagina)
+
+
+def painel_lateral():
+    """
+    Mostra na barra lateral as chamadas ao banco feitas até aqui nesta execução da página,
+    com a exportação dos totais. Deve ser chamado no fim da página; só aparece para
+    administradores e não faz nada com o rastreamento desligado.
+    """
+    if not ATIVO:
+        return
+    # Importado aqui: services/supabase_client importa este módulo
+    from services.supabase_client import is_admin_user
+    if not is_admin_user():
+        return
+    import pandas as pd
+
+    rastreador = rastreador_da_sessao()
+    execucao = rastreador.execucao_atual()
+    with st.sidebar.expander(f"🔎 Consultas ao banco ({execucao['total_chamadas']})"):
+        st.caption(
+            f"{execucao['total_segundos'] * 1000:.0f} ms · {execucao['total_linhas']} linhas · "
+            f"{execucao['total_bytes'] / 1024:.1f} KB nesta execução"
+        )
+        for chave, n in execucao["repetidas"].items():
+            st.warning(f"{chave} chamada {n} vezes (possível N+1)")
+        if execucao["chamadas"]:
+            df = pd.DataFrame(execucao["chamadas"])
+            df["ms"] = (df["segundos"] * 1000).round(1)
+            df["filtros"] = df["filtros"].map(", ".join)
+            st.dataframe(
+                df[["tipo", "nome", "operacao", "filtros", "linhas", "bytes", "ms", "erro"]],
+                use_container_width=True, hide_index=True
+            )
+        st.download_button(
+            "JSON", exportar_json(rastreador), file_name="consultas.json",
+            mime="application/json", key="rastreio_json"
+        )
+        st.download_button(
+            "Prometheus", exportar_prometheus(), file_name="consultas.prom",
+            mime="text/plain", key="rastreio_prometheus"
+        )
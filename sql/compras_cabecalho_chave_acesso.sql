@@ -0,0 +1,10 @@
+-- Chave de acesso (44 dígitos) da NFC-e de origem da compra, quando importada de PDF.
+-- O índice único por usuário impede registrar a mesma nota duas vezes e
+-- atende à busca de chaves já registradas feita na importação em lote.
+
+alter table public.compras_cabecalho
+    add column if not exists chave_acesso text;
+
+create unique index if not exists compras_cabecalho_user_chave_acesso_idx
+    on public.compras_cabecalho (user_id, chave_acesso)
+    where chave_acesso is not null;
@@ -0,0 +1,10 @@
+-- Hash sha256 do PDF de origem da compra, quando registrada por upload.
+-- Permite reconhecer um arquivo já registrado antes de lê-lo ou gravá-lo de novo;
+-- o índice único por usuário atende a essa busca e impede o registro duplicado.
+
+alter table public.compras_cabecalho
+    add column if not exists hash_arquivo text;
+
+create unique index if not exists compras_cabecalho_user_hash_arquivo_idx
+    on public.compras_cabecalho (user_id, hash_arquivo)
+    where hash_arquivo is not null;
@@ -0,0 +1,12 @@
+-- Impressão digital da compra (ver utils/impressao_digital.py): a chave de acesso da NFC-e
+-- ou o sha256 de mercado, data, valor total e itens. O índice único por usuário atende à
+-- verificação feita antes de cada registro e impede gravar a mesma compra duas vezes.
+-- Compras antigas ficam com a coluna nula até rodar a limpeza:
+--     python -m services.deduplicacao --email usuario@exemplo.com [--aplicar]
+
+alter table public.compras_cabecalho
+    add column if not exists impressao_digital text;
+
+create unique index if not exists compras_cabecalho_user_impressao_digital_idx
+    on public.compras_cabecalho (user_id, impressao_digital)
+    where impressao_digital is not null;
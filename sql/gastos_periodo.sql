@@ -0,0 +1,72 @@
+-- Agregados de gasto por usuário, mercado e período (mês e semana).
+-- Mantidos por trigger a cada inserção/alteração/remoção em compras_cabecalho,
+-- para que o painel de análise leia algumas dezenas de linhas em vez de todas as compras.
+
+create table if not exists public.gastos_periodo (
+    user_id uuid not null,
+    mercado_id bigint not null,
+    granularidade text not null check (granularidade in ('mes', 'semana')),
+    periodo date not null,  -- primeiro dia do mês / segunda-feira da semana
+    valor_final_pago numeric not null default 0,
+    qtd_compras integer not null default 0,
+    primary key (user_id, granularidade, periodo, mercado_id)
+);
+
+alter table public.gastos_periodo enable row level security;
+
+drop policy if exists "gastos_periodo_select_proprio" on public.gastos_periodo;
+create policy "gastos_periodo_select_proprio" on public.gastos_periodo
+    for select using (auth.uid() = user_id);
+
+create or replace function public._acumular_gasto_periodo(
+    p_user_id uuid, p_mercado_id bigint, p_data date, p_valor numeric, p_qtd integer
+)
+returns void
+language sql
+as $$
+    insert into public.gastos_periodo as g (user_id, mercado_id, granularidade, periodo, valor_final_pago, qtd_compras)
+    values
+        (p_user_id, p_mercado_id, 'mes', date_trunc('month', p_data)::date, p_valor, p_qtd),
+        (p_user_id, p_mercado_id, 'semana', date_trunc('week', p_data)::date, p_valor, p_qtd)
+    on conflict (user_id, granularidade, periodo, mercado_id) do update
+        set valor_final_pago = g.valor_final_pago + excluded.valor_final_pago,
+            qtd_compras = g.qtd_compras + excluded.qtd_compras;
+$$;
+
+create or replace function public.atualizar_gastos_periodo()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public._acumular_gasto_periodo(
+            old.user_id, old.mercado_id, old.data_compra, -coalesce(old.valor_final_pago, 0), -1
+        );
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public._acumular_gasto_periodo(
+            new.user_id, new.mercado_id, new.data_compra, coalesce(new.valor_final_pago, 0), 1
+        );
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists compras_cabecalho_gastos_periodo on public.compras_cabecalho;
+create trigger compras_cabecalho_gastos_periodo
+    after insert or update of mercado_id, data_compra, valor_final_pago or delete
+    on public.compras_cabecalho
+    for each row execute function public.atualizar_gastos_periodo();
+
+-- Carga inicial a partir das compras existentes
+insert into public.gastos_periodo (user_id, mercado_id, granularidade, periodo, valor_final_pago, qtd_compras)
+select user_id, mercado_id, 'mes', date_trunc('month', data_compra)::date, sum(valor_final_pago), count(*)
+from public.compras_cabecalho
+group by 1, 2, 4
+union all
+select user_id, mercado_id, 'semana', date_trunc('week', data_compra)::date, sum(valor_final_pago), count(*)
+from public.compras_cabecalho
+group by 1, 2, 4
+on conflict (user_id, granularidade, periodo, mercado_id) do nothing;
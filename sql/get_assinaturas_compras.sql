@@ -0,0 +1,146 @@
+-- Assinatura das compras do usuário por mês (data_compra), para o snapshot local
+-- (services/snapshot.py), que compara essas assinaturas com as que guardou e baixa de novo
+-- só os meses diferentes; assim percebe compras inseridas com id menor que o último
+-- sincronizado, alterações (ex.: impressão digital, valores), remoções e renomeação de mercados.
+--
+-- A assinatura é mantida por triggers, como gastos_periodo.sql: cada inserção, alteração ou
+-- remoção em compras_cabecalho e compras_itens (e a renomeação de um mercado) dá ao mês afetado
+-- uma nova versão, tirada de uma sequência (nunca se repete, nem depois de o mês esvaziar).
+-- A RPC só lê as poucas linhas de compras_versao_mes do usuário, sem varrer as compras.
+-- Requer gastos_periodo.sql (meses de cada mercado) e a versão de get_compras_detalhadas_desde.sql
+-- com os parâmetros de período.
+
+create sequence if not exists public.compras_versao_mes_seq;
+
+create table if not exists public.compras_versao_mes (
+    user_id uuid not null,
+    mes date not null,  -- primeiro dia do mês
+    qtd_compras integer not null default 0,
+    versao bigint not null,
+    primary key (user_id, mes)
+);
+
+alter table public.compras_versao_mes enable row level security;
+
+drop policy if exists "compras_versao_mes_select_proprio" on public.compras_versao_mes;
+create policy "compras_versao_mes_select_proprio" on public.compras_versao_mes
+    for select using (auth.uid() = user_id);
+
+create or replace function public._marcar_mes_compras(p_user_id uuid, p_data date, p_qtd integer)
+returns void
+language sql
+as $$
+    insert into public.compras_versao_mes as v (user_id, mes, qtd_compras, versao)
+    values (p_user_id, date_trunc('month', p_data)::date, p_qtd, nextval('public.compras_versao_mes_seq'))
+    on conflict (user_id, mes) do update
+        set qtd_compras = v.qtd_compras + excluded.qtd_compras,
+            versao = excluded.versao;
+$$;
+
+create or replace function public.atualizar_versao_mes_cabecalho()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public._marcar_mes_compras(old.user_id, old.data_compra, -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public._marcar_mes_compras(new.user_id, new.data_compra, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists compras_cabecalho_versao_mes on public.compras_cabecalho;
+create trigger compras_cabecalho_versao_mes
+    after insert or update or delete
+    on public.compras_cabecalho
+    for each row execute function public.atualizar_versao_mes_cabecalho();
+
+-- Itens removidos em cascata com o cabeçalho não o encontram mais: a remoção do cabeçalho
+-- já marcou o mês
+create or replace function public.atualizar_versao_mes_itens()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    cabecalho record;
+begin
+    for cabecalho in
+        select c.user_id, c.data_compra
+        from public.compras_cabecalho c
+        where c.id in (
+            case when tg_op in ('UPDATE', 'DELETE') then old.compra_id end,
+            case when tg_op in ('INSERT', 'UPDATE') then new.compra_id end
+        )
+    loop
+        perform public._marcar_mes_compras(cabecalho.user_id, cabecalho.data_compra, 0);
+    end loop;
+    return null;
+end;
+$$;
+
+drop trigger if exists compras_itens_versao_mes on public.compras_itens;
+create trigger compras_itens_versao_mes
+    after insert or update or delete
+    on public.compras_itens
+    for each row execute function public.atualizar_versao_mes_itens();
+
+-- Nome e cidade do mercado vão nas linhas detalhadas do snapshot
+create or replace function public.atualizar_versao_mes_mercado()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    update public.compras_versao_mes v
+    set versao = nextval('public.compras_versao_mes_seq')
+    from public.gastos_periodo g
+    where g.mercado_id = new.id
+      and g.granularidade = 'mes'
+      and g.qtd_compras > 0
+      and v.user_id = g.user_id
+      and v.mes = g.periodo;
+    return null;
+end;
+$$;
+
+drop trigger if exists mercados_versao_mes on public.mercados;
+create trigger mercados_versao_mes
+    after update of nome, cidade
+    on public.mercados
+    for each row execute function public.atualizar_versao_mes_mercado();
+
+-- Carga inicial a partir das compras existentes
+insert into public.compras_versao_mes (user_id, mes, qtd_compras, versao)
+select user_id, date_trunc('month', data_compra)::date, count(*), nextval('public.compras_versao_mes_seq')
+from public.compras_cabecalho
+group by 1, 2
+on conflict (user_id, mes) do nothing;
+
+-- A assinatura muda de tipo (antes um md5 das linhas): a função é recriada
+drop function if exists public.get_assinaturas_compras();
+
+create or replace function public.get_assinaturas_compras()
+returns table (
+    mes date,
+    qtd_compras integer,
+    assinatura text
+)
+language sql
+stable
+security invoker
+as $$
+    select v.mes, v.qtd_compras, v.qtd_compras || ':' || v.versao
+    from public.compras_versao_mes v
+    where v.qtd_compras > 0
+    order by v.mes;
+$$;
+
+grant execute on function public.get_assinaturas_compras() to authenticated;
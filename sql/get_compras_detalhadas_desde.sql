@@ -0,0 +1,47 @@
+-- Itens comprados com id maior que p_apos_id, no mesmo formato de get_compras_detalhadas_periodo,
+-- em ordem de id, opcionalmente só das compras entre p_data_inicio e p_data_fim. Usada para
+-- baixar as compras em lotes (snapshot local, ver services/snapshot.py, e limpeza de duplicadas):
+-- cada chamada continua do maior id já recebido.
+-- Executa com os privilégios do chamador, portanto as políticas de RLS continuam valendo.
+
+-- Versão anterior, sem os parâmetros de período (uma sobrecarga deixaria a chamada ambígua)
+drop function if exists public.get_compras_detalhadas_desde(bigint, integer);
+
+create or replace function public.get_compras_detalhadas_desde(
+    p_apos_id bigint default 0,
+    limite integer default 1000,
+    p_data_inicio date default null,
+    p_data_fim date default null
+)
+returns table (
+    item bigint,
+    compra_id bigint,
+    data_compra date,
+    codigo text,
+    descricao text,
+    quantidade numeric,
+    unidade text,
+    valor_unitario numeric,
+    valor_total numeric,
+    desconto numeric,
+    mercado_id bigint,
+    mercado text,
+    cidade text
+)
+language sql
+stable
+security invoker
+as $$
+    select i.id, i.compra_id, c.data_compra, i.codigo::text, i.descricao::text, i.quantidade, i.unidade::text,
+           i.valor_unitario, i.valor_total, c.descontos, m.id, m.nome::text, m.cidade::text
+    from public.compras_itens i
+    join public.compras_cabecalho c on c.id = i.compra_id
+    join public.mercados m on m.id = c.mercado_id
+    where i.id > coalesce(p_apos_id, 0)
+      and (p_data_inicio is null or c.data_compra >= p_data_inicio)
+      and (p_data_fim is null or c.data_compra <= p_data_fim)
+    order by i.id
+    limit limite;
+$$;
+
+grant execute on function public.get_compras_detalhadas_desde(bigint, integer, date, date) to authenticated;
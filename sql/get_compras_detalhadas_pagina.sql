@@ -0,0 +1,76 @@
+-- Página de itens comprados no período, com paginação por chave (keyset).
+-- A ordenação é sempre (coluna escolhida, id do item), e a página seguinte começa
+-- depois do cursor (p_apos_valor, p_apos_id) da última linha da página anterior,
+-- sem OFFSET: o custo de cada página não cresce com a posição na lista.
+-- Filtros de texto e mercado são aplicados no banco.
+
+create index if not exists compras_cabecalho_user_data_idx
+    on public.compras_cabecalho (user_id, data_compra, id);
+create index if not exists compras_itens_compra_idx
+    on public.compras_itens (compra_id, id);
+
+create or replace function public.get_compras_detalhadas_pagina(
+    data_inicio date,
+    data_fim date,
+    limite integer default 100,
+    ordenar_por text default 'data_compra',
+    decrescente boolean default false,
+    p_apos_valor text default null,
+    p_apos_id bigint default null,
+    busca text default null,
+    mercado_ids bigint[] default null
+)
+returns table (
+    id bigint,
+    compra_id bigint,
+    data_compra date,
+    codigo text,
+    descricao text,
+    quantidade numeric,
+    unidade text,
+    valor_unitario numeric,
+    valor_total numeric,
+    mercado_id bigint,
+    mercado text,
+    cidade text
+)
+language plpgsql
+stable
+security invoker
+as $$
+declare
+    v_coluna text;
+    v_tipo text;
+    v_direcao text := case when decrescente then 'desc' else 'asc' end;
+    v_comparacao text := case when decrescente then '<' else '>' end;
+begin
+    case ordenar_por
+        when 'data_compra' then v_coluna := 'c.data_compra'; v_tipo := 'date';
+        when 'valor_total' then v_coluna := 'i.valor_total'; v_tipo := 'numeric';
+        when 'descricao' then v_coluna := 'i.descricao'; v_tipo := 'text';
+        else raise exception 'Ordenação não suportada: %', ordenar_por;
+    end case;
+
+    return query execute format(
+        $sql$
+        select i.id, i.compra_id, c.data_compra, i.codigo::text, i.descricao::text, i.quantidade, i.unidade::text,
+               i.valor_unitario, i.valor_total, m.id, m.nome::text, m.cidade::text
+        from public.compras_itens i
+        join public.compras_cabecalho c on c.id = i.compra_id
+        join public.mercados m on m.id = c.mercado_id
+        where c.data_compra between $1 and $2
+          and ($3::bigint[] is null or c.mercado_id = any($3))
+          and ($4::text is null or i.descricao ilike '%%' || $4 || '%%')
+          and ($6::bigint is null or (%1$s, i.id) %2$s ($5::%3$s, $6))
+        order by %1$s %4$s, i.id %4$s
+        limit $7
+        $sql$,
+        v_coluna, v_comparacao, v_tipo, v_direcao
+    )
+    using data_inicio, data_fim, mercado_ids, busca, p_apos_valor, p_apos_id, limite;
+end;
+$$;
+
+grant execute on function public.get_compras_detalhadas_pagina(
+    date, date, integer, text, boolean, text, bigint, text, bigint[]
+) to authenticated;
@@ -0,0 +1,45 @@
+-- Itens comprados no período, com dados do cabeçalho e do mercado.
+-- O parâmetro opcional mercado_ids permite filtrar por mercado no próprio banco,
+-- usando o índice (user_id, mercado_id, data_compra) de compras_cabecalho.
+-- Executa com os privilégios do chamador, portanto as políticas de RLS continuam valendo.
+
+create index if not exists compras_cabecalho_user_mercado_data_idx
+    on public.compras_cabecalho (user_id, mercado_id, data_compra);
+
+drop function if exists public.get_compras_detalhadas_periodo(date, date);
+
+create or replace function public.get_compras_detalhadas_periodo(
+    data_inicio date,
+    data_fim date,
+    mercado_ids bigint[] default null
+)
+returns table (
+    item bigint,
+    compra_id bigint,
+    data_compra date,
+    codigo text,
+    descricao text,
+    quantidade numeric,
+    unidade text,
+    valor_unitario numeric,
+    valor_total numeric,
+    desconto numeric,
+    mercado_id bigint,
+    mercado text,
+    cidade text
+)
+language sql
+stable
+security invoker
+as $$
+    select i.id, i.compra_id, c.data_compra, i.codigo::text, i.descricao::text, i.quantidade, i.unidade::text,
+           i.valor_unitario, i.valor_total, c.descontos, m.id, m.nome::text, m.cidade::text
+    from public.compras_itens i
+    join public.compras_cabecalho c on c.id = i.compra_id
+    join public.mercados m on m.id = c.mercado_id
+    where c.data_compra between data_inicio and data_fim
+      and (mercado_ids is null or c.mercado_id = any(mercado_ids))
+    order by c.data_compra, i.id;
+$$;
+
+grant execute on function public.get_compras_detalhadas_periodo(date, date, bigint[]) to authenticated;
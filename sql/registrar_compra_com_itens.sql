@@ -0,0 +1,55 @@
+-- Registra o cabeçalho e todos os itens de uma compra em uma única transação.
+-- Se a inserção de qualquer item falhar, o cabeçalho também é descartado,
+-- evitando registros órfãos em compras_cabecalho.
+-- Requer as colunas chave_acesso, hash_arquivo e impressao_digital (ver
+-- compras_cabecalho_chave_acesso.sql, compras_cabecalho_hash_arquivo.sql e
+-- compras_cabecalho_impressao_digital.sql).
+-- Executa com os privilégios do chamador, portanto as políticas de RLS continuam valendo.
+
+create or replace function public.registrar_compra_com_itens(
+    p_cabecalho jsonb,
+    p_itens jsonb
+)
+returns bigint
+language plpgsql
+security invoker
+as $$
+declare
+    v_compra_id bigint;
+begin
+    insert into public.compras_cabecalho (
+        user_id, mercado_id, data_compra, valor_total, descontos, valor_final_pago, chave_acesso, hash_arquivo,
+        impressao_digital
+    )
+    values (
+        auth.uid(),
+        (p_cabecalho ->> 'mercado_id')::bigint,
+        (p_cabecalho ->> 'data_compra')::date,
+        (p_cabecalho ->> 'valor_total')::numeric,
+        coalesce((p_cabecalho ->> 'descontos')::numeric, 0),
+        (p_cabecalho ->> 'valor_final_pago')::numeric,
+        p_cabecalho ->> 'chave_acesso',
+        p_cabecalho ->> 'hash_arquivo',
+        p_cabecalho ->> 'impressao_digital'
+    )
+    returning id into v_compra_id;
+
+    insert into public.compras_itens (
+        compra_id, user_id, codigo, descricao, quantidade, unidade, valor_unitario, valor_total
+    )
+    select
+        v_compra_id,
+        auth.uid(),
+        item ->> 'codigo',
+        item ->> 'descricao',
+        (item ->> 'quantidade')::numeric,
+        item ->> 'unidade',
+        (item ->> 'valor_unitario')::numeric,
+        (item ->> 'valor_total')::numeric
+    from jsonb_array_elements(p_itens) as item;
+
+    return v_compra_id;
+end;
+$$;
+
+grant execute on function public.registrar_compra_com_itens(jsonb, jsonb) to authenticated;
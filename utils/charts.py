@@ -1,10 +1,12 @@
 import plotly.express as px
 import pandas as pd
 
+from utils import money
+
 def plot_gastos_por_dia(compras):
     """
     Gera um gráfico de linha mostrando os gastos por dia
-    com base na lista de compras vinda do banco.
+    com base na lista de compras vinda do banco (valores em centavos, ver services/db_queries.py).
     """
     if not compras or len(compras) == 0:
         return px.line(pd.DataFrame(), x=[], y=[])
@@ -15,6 +17,8 @@ def plot_gastos_por_dia(compras):
     if "data_compra" in df.columns:
         df["data_compra"] = pd.to_datetime(df["data_compra"])
 
+    df["valor_final_pago"] = money.reais(df["valor_final_pago"].to_numpy())
+
     # Cria gráfico
     fig = px.line(
         df,
@@ -0,0 +1,93 @@
+"""
+Impressão digital de uma compra, usada para não registrar a mesma compra duas vezes.
+
+Compras com chave de acesso (NFC-e) usam a própria chave: "nfce:<44 dígitos>".
+As demais usam o sha256 de mercado, data, valor total e itens, com os itens em ordem
+canônica (a ordem em que foram digitados ou lidos não muda a impressão). O formato é
+versionado pelo prefixo: "sha256v2:<hex>" é calculado só com inteiros (valores em
+centavos, utils/money.py, e quantidades em milésimos).
+Uma compra igual a outra já registrada que o usuário confirma ser outra compra (ex.: a
+mesma lista no mesmo mercado e dia) recebe um número de repetição, que entra no hash.
+
+Impressões gravadas antes da versão 2 ("sha256:<hex>", com os valores em reais como
+floats) continuam no banco. `calcular_legada` é o único lugar que as calcula, e
+`impressoes` devolve as duas formas de uma compra para a busca de compras já registradas.
+"""
+import hashlib
+import json
+import re
+
+from utils import money
+
+PREFIXO_NFCE = "nfce:"
+PREFIXO = "sha256v2:"
+PREFIXO_LEGADO = "sha256:"
+
+
+def _chave_acesso(cabecalho):
+    return re.sub(r"\D", "", cabecalho.get("chave_acesso") or "")
+
+
+def _descricao(item):
+    return " ".join(str(item.get("descricao") or "").split()).upper()
+
+
+def _hash(prefixo, conteudo, repeticao):
+    if repeticao:
+        conteudo.append(int(repeticao))
+    texto = json.dumps(conteudo, separators=(",", ":"))
+    return prefixo + hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def calcular(cabecalho, itens, repeticao=0):
+    """
+    Impressão digital a partir do cabeçalho (formato de `db_queries.insert_compra`) e dos itens, em centavos.
+    `repeticao` > 0 distingue compras iguais confirmadas pelo usuário (não vale para NFC-e:
+    a mesma chave de acesso é sempre a mesma compra).
+    """
+    chave = _chave_acesso(cabecalho)
+    if chave:
+        return f"{PREFIXO_NFCE}{chave}"
+    conteudo = [
+        int(cabecalho["mercado_id"]),
+        str(cabecalho["data_compra"])[:10],
+        int(cabecalho.get("valor_total") or 0),
+        sorted(
+            [str(item.get("codigo") or ""), _descricao(item),
+             round(float(item.get("quantidade") or 0) * 1000), int(item.get("valor_total") or 0)]
+            for item in itens
+        ),
+    ]
+    return _hash(PREFIXO, conteudo, repeticao)
+
+
+def calcular_legada(cabecalho, itens, repeticao=0):
+    """
+    Impressão no formato anterior à versão 2, só para reconhecer as já gravadas: o mesmo
+    JSON de antes, com os valores em reais arredondados como floats. Não grave impressões novas
+    neste formato. Com chave de acesso, é a própria chave (o formato não mudou).
+    """
+    chave = _chave_acesso(cabecalho)
+    if chave:
+        return f"{PREFIXO_NFCE}{chave}"
+    conteudo = [
+        int(cabecalho["mercado_id"]),
+        str(cabecalho["data_compra"])[:10],
+        round(money.reais(cabecalho.get("valor_total") or 0), 2),
+        sorted(
+            [str(item.get("codigo") or ""), _descricao(item),
+             round(float(item.get("quantidade") or 0), 3), round(money.reais(item.get("valor_total") or 0), 2)]
+            for item in itens
+        ),
+    ]
+    return _hash(PREFIXO_LEGADO, conteudo, repeticao)
+
+
+def impressoes(cabecalho, itens, repeticao=0):
+    """
+    Formas com que a compra pode estar gravada: a atual primeiro e, se for outra, a legada.
+    Para procurar compras já registradas; grave sempre a primeira.
+    """
+    atual = calcular(cabecalho, itens, repeticao)
+    legada = calcular_legada(cabecalho, itens, repeticao)
+    return [atual] if legada == atual else [atual, legada]
@@ -0,0 +1,151 @@
+"""
+Valores em dinheiro como inteiros em centavos.
+
+Dentro do app todo valor monetário (preços, totais, descontos) é um `int` em centavos,
+ou um array NumPy int64 nas colunas: somas e comparações são exatas e vetorizadas.
+As conversões ficam nas bordas, todas com a mesma regra de arredondamento: o valor
+decimal (como escrito, não o float binário) vai para o centavo mais próximo, metade para cima.
+- leitura: `de_texto`/`de_textos` (números da nota, "1.234,56") e `centavos` (campos em
+  reais do formulário); toda leitura de `db_queries` devolve os campos de `CAMPOS` em
+  centavos (`de_banco`, `linhas_de_banco`), e daí em diante nada mais converte;
+- gravação: `db_queries` converte os campos de `CAMPOS` com `para_banco` (colunas numeric em reais);
+- exibição: `reais` e `formatar`.
+O NumPy só é importado por `de_textos`: as páginas que só lidam com valores soltos não o carregam.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+CENTAVOS_POR_REAL = 100
+# Distância mínima de x,5 centavos para arredondar um float direto (abaixo dela, o erro do
+# float poderia decidir o lado; o valor vai então pelo Decimal)
+_FOLGA_METADE = 1e-6
+# Campos monetários dos registros de compras (cabeçalho e itens)
+CAMPOS = ("valor_total", "descontos", "valor_final_pago", "valor_unitario", "desconto")
+
+
+def centavos(valor):
+    """Valor em reais (float, Decimal, int ou texto com ponto decimal) -> centavos; None continua None"""
+    if valor is None:
+        return None
+    if type(valor) is float:
+        # Caminho rápido para os floats do JSON do banco: fora de um empate, o centavo mais
+        # próximo do float é o mesmo do decimal que ele representa (NaN e infinito vão ao Decimal)
+        try:
+            escalado = valor * CENTAVOS_POR_REAL
+            arredondado = round(escalado)
+        except (ValueError, OverflowError):
+            pass
+        else:
+            if abs(abs(escalado - arredondado) - 0.5) > _FOLGA_METADE:
+                return arredondado
+    try:
+        # str(float) é a menor representação do float: 0.1 * 3 vira "0.30000000000000004", não 0.29999...
+        return int((Decimal(str(valor)) * CENTAVOS_POR_REAL).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Valor monetário inválido: {valor!r}") from None
+
+
+def de_texto(texto):
+    """
+    Número no formato brasileiro ("1.234,56", ou "1234.56" sem vírgula) -> centavos,
+    sem passar por float. Casas além dos centavos são arredondadas (metade para cima).
+    """
+    texto = texto.strip()
+    if "," in texto:
+        inteiro, _, fracao = texto.replace(".", "").partition(",")
+    else:
+        inteiro, _, fracao = texto.partition(".")
+    if not (inteiro or fracao) or not (inteiro + fracao).isdigit():
+        raise ValueError(f"Valor monetário inválido: {texto!r}")
+    resultado = int(inteiro or 0) * CENTAVOS_POR_REAL + int(fracao[:2].ljust(2, "0"))
+    return resultado + 1 if fracao[2:3] >= "5" else resultado
+
+
+def de_textos(textos):
+    """
+    `de_texto` em lote, vetorizado -> (array int64, validos); `validos` é None quando todos
+    foram convertidos, senão a máscara dos textos legíveis (os demais ficam com 0).
+    Os textos viram uma matriz de códigos de caractere e cada regra de `de_texto` vira uma
+    operação sobre a matriz inteira, sem laço em Python.
+    """
+    import numpy as np
+
+    if not len(textos):
+        return np.zeros(0, dtype=np.int64), None
+    # Uma linha por posição de caractere, uma coluna por texto (0 preenche os mais curtos)
+    codigos = np.asarray(textos, dtype=str).view(np.uint32).reshape(len(textos), -1).T.astype(np.int64, order="C")
+    digito = (codigos >= ord("0")) & (codigos <= ord("9"))
+    espaco = (codigos == 0) | ((codigos >= 9) & (codigos <= 13)) | (codigos == ord(" ")) | (codigos == 0xA0)
+    virgula = codigos == ord(",")
+    ponto = codigos == ord(".")
+    # Com vírgula ela é o separador decimal e os pontos (de milhar) são ignorados; sem ela, o ponto
+    com_virgula = virgula.any(axis=0)
+    separador = np.where(com_virgula, virgula, ponto)
+    depois = np.zeros_like(separador)
+    depois[1:] = np.logical_or.accumulate(separador, axis=0)[:-1]
+    # Espaços só nas pontas, como em strip(); um segundo separador invalida o texto
+    texto = ~espaco
+    miolo = np.logical_or.accumulate(texto, axis=0) & np.logical_or.accumulate(texto[::-1], axis=0)[::-1]
+    validos = ((digito | espaco | separador | (ponto & com_virgula)).all(axis=0) & digito.any(axis=0)
+               & ~(espaco & miolo).any(axis=0) & ~(separador & depois).any(axis=0))
+
+    algarismos = np.where(digito, codigos - ord("0"), 0)
+    inteiro = digito & ~depois
+    # Cada algarismo da parte inteira vale 10 ** (algarismos inteiros à direita dele)
+    expoentes = np.cumsum(inteiro[::-1], axis=0)[::-1] - inteiro
+    reais = (algarismos * 10 ** expoentes * inteiro).sum(axis=0)
+    fracao = digito & depois
+    casas = np.cumsum(fracao, axis=0) * fracao
+    centavos = ((casas == 1) * algarismos * 10 + (casas == 2) * algarismos).sum(axis=0)
+    # A terceira casa decide o arredondamento (metade para cima)
+    centavos += ((casas == 3) & (algarismos >= 5)).any(axis=0)
+    return np.where(validos, reais * CENTAVOS_POR_REAL + centavos, 0), None if validos.all() else validos
+
+
+def multiplicar(quantidade, preco_centavos):
+    """Quantidade (float, ex.: 0,350 kg) x preço em centavos -> total em centavos, arredondado"""
+    total = Decimal(str(quantidade)) * preco_centavos
+    return int(total.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def reais(valor):
+    """
+    Centavos (int ou array) -> reais em float, para exibição e para o banco.
+    O float de uma divisão exata por 100 é o mais próximo do valor com duas casas,
+    então `repr` (e o JSON enviado ao banco) mostra exatamente as duas casas.
+    """
+    if valor is None:
+        return None
+    if getattr(valor, "ndim", 0):
+        # Array NumPy (uma coluna inteira)
+        return valor / CENTAVOS_POR_REAL
+    return int(valor) / CENTAVOS_POR_REAL
+
+
+def formatar(valor):
+    """Centavos -> "R$ 1234.56" (o formato usado nas telas)"""
+    sinal = "-" if valor < 0 else ""
+    inteiro, resto = divmod(abs(int(valor)), CENTAVOS_POR_REAL)
+    return f"R$ {sinal}{inteiro}.{resto:02d}"
+
+
+def para_banco(registro):
+    """Cópia do registro com os campos monetários (centavos) em reais, como nas colunas numeric"""
+    return {campo: reais(valor) if campo in CAMPOS else valor for campo, valor in registro.items()}
+
+
+def de_banco(registro):
+    """Cópia de um registro lido do banco (reais) com os campos monetários em centavos"""
+    return {campo: centavos(valor) if campo in CAMPOS else valor for campo, valor in registro.items()}
+
+
+def linhas_de_banco(linhas):
+    """
+    Cópias das linhas lidas do banco com os campos monetários em centavos (reais -> centavos).
+    As linhas recebidas não são alteradas: podem estar guardadas no cache de leitura.
+    """
+    linhas = linhas or []
+    # As linhas de uma mesma consulta têm as mesmas colunas
+    campos = [campo for campo in CAMPOS if linhas and campo in linhas[0]]
+    if not campos:
+        return [dict(linha) for linha in linhas]
+    return [{**linha, **{campo: centavos(linha[campo]) for campo in campos}} for linha in linhas]
@@ -0,0 +1,142 @@
+"""
+Leitura dos itens de uma NFC-e a partir do texto extraído do PDF, linha a linha.
+
+Cada item ocupa duas linhas consecutivas:
+
+    "DESCRIÇÃO (Código: 123 ) Vl. Total"
+    "Qtde.:1,000 UN: KG Vl. Unit.: 9,99 9,99"
+
+O texto é lido com um padrão ancorado no início e no fim das duas linhas (re.M) em
+que nenhum grupo atravessa uma quebra de linha, de modo que cada tentativa de
+casamento fica restrita a um par de linhas. Os grupos encontrados formam
+diretamente as colunas, e os números são convertidos de uma vez por coluna.
+O resultado é um `ItensNota` colunar, de onde saem tanto a tabela de exibição
+(DataFrame) quanto os registros enviados ao banco. A leitura é sempre por página
+(`analisar_pagina`); `pdf_reader` junta as páginas e completa itens partidos entre elas.
+Os valores (unitário e total) ficam em centavos, int64 (ver utils/money.py).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils import money
+
+COLUNAS = ["codigo", "descricao", "quantidade", "unidade", "valor_unitario", "valor_total"]
+COLUNAS_NUMERICAS = ["quantidade", "valor_unitario", "valor_total"]
+# Colunas em centavos (as demais numéricas são float)
+COLUNAS_MONETARIAS = ["valor_unitario", "valor_total"]
+
+# Nomes das colunas na tabela de exibição
+ROTULOS = {
+    "codigo": "Código",
+    "descricao": "Descrição",
+    "quantidade": "Quantidade",
+    "unidade": "Unidade",
+    "valor_unitario": "Valor Unitário",
+    "valor_total": "Valor Total"
+}
+
+# Item em duas linhas, ancorado no início da primeira e no fim da segunda;
+# [^\n] e [ \t] impedem que um grupo avance para outras linhas
+PADRAO_ITEM = re.compile(
+    r"^[ \t]*([^\n]*?\S)[ \t]*\(Código:[ \t]*(\d+)[ \t]*\)[ \t]*Vl\.[ \t]*Total[ \t]*\n"
+    r"Qtde\.:[ \t]*([\d,.]+)[ \t]+UN:[ \t]*(\w+)[ \t]*Vl\.[ \t]*Unit\.:[ \t]*([\d,.]+)[ \t]+([\d,.]+)[ \t]*$",
+    re.M
+)
+# Ordem das colunas nos grupos de PADRAO_ITEM
+GRUPOS = ["descricao", "codigo", "quantidade", "unidade", "valor_unitario", "valor_total"]
+
+
+class ItensNota:
+    """Itens de uma nota em formato colunar: um array NumPy por coluna de `COLUNAS`"""
+
+    def __init__(self, colunas=None):
+        if colunas is None:
+            colunas = {
+                c: np.empty(0, dtype=tipo_coluna(c)) for c in COLUNAS
+            }
+        self.colunas = colunas
+
+    @classmethod
+    def concatenar(cls, partes):
+        partes = [p for p in partes if len(p)]
+        if not partes:
+            return cls()
+        return cls({c: np.concatenate([p.colunas[c] for p in partes]) for c in COLUNAS})
+
+    def __len__(self):
+        return len(self.colunas["valor_total"])
+
+    def valor_total(self):
+        """Soma dos itens, em centavos"""
+        return int(self.colunas["valor_total"].sum())
+
+    def tabela(self):
+        """Tabela de exibição, com os nomes das colunas em português, os valores em reais e a numeração dos itens"""
+        colunas = {c: money.reais(v) if c in COLUNAS_MONETARIAS else v for c, v in self.colunas.items()}
+        df = pd.DataFrame(colunas, columns=COLUNAS).rename(columns=ROTULOS)
+        df.insert(0, "Item", range(1, len(df) + 1))
+        return df
+
+    def registros(self):
+        """Itens no formato esperado por `db_queries.insert_itens` (lista de dicionários, valores em centavos)"""
+        valores = zip(*(self.colunas[c].tolist() for c in COLUNAS))
+        return [dict(zip(COLUNAS, linha)) for linha in valores]
+
+
+def tipo_coluna(coluna):
+    """dtype NumPy da coluna em `ItensNota`"""
+    if coluna in COLUNAS_MONETARIAS:
+        return np.int64
+    return float if coluna in COLUNAS_NUMERICAS else object
+
+
+def _para_numeros(textos):
+    """
+    Converte números no formato brasileiro ("1.234,56") em lote.
+    Retorna (array, validos); `validos` é None quando todos foram convertidos.
+    """
+    textos = [t.replace(".", "").replace(",", ".") if "," in t else t for t in textos]
+    try:
+        return np.fromiter(map(float, textos), dtype=float, count=len(textos)), None
+    except ValueError:
+        numeros = pd.to_numeric(pd.Series(textos, dtype=object), errors="coerce").to_numpy(dtype=float)
+        return numeros, ~np.isnan(numeros)
+
+
+def itens_de_campos(grupos):
+    """
+    Tuplas (descricao, codigo, quantidade, unidade, valor_unitario, valor_total), com os
+    números ainda em texto -> ItensNota (conversão numérica em lote)
+    """
+    if not grupos:
+        return ItensNota()
+    colunas = {}
+    validos = np.ones(len(grupos), dtype=bool)
+    for coluna, valores in zip(GRUPOS, zip(*grupos)):
+        if coluna in COLUNAS_NUMERICAS:
+            converter = money.de_textos if coluna in COLUNAS_MONETARIAS else _para_numeros
+            colunas[coluna], validos_coluna = converter(valores)
+            if validos_coluna is not None:
+                validos &= validos_coluna
+        else:
+            colunas[coluna] = np.array(valores, dtype=object)
+    # Itens com algum número ilegível são descartados
+    if not validos.all():
+        colunas = {c: valores[validos] for c, valores in colunas.items()}
+    return ItensNota(colunas)
+
+
+def analisar_pagina(texto):
+    """
+    Lê os itens do texto de uma página.
+    Retorna (ItensNota, fim): `fim` é a posição no texto logo após o último item lido,
+    para que as linhas seguintes possam ser completadas pela próxima página.
+    """
+    grupos = []
+    fim = 0
+    for match in PADRAO_ITEM.finditer(texto):
+        grupos.append(match.groups())
+        fim = match.end()
+    return itens_de_campos(grupos), fim
@@ -1,4 +1,259 @@
+import io
+import re
+import unicodedata
+
+import pdfplumber
+
+from utils import nfce_parser
+
+# Dados do cabeçalho da NFC-e
+PADRAO_CHAVE_ACESSO = re.compile(r"(?<!\d)(\d{4}(?:\s?\d{4}){10})(?!\d)")
+PADRAO_CNPJ = re.compile(r"CNPJ:?\s*(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})")
+PADRAO_EMISSAO = re.compile(r"Emiss[ãa]o:?\s*(\d{2})/(\d{2})/(\d{4})")
+
+# Quantas linhas do fim de uma página são guardadas para completar
+# um item que continua na página seguinte (um item ocupa duas linhas)
+LINHAS_CONTINUACAO = 2
+
+# Modos de leitura: "geometria" usa a posição das palavras na página; "texto", o texto re-fluído
+MODOS = ("geometria", "texto")
+MODO_PADRAO = "geometria"
+# Diferença máxima (em pontos) no topo de duas palavras da mesma linha
+TOLERANCIA_LINHA = 3
+# Rótulos do cabeçalho da tabela de itens (layout em colunas do DANFE NFC-e) -> coluna
+ROTULOS_TABELA = {
+    "CODIGO": "codigo", "COD": "codigo",
+    "DESCRICAO": "descricao",
+    "QTDE": "quantidade", "QTD": "quantidade", "QUANT": "quantidade",
+    "UN": "unidade", "UND": "unidade", "UNID": "unidade",
+    "UNIT": "valor_unitario", "UNITARIO": "valor_unitario",
+    "TOTAL": "valor_total",
+}
+# Colunas com o número do item, que não é guardado
+ROTULOS_NUMERO_ITEM = {"ITEM", "#", "N", "NO", "SEQ"}
+# Linhas que encerram a tabela de itens
+FIM_TABELA = ("QTD. TOTAL", "QTDE. TOTAL", "QTD TOTAL", "VALOR TOTAL", "VALOR A PAGAR", "DESCONTO")
+# Marca do layout de duas linhas (ver `nfce_parser`)
+MARCA_DUAS_LINHAS = "Vl. Unit"
+
+
+def _atualizar_metadados(metadados, texto):
+    """Preenche no dicionário os dados da nota ainda não encontrados nas páginas anteriores"""
+    if not metadados.get("chave_acesso"):
+        match = PADRAO_CHAVE_ACESSO.search(texto)
+        if match:
+            metadados["chave_acesso"] = re.sub(r"\s", "", match.group(1))
+    if not metadados.get("cnpj"):
+        match = PADRAO_CNPJ.search(texto)
+        if match:
+            metadados["cnpj"] = re.sub(r"\D", "", match.group(1))
+    if not metadados.get("data_emissao"):
+        match = PADRAO_EMISSAO.search(texto)
+        if match:
+            dia, mes, ano = match.groups()
+            metadados["data_emissao"] = f"{ano}-{mes}-{dia}"
+
+
+def iter_tabelas_textos(textos_paginas):
+    """
+    Recebe um iterável com o texto de cada página e gera, para cada página,
+    os itens encontrados nela (`nfce_parser.ItensNota`). Um item que começa no fim
+    de uma página e termina na seguinte é entregue junto com a página seguinte.
+    """
+    resto = ""
+    for texto in textos_paginas:
+        itens, resto = _analisar_com_resto(resto, texto)
+        yield itens
+
+
+def _analisar_com_resto(resto, texto):
+    """Lê os itens de `resto` + `texto`; retorna (ItensNota, resto para a próxima página)"""
+    bloco = resto + (texto or "")
+    itens, fim = nfce_parser.analisar_pagina(bloco)
+    # Só as últimas linhas depois do último item podem ser o início de um item incompleto
+    linhas_restantes = bloco[fim:].split("\n")
+    return itens, "\n".join(linhas_restantes[-LINHAS_CONTINUACAO:]) + "\n"
+
+
+def iter_itens_textos(textos_paginas):
+    """Como `iter_tabelas_textos`, mas gera a lista de itens (no formato do banco) de cada página"""
+    for itens in iter_tabelas_textos(textos_paginas):
+        yield itens.registros()
+
+
+def iter_textos_paginas(arquivo):
+    """Abre o PDF e gera o texto de uma página por vez, liberando o cache de cada página lida"""
+    with pdfplumber.open(arquivo) as pdf:
+        for page in pdf.pages:
+            texto = page.extract_text()
+            page.close()
+            yield texto
+
+
+# ======================
+# LEITURA PELA GEOMETRIA DAS PALAVRAS
+# ======================
+
+def _normalizar_rotulo(texto):
+    """"Descrição" -> "DESCRICAO", "Vl.Unit." -> "VL.UNIT" (sem acentos, maiúsculas, sem pontuação nas pontas)"""
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return texto.upper().strip(" .:()")
+
+
+def _linhas_da_pagina(page):
+    """Palavras da página agrupadas em linhas, de cima para baixo e da esquerda para a direita"""
+    linhas = []
+    for palavra in sorted(page.extract_words(), key=lambda p: (p["top"], p["x0"])):
+        if linhas and palavra["top"] - linhas[-1][0]["top"] <= TOLERANCIA_LINHA:
+            linhas[-1].append(palavra)
+        else:
+            linhas.append([palavra])
+    return [[p["text"] for p in sorted(linha, key=lambda p: p["x0"])] for linha in linhas]
+
+
+def _eh_numero(texto):
+    return any(c.isdigit() for c in texto) and all(c.isdigit() or c in ".," for c in texto)
+
+
+def _cabecalho_tabela(linha):
+    """
+    Se a linha é o cabeçalho da tabela de itens, retorna se a tabela começa pela coluna
+    com o número do item; senão, None
+    """
+    rotulos = [_normalizar_rotulo(parte) for palavra in linha for parte in palavra.split(".")]
+    if not set(nfce_parser.COLUNAS) <= {ROTULOS_TABELA.get(r) for r in rotulos}:
+        return None
+    return bool(rotulos) and rotulos[0] in ROTULOS_NUMERO_ITEM
+
+
+def _campos_linha_tabela(linha, com_numero_item):
+    """Linha da tabela -> tupla na ordem de `nfce_parser.GRUPOS`, lida da direita para a esquerda; None se não for um item"""
+    if com_numero_item and linha and linha[0].isdigit():
+        linha = linha[1:]
+    if len(linha) < 6:
+        return None
+    codigo, *descricao, quantidade, unidade, unitario, total = linha
+    if not (codigo.isalnum() and _eh_numero(quantidade) and _eh_numero(unitario) and _eh_numero(total)):
+        return None
+    if _eh_numero(unidade):
+        return None
+    return " ".join(descricao), codigo, quantidade, unidade, unitario, total
+
+
+def _campos_tabela(linhas, tabela):
+    """
+    Lê as linhas da tabela de itens de uma página (só entre o cabeçalho e a linha de totais).
+    `tabela` é o estado vindo da página anterior: None fora da tabela, ou se ela tem a
+    coluna do número do item. Retorna (campos dos itens, estado para a próxima página).
+    """
+    campos = []
+    for linha in linhas:
+        if tabela is None:
+            tabela = _cabecalho_tabela(linha)
+            continue
+        if _normalizar_rotulo(" ".join(linha)).startswith(FIM_TABELA):
+            tabela = None
+            continue
+        item = _campos_linha_tabela(linha, tabela)
+        if item is not None:
+            campos.append(item)
+        elif campos and not (_eh_numero(linha[-1]) and "," in linha[-1]):
+            # Descrição quebrada em mais de uma linha (não termina em um valor)
+            descricao, *resto = campos[-1]
+            campos[-1] = (f"{descricao} {' '.join(linha)}", *resto)
+    return campos, tabela
+
+
+def iter_tabelas_geometria(arquivo, metadados=None):
+    """
+    Como `iter_tabelas_por_pagina`, lendo as palavras com a posição delas na página:
+    - tabela em colunas (DANFE): só as linhas entre o cabeçalho e os totais são lidas,
+      cada uma da direita para a esquerda (a descrição pode ter qualquer tamanho);
+    - layout de duas linhas: o padrão de `nfce_parser` sobre as linhas montadas pela posição;
+    - layout desconhecido: volta para o texto extraído pelo pdfplumber (modo "texto").
+    """
+    resto = ""
+    tabela = None
+    with pdfplumber.open(arquivo) as pdf:
+        for page in pdf.pages:
+            linhas = _linhas_da_pagina(page)
+            texto = "\n".join(" ".join(linha) for linha in linhas)
+            if metadados is not None:
+                _atualizar_metadados(metadados, texto)
+            campos, tabela = _campos_tabela(linhas, tabela)
+            if campos:
+                itens = nfce_parser.itens_de_campos(campos)
+            elif MARCA_DUAS_LINHAS in texto or resto.strip():
+                itens, resto = _analisar_com_resto(resto, texto)
+            else:
+                itens, resto = _analisar_com_resto(resto, page.extract_text())
+            page.close()
+            yield itens
+
+
+def iter_tabelas_por_pagina(arquivo, metadados=None, modo=MODO_PADRAO):
+    """
+    Gera os itens de cada página do PDF (`nfce_parser.ItensNota`), à medida que as páginas são lidas.
+    Se `metadados` for um dicionário, ele é preenchido com "chave_acesso", "cnpj"
+    e "data_emissao" (YYYY-MM-DD) assim que esses dados aparecem no texto.
+    `modo` é "geometria" (posição das palavras, ver `iter_tabelas_geometria`) ou "texto".
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de leitura inválido: {modo}")
+    if modo == "geometria":
+        yield from iter_tabelas_geometria(arquivo, metadados)
+        return
+    textos = iter_textos_paginas(arquivo)
+    if metadados is not None:
+        textos = _com_metadados(textos, metadados)
+    yield from iter_tabelas_textos(textos)
+
+
+def iter_itens_por_pagina(arquivo, metadados=None, modo=MODO_PADRAO):
+    """Como `iter_tabelas_por_pagina`, mas gera a lista de itens (no formato do banco) de cada página"""
+    for itens in iter_tabelas_por_pagina(arquivo, metadados, modo):
+        yield itens.registros()
+
+
+def _com_metadados(textos, metadados):
+    for texto in textos:
+        _atualizar_metadados(metadados, texto or "")
+        yield texto
+
+
+def iter_itens(arquivo, modo=MODO_PADRAO):
+    """Gera os itens da nota fiscal um a um, lendo o PDF página por página"""
+    for itens in iter_itens_por_pagina(arquivo, modo=modo):
+        yield from itens
+
+
+def ler_nota_colunar(arquivo, modo=MODO_PADRAO):
+    """Como `ler_nota`, mas com os itens em formato colunar (`nfce_parser.ItensNota`)"""
+    metadados = {"chave_acesso": None, "cnpj": None, "data_emissao": None}
+    itens = nfce_parser.ItensNota.concatenar(iter_tabelas_por_pagina(arquivo, metadados, modo))
+    return {**metadados, "itens": itens}
+
+
+def ler_nota(arquivo, modo=MODO_PADRAO):
+    """Lê uma NFC-e em PDF e retorna um dicionário com os metadados da nota e a lista de itens"""
+    nota = ler_nota_colunar(arquivo, modo)
+    return {**nota, "itens": nota["itens"].registros()}
+
+
+def ler_nota_bytes(nome, conteudo):
+    """
+    Versão de `ler_nota` para rodar em outro processo (importação em lote):
+    recebe o conteúdo do arquivo em bytes e nunca lança exceção, retornando o erro no campo "erro".
+    """
+    try:
+        return {"nome": nome, "erro": None, **ler_nota(io.BytesIO(conteudo))}
+    except Exception as e:
+        return {"nome": nome, "erro": str(e), "chave_acesso": None, "cnpj": None, "data_emissao": None, "itens": []}
+
+
 def extract_data(uploaded_file):
-    # Lógica para extrair dados do PDF
-    # Retornar lista de dicionários
-    return []
+    """
+    Extrai os itens de uma nota fiscal (NFC-e) em PDF.
+    Retorna uma lista de dicionários no formato esperado por `db_queries.insert_itens`.
+    """
+    return list(iter_itens(uploaded_file))